@@ -0,0 +1,20 @@
+"""Инициализация модулей базы данных."""
+from .cache import UserCache
+from .write_behind import UserActivityBuffer
+from .content import ContentStore
+from config import config
+
+user_cache = UserCache(
+    max_size=config.user_cache_size,
+    ttl=config.user_cache_ttl
+)
+
+content_store = ContentStore(
+    codec=config.content_compression,
+    level=config.content_compression_level
+)
+
+activity_buffer = UserActivityBuffer(
+    flush_interval=config.activity_flush_interval_ms / 1000,
+    max_rows=config.activity_flush_max_rows
+)
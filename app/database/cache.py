@@ -0,0 +1,159 @@
+"""Кэш пользователей в памяти процесса."""
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+from sqlalchemy import select
+from sqlalchemy.orm.attributes import set_committed_value
+from app.utils.logger import setup_logger
+from .crud import CRUD
+from .models.user import User
+
+logger = setup_logger(__name__)
+
+# Поля, которые меняются почти на каждом сообщении и могут быть изменены
+# другим процессом: при чтении из кэша они перечитываются из базы данных
+VOLATILE_FIELDS = ('state', 'active_transcript_id')
+
+
+class UserCache:
+    """
+    Write-through кэш пользователей перед CRUD с вытеснением по TTL и LRU.
+
+    Чтение выполняется из кэша, изменения сначала записываются в базу
+    данных, затем обновляют кэш. Кэш локален для процесса, поэтому поля
+    VOLATILE_FIELDS при чтении перечитываются из базы данных одним
+    запросом по первичному ключу. Изменения остальных (редко меняющихся)
+    полей из других процессов становятся видны не позже чем через ttl
+    секунд.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 10000,
+        ttl: float = 300,
+        crud: Optional[CRUD] = None
+    ) -> None:
+        """
+        Инициализация кэша.
+
+        :param max_size: Максимальное число пользователей в кэше.
+        :param ttl: Время жизни записи (секунды).
+        :param crud: CRUD пользователей.
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.crud = crud or CRUD(User)
+        self._entries: OrderedDict[int, Tuple[User, float]] = OrderedDict()
+
+    def get_cached(self, number: int) -> Optional[User]:
+        """
+        Получить пользователя из кэша без обращения к базе данных.
+
+        :param number: Номер пользователя.
+        :return: Пользователь или None, если записи нет или она устарела.
+        """
+        number = int(number)
+        entry = self._entries.get(number)
+        if entry is None:
+            return None
+        user, expires_at = entry
+        if expires_at < time.monotonic():
+            del self._entries[number]
+            return None
+        self._entries.move_to_end(number)
+        return user
+
+    def get_many_cached(self, numbers: Iterable[int]) -> Dict[int, User]:
+        """
+        Получить из кэша сразу нескольких пользователей.
+
+        :param numbers: Номера пользователей.
+        :return: Найденные в кэше пользователи по номерам.
+        """
+        users = {}
+        for number in numbers:
+            user = self.get_cached(number)
+            if user is not None:
+                users[int(number)] = user
+        return users
+
+    def put(self, user: User) -> User:
+        """
+        Поместить пользователя в кэш.
+
+        :param user: Пользователь.
+        :return: Пользователь.
+        """
+        self._entries[user.number] = (user, time.monotonic() + self.ttl)
+        self._entries.move_to_end(user.number)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        return user
+
+    def invalidate(self, number: int) -> None:
+        """
+        Удалить пользователя из кэша.
+
+        :param number: Номер пользователя.
+        """
+        self._entries.pop(int(number), None)
+
+    async def refresh(self, users: Dict[int, User]) -> Dict[int, User]:
+        """
+        Перечитать из базы данных изменчивые поля пользователей из кэша.
+        Пользователи, которых больше нет в базе данных, удаляются из кэша
+        и из результата.
+
+        :param users: Пользователи из кэша по номерам.
+        :return: Пользователи с актуальными изменчивыми полями.
+        """
+        if not users:
+            return users
+        columns = [getattr(User, field) for field in VOLATILE_FIELDS]
+        async with self.crud.get_session() as session:
+            rows = await session.execute(
+                select(User.number, *columns)
+                .where(User.number.in_(list(users)))
+            )
+            fresh = {row.number: row for row in rows}
+        for number in list(users):
+            row = fresh.get(number)
+            if row is None:
+                self.invalidate(number)
+                del users[number]
+                continue
+            for field in VOLATILE_FIELDS:
+                set_committed_value(users[number], field, getattr(row, field))
+        return users
+
+    async def get(self, number: int) -> Optional[User]:
+        """
+        Получить пользователя из кэша или из базы данных.
+
+        :param number: Номер пользователя.
+        :return: Пользователь или None.
+        """
+        user = self.get_cached(number)
+        if user is not None:
+            user = (await self.refresh({user.number: user})).get(user.number)
+        if user is None:
+            user = await self.crud.get(number)
+            if user is not None:
+                self.put(user)
+        return user
+
+    async def update(self, user: User, **kwargs) -> User:
+        """
+        Обновить пользователя в базе данных и в кэше.
+
+        :param user: Пользователь.
+        :param kwargs: Изменяемые поля.
+        :return: Обновленный пользователь.
+        """
+        try:
+            user = await self.crud.update(user, **kwargs)
+        except Exception:
+            self.invalidate(user.number)
+            raise
+        return self.put(user)
+
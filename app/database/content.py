@@ -0,0 +1,364 @@
+"""Хранилище сжатых транскрипций и суммаризаций."""
+import zlib
+import asyncio
+from datetime import datetime
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+import numpy as np
+from sqlalchemy import delete, func, insert, literal, select
+from sqlalchemy.orm import sessionmaker
+from app.utils.clock import utcnow
+from app.utils.logger import setup_logger
+from .engine import async_session_factory
+from .models.transcript import Transcript
+from .models.transcript_embedding import TranscriptEmbedding
+
+logger = setup_logger(__name__)
+
+Codec = Tuple[Callable[[bytes, int], bytes], Callable[[bytes], bytes]]
+
+
+def _zstd_codec() -> Codec:
+    """
+    Кодек zstd (пакет zstandard, необязательная зависимость).
+
+    :return: Функции сжатия и распаковки.
+    """
+    try:
+        import zstandard
+    except ImportError as e:
+        raise RuntimeError(
+            "Для CONTENT_COMPRESSION=zstd установите пакет zstandard"
+        ) from e
+    return (
+        lambda data, level: zstandard.ZstdCompressor(level=level).compress(
+            data
+        ),
+        lambda data: zstandard.ZstdDecompressor().decompress(data)
+    )
+
+
+class TranscriptInfo(NamedTuple):
+    """Описание транскрипции без текстов."""
+    id: int
+    created_at: datetime
+    duration_ms: Optional[int]
+    language: Optional[str]
+    transcription_size: int
+
+
+_INFO_COLUMNS = (
+    Transcript.id,
+    Transcript.created_at,
+    Transcript.duration_ms,
+    Transcript.language,
+    Transcript.transcription_size,
+)
+
+
+CODECS: Dict[str, Callable[[], Codec]] = {
+    'zlib': lambda: (zlib.compress, zlib.decompress),
+    'zstd': _zstd_codec,
+}
+
+
+def get_codec(name: str) -> Codec:
+    """
+    Возвращает функции сжатия и распаковки кодека.
+
+    :param name: Название кодека.
+    :return: Функции сжатия и распаковки.
+    """
+    try:
+        return CODECS[name]()
+    except KeyError:
+        raise ValueError(f"Неизвестный кодек сжатия: {name}") from None
+
+
+class ContentStore:
+    """
+    Хранилище транскрипций вне таблицы users.
+
+    Тексты сжимаются в отдельном потоке и хранятся в таблице transcripts,
+    поэтому строка пользователя остается маленькой, а транскрипция
+    читается только тогда, когда она действительно нужна.
+    """
+
+    def __init__(
+        self,
+        codec: str = 'zlib',
+        level: int = 6,
+        session_factory: sessionmaker = async_session_factory
+    ) -> None:
+        """
+        Инициализация хранилища.
+
+        :param codec: Кодек для новых записей (zlib или zstd).
+        :param level: Уровень сжатия.
+        :param session_factory: Фабрика сессий для использования.
+        """
+        self.codec = codec
+        self.level = level
+        self.session_factory = session_factory
+        self._compress, _ = get_codec(codec)
+
+    def _encode(self, text: str) -> bytes:
+        return self._compress(text.encode('utf-8'), self.level)
+
+    @staticmethod
+    def _decode(codec: str, data: bytes) -> str:
+        _, decompress = get_codec(codec)
+        return decompress(data).decode('utf-8')
+
+    async def save(
+        self,
+        number: int,
+        transcription: str,
+        summary: str,
+        duration_ms: Optional[int] = None,
+        language: Optional[str] = None
+    ) -> int:
+        """
+        Сохранить транскрипцию и суммаризацию пользователя.
+
+        :param number: Номер пользователя.
+        :param transcription: Транскрибированный текст.
+        :param summary: Суммаризированный текст.
+        :param duration_ms: Длительность записи в миллисекундах.
+        :param language: Язык записи.
+        :return: ID записи.
+        """
+        compressed, compressed_summary = await asyncio.to_thread(
+            lambda: (self._encode(transcription), self._encode(summary))
+        )
+        size = len(transcription.encode('utf-8'))
+        async with self.session_factory() as session:
+            result = await session.execute(
+                insert(Transcript).values(
+                    number=number,
+                    codec=self.codec,
+                    transcription=compressed,
+                    summary=compressed_summary,
+                    transcription_size=size,
+                    duration_ms=duration_ms,
+                    language=language,
+                    created_at=utcnow()
+                )
+            )
+            await session.commit()
+        logger.info(
+            "Транскрипция пользователя %s сохранена: %d -> %d байт",
+            number, size, len(compressed)
+        )
+        return result.inserted_primary_key[0]
+
+    async def history(
+        self,
+        number: int,
+        page: int = 1,
+        page_size: int = 10
+    ) -> Tuple[List[TranscriptInfo], int]:
+        """
+        Страница истории транскрипций пользователя, от новых к старым.
+        Тексты не загружаются.
+
+        :param number: Номер пользователя.
+        :param page: Номер страницы, начиная с 1.
+        :param page_size: Размер страницы.
+        :return: Записи страницы и общее число записей.
+        """
+        async with self.session_factory() as session:
+            total = await session.scalar(
+                select(func.count())
+                .select_from(Transcript)
+                .where(Transcript.number == number)
+            )
+            rows = await session.execute(
+                select(*_INFO_COLUMNS)
+                .where(Transcript.number == number)
+                .order_by(Transcript.created_at.desc(), Transcript.id.desc())
+                .offset((page - 1) * page_size)
+                .limit(page_size)
+            )
+            return [TranscriptInfo(*row) for row in rows], total
+
+    async def find(
+        self,
+        number: int,
+        transcript_id: Optional[int] = None
+    ) -> Optional[TranscriptInfo]:
+        """
+        Описание транскрипции пользователя без текста.
+
+        :param number: Номер пользователя.
+        :param transcript_id: ID записи (None — последняя запись).
+        :return: Описание записи или None.
+        """
+        async with self.session_factory() as session:
+            row = (await session.execute(
+                self._select(number, transcript_id, *_INFO_COLUMNS)
+            )).first()
+        return TranscriptInfo(*row) if row else None
+
+    @staticmethod
+    def _select(number: int, transcript_id: Optional[int], *columns):
+        """
+        Запрос записи пользователя по ID или последней записи.
+
+        :param number: Номер пользователя.
+        :param transcript_id: ID записи (None — последняя запись).
+        :param columns: Выбираемые колонки.
+        :return: Запрос.
+        """
+        query = select(*columns).where(Transcript.number == number)
+        if transcript_id is not None:
+            return query.where(Transcript.id == transcript_id)
+        return query.order_by(
+            Transcript.created_at.desc(), Transcript.id.desc()
+        ).limit(1)
+
+    async def _load(
+        self,
+        number: int,
+        transcript_id: Optional[int],
+        column
+    ) -> Optional[str]:
+        """
+        Загрузить и распаковать текст транскрипции пользователя.
+
+        :param number: Номер пользователя.
+        :param transcript_id: ID записи (None — последняя запись).
+        :param column: Колонка с текстом.
+        :return: Текст или None.
+        """
+        async with self.session_factory() as session:
+            row = (await session.execute(
+                self._select(number, transcript_id, Transcript.codec, column)
+            )).first()
+        if row is None or row[1] is None:
+            return None
+        return await asyncio.to_thread(self._decode, row[0], row[1])
+
+    async def get_transcription(
+        self,
+        number: int,
+        transcript_id: Optional[int] = None
+    ) -> Optional[str]:
+        """
+        Транскрипция пользователя.
+
+        :param number: Номер пользователя.
+        :param transcript_id: ID записи (None — последняя запись).
+        :return: Текст или None.
+        """
+        return await self._load(
+            number, transcript_id, Transcript.transcription
+        )
+
+    async def get_summary(
+        self,
+        number: int,
+        transcript_id: Optional[int] = None
+    ) -> Optional[str]:
+        """
+        Суммаризация пользователя.
+
+        :param number: Номер пользователя.
+        :param transcript_id: ID записи (None — последняя запись).
+        :return: Текст или None.
+        """
+        return await self._load(number, transcript_id, Transcript.summary)
+
+    async def save_embeddings(
+        self,
+        transcript_id: int,
+        model: str,
+        vectors: np.ndarray,
+        offsets: np.ndarray
+    ) -> None:
+        """
+        Сохранить индекс фрагментов транскрипции, заменив прежний.
+
+        :param transcript_id: ID транскрипции.
+        :param model: Модель эмбеддингов.
+        :param vectors: Матрица эмбеддингов (фрагменты x размерность).
+        :param offsets: Границы фрагментов (фрагменты x 2).
+        """
+        async with self.session_factory() as session:
+            await session.execute(
+                delete(TranscriptEmbedding)
+                .where(TranscriptEmbedding.transcript_id == transcript_id)
+            )
+            await session.execute(
+                insert(TranscriptEmbedding).values(
+                    transcript_id=transcript_id,
+                    model=model,
+                    count=vectors.shape[0],
+                    dimensions=vectors.shape[1],
+                    vectors=vectors.astype(np.float32).tobytes(),
+                    offsets=offsets.astype(np.int32).tobytes()
+                )
+            )
+            await session.commit()
+
+    async def get_embeddings(
+        self,
+        transcript_id: int,
+        model: str
+    ) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Индекс фрагментов транскрипции.
+
+        :param transcript_id: ID транскрипции.
+        :param model: Модель эмбеддингов.
+        :return: Матрица эмбеддингов и границы фрагментов или None, если
+            индекса нет или он построен другой моделью.
+        """
+        async with self.session_factory() as session:
+            row = (await session.execute(
+                select(
+                    TranscriptEmbedding.count,
+                    TranscriptEmbedding.dimensions,
+                    TranscriptEmbedding.vectors,
+                    TranscriptEmbedding.offsets
+                ).where(
+                    TranscriptEmbedding.transcript_id == transcript_id,
+                    TranscriptEmbedding.model == model
+                )
+            )).first()
+        if row is None:
+            return None
+        count, dimensions, vectors, offsets = row
+        return (
+            np.frombuffer(vectors, dtype=np.float32).reshape(
+                count, dimensions
+            ),
+            np.frombuffer(offsets, dtype=np.int32).reshape(count, 2)
+        )
+
+    async def copy_embeddings(self, source_id: int, target_id: int) -> bool:
+        """
+        Скопировать индекс фрагментов одной транскрипции для другой с тем
+        же текстом.
+
+        :param source_id: ID транскрипции с индексом.
+        :param target_id: ID транскрипции без индекса.
+        :return: True, если индекс скопирован.
+        """
+        columns = (
+            TranscriptEmbedding.model,
+            TranscriptEmbedding.count,
+            TranscriptEmbedding.dimensions,
+            TranscriptEmbedding.vectors,
+            TranscriptEmbedding.offsets
+        )
+        async with self.session_factory() as session:
+            result = await session.execute(
+                insert(TranscriptEmbedding).from_select(
+                    ['transcript_id', *(column.key for column in columns)],
+                    select(literal(target_id), *columns).where(
+                        TranscriptEmbedding.transcript_id == source_id
+                    )
+                )
+            )
+            await session.commit()
+            return bool(result.rowcount)
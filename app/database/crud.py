@@ -1,6 +1,7 @@
 """Операции CRUD."""
 from typing import AsyncGenerator, Type, TypeVar
 from contextlib import asynccontextmanager
+from sqlalchemy import inspect
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import sessionmaker
@@ -80,9 +81,19 @@ class CRUD:
             return instance
 
     async def update(self, instance: T, **kwargs) -> T:
-        """Обновить информацию о записи."""
+        """
+        Обновить информацию о записи. Изменяются только переданные поля,
+        остальные поля переданного объекта (возможно, устаревшие) не
+        записываются.
+        """
         async with self.get_session() as session:
-            instance = await session.merge(instance)
+            instance = await session.get(
+                self.model, inspect(instance).identity
+            )
+            if instance is None:
+                raise SQLAlchemyError(
+                    f"{self.model.__name__} не найден для обновления"
+                )
             for key, value in kwargs.items():
                 setattr(instance, key, value)
             try:
@@ -1,19 +1,86 @@
 """Модуль движка базы данных."""
 import os
+from typing import Any, Dict
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy.ext.asyncio import (
+    create_async_engine,
+    AsyncEngine,
+    AsyncSession
+)
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy import text
-import aiofiles
+from sqlalchemy import event, text
+from sqlalchemy.engine import make_url
 
 from app.utils.logger import setup_logger
 from config import config
+from .migrations import run_migrations
 
 
 logger = setup_logger(__name__)
 
-engine = create_async_engine(config.database_url, future=True)
+# Профиль SQLite: PRAGMA, применяемые к каждому новому соединению.
+# busy_timeout идет первым, чтобы переключение в WAL ожидало блокировку.
+SQLITE_PRAGMAS: Dict[str, str] = {
+    'busy_timeout': str(config.sqlite_busy_timeout_ms),
+    'journal_mode': config.sqlite_journal_mode,
+    'synchronous': config.sqlite_synchronous,
+    'cache_size': str(-config.sqlite_cache_size_kb),
+    'mmap_size': str(config.sqlite_mmap_size_mb * 1024 * 1024),
+    'temp_store': config.sqlite_temp_store,
+}
+
+
+def configure_sqlite(
+    async_engine: AsyncEngine,
+    pragmas: Dict[str, str]
+) -> None:
+    """
+    Применяет PRAGMA к каждому новому соединению SQLite.
+
+    :param async_engine: Движок базы данных.
+    :param pragmas: PRAGMA и их значения.
+    """
+    def set_pragmas(dbapi_connection, connection_record) -> None:
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+    event.listen(async_engine.sync_engine, 'connect', set_pragmas)
+
+
+def _engine_options(database_url: str) -> Dict[str, Any]:
+    """
+    Параметры движка и пула соединений для диалекта базы данных.
+
+    :param database_url: URL базы данных.
+    :return: Параметры create_async_engine.
+    """
+    options: Dict[str, Any] = {
+        'future': True,
+        'pool_size': config.database_pool_size,
+        'max_overflow': config.database_max_overflow,
+    }
+    if make_url(database_url).get_backend_name() == 'sqlite':
+        # Для aiosqlite SQLAlchemy по умолчанию использует NullPool (новое
+        # соединение и поток на каждую сессию), поэтому пул задается явно.
+        options['poolclass'] = AsyncAdaptedQueuePool
+    else:
+        options['pool_pre_ping'] = True
+        options['pool_recycle'] = config.database_pool_recycle
+    return options
+
+
+engine = create_async_engine(
+    config.database_url, **_engine_options(config.database_url)
+)
+if engine.dialect.name == 'sqlite':
+    configure_sqlite(engine, SQLITE_PRAGMAS)
+
 Base = declarative_base()
 
 async_session_factory = sessionmaker(
@@ -24,41 +91,44 @@ async_session_factory = sessionmaker(
 )
 
 
-async def database_exists() -> bool:
+async def log_database_settings() -> Dict[str, str]:
     """
-    Проверяет, инициализирована ли база данных, проверяя наличие таблиц.
+    Проверяет и логирует фактические настройки соединения SQLite.
 
-    :return: True, если база данных инициализирована, иначе False.
+    :return: Фактические значения PRAGMA.
     """
+    if engine.dialect.name != 'sqlite':
+        return {}
     async with engine.connect() as conn:
-        result = await conn.execute(
-            text("SELECT name FROM sqlite_master WHERE type='table';")
+        settings = {
+            name: str(await conn.scalar(text(f"PRAGMA {name}")))
+            for name in SQLITE_PRAGMAS
+        }
+    logger.info(
+        "Настройки SQLite: %s",
+        ", ".join(f"{name}={value}" for name, value in settings.items())
+    )
+    if settings['journal_mode'].lower() != config.sqlite_journal_mode.lower():
+        logger.warning(
+            "Режим журнала SQLite %s вместо %s",
+            settings['journal_mode'], config.sqlite_journal_mode
         )
-        tables = result.fetchall()
-        return len(tables) > 0
+    return settings
 
 
-async def initialize_database(schema_path: str = 'schema.sql') -> None:
+async def initialize_database() -> None:
     """
-    Инициализирует базу данных, выполняя файл schema.sql, если база данных
-    еще не инициализирована.
+    Инициализирует базу данных, применяя недостающие миграции схемы.
     """
     try:
-        os.makedirs('database', exist_ok=True)
-        if not await database_exists():
-            async with engine.begin() as conn:
-                logger.info("Инициализация базы данных.")
-                async with aiofiles.open(schema_path, mode='r') as f:
-                    schema = await f.read()
-                statements = schema.split(';')
-                for statement in statements:
-                    if statement.strip():
-                        await conn.execute(text(statement))
-                logger.info("База данных инициализирована успешно.")
+        if engine.dialect.name == 'sqlite':
+            os.makedirs('database', exist_ok=True)
+        applied = await run_migrations(engine)
+        if applied:
+            logger.info("Применены миграции: %s", applied)
         else:
-            logger.info(
-                "База данных уже инициализирована. Пропуск инициализации."
-            )
+            logger.info("Схема базы данных актуальна.")
+        await log_database_settings()
     except SQLAlchemyError as e:
         logger.error(
             "Инициализация базы данных не удалась: %s", e, exc_info=True
@@ -0,0 +1,247 @@
+"""
+Версионные миграции схемы базы данных.
+
+Миграции описаны через SQLAlchemy Core и не зависят от диалекта, поэтому
+одинаково применяются к SQLite и PostgreSQL. Описания таблиц в
+миграциях зафиксированы и не должны меняться при изменении моделей:
+изменения схемы добавляются новыми миграциями в конец MIGRATIONS.
+"""
+import zlib
+from typing import Callable, List, Tuple
+from sqlalchemy import (
+    BigInteger,
+    Boolean,
+    Column,
+    DateTime,
+    Index,
+    Integer,
+    LargeBinary,
+    MetaData,
+    Table,
+    Text,
+    false,
+    func,
+    insert,
+    select,
+    text
+)
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncEngine
+from app.utils.clock import utcnow
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Ключ advisory lock PostgreSQL, чтобы реплики не применяли миграции
+# одновременно
+MIGRATION_LOCK_KEY = 7729
+
+_migrations = Table(
+    'schema_migrations',
+    MetaData(),
+    Column('version', Integer, primary_key=True, autoincrement=False),
+    Column('name', Text, nullable=False),
+    Column('applied_at', DateTime, nullable=False)
+)
+
+
+def _initial(conn: Connection) -> None:
+    """
+    Таблицы users и jobs. В базах, созданных ранее из schema.sql,
+    таблицы уже существуют и пропускаются.
+
+    :param conn: Соединение.
+    """
+    metadata = MetaData()
+    Table(
+        'users',
+        metadata,
+        Column('number', BigInteger, primary_key=True, autoincrement=False),
+        Column('name', Text),
+        Column('uploaded_audios', Integer, server_default=text('0')),
+        Column('gpt_requests', Integer, server_default=text('0')),
+        Column('last_summary_text', Text),
+        Column('last_transcription_text', Text),
+        Column('state', Text),
+        Column('is_admin', Boolean, server_default=false()),
+        Column('subscription_status', Text, server_default='free'),
+        Column('created_at', DateTime, server_default=func.current_timestamp()),
+        Column('updated_at', DateTime, server_default=func.current_timestamp())
+    )
+    Table(
+        'jobs',
+        metadata,
+        Column('id', Integer, primary_key=True, autoincrement=True),
+        Column('kind', Text, nullable=False),
+        Column('payload', Text, nullable=False),
+        Column('status', Text, nullable=False, server_default='pending'),
+        Column('attempts', Integer, server_default=text('0')),
+        Column('max_attempts', Integer, server_default=text('3')),
+        Column('last_error', Text),
+        Column('run_at', DateTime, server_default=func.current_timestamp()),
+        Column('created_at', DateTime, server_default=func.current_timestamp()),
+        Column('updated_at', DateTime, server_default=func.current_timestamp()),
+        Index('ix_jobs_kind_status_run_at', 'kind', 'status', 'run_at')
+    )
+    metadata.create_all(conn, checkfirst=True)
+
+
+def _active_jobs(conn: Connection) -> None:
+    """
+    Таблица аренд активных задач пользователей.
+
+    :param conn: Соединение.
+    """
+    metadata = MetaData()
+    Table(
+        'active_jobs',
+        metadata,
+        Column('number', BigInteger, primary_key=True, autoincrement=False),
+        Column('token', Text, nullable=False),
+        Column('expires_at', DateTime, nullable=False)
+    )
+    metadata.create_all(conn, checkfirst=True)
+
+
+def _content_store(conn: Connection) -> None:
+    """
+    Перенос транскрипций и суммаризаций из users в сжатую таблицу
+    transcripts.
+
+    :param conn: Соединение.
+    """
+    metadata = MetaData()
+    transcripts = Table(
+        'transcripts',
+        metadata,
+        Column('id', Integer, primary_key=True, autoincrement=True),
+        Column('number', BigInteger, nullable=False),
+        Column('codec', Text, nullable=False),
+        Column('transcription', LargeBinary, nullable=False),
+        Column('summary', LargeBinary),
+        Column('transcription_size', Integer, server_default=text('0')),
+        Column('created_at', DateTime, server_default=func.current_timestamp()),
+        Index('ix_transcripts_number_id', 'number', 'id')
+    )
+    metadata.create_all(conn, checkfirst=True)
+
+    users = Table('users', MetaData(), autoload_with=conn)
+    if 'last_transcription_text' not in users.c:
+        return
+    rows = conn.execute(
+        select(
+            users.c.number,
+            users.c.last_transcription_text,
+            users.c.last_summary_text,
+            users.c.updated_at
+        ).where(users.c.last_transcription_text.is_not(None))
+    )
+    for number, transcription, summary, updated_at in rows.all():
+        conn.execute(insert(transcripts).values(
+            number=number,
+            codec='zlib',
+            transcription=zlib.compress(transcription.encode('utf-8')),
+            summary=(
+                zlib.compress(summary.encode('utf-8')) if summary else None
+            ),
+            transcription_size=len(transcription.encode('utf-8')),
+            created_at=updated_at or utcnow()
+        ))
+    conn.execute(text("ALTER TABLE users DROP COLUMN last_transcription_text"))
+    conn.execute(text("ALTER TABLE users DROP COLUMN last_summary_text"))
+
+
+def _transcript_history(conn: Connection) -> None:
+    """
+    История транскрипций: длительность и язык записи, выбранная
+    пользователем запись и покрывающий индекс списка истории.
+
+    :param conn: Соединение.
+    """
+    conn.execute(text("ALTER TABLE transcripts ADD COLUMN duration_ms INTEGER"))
+    conn.execute(text("ALTER TABLE transcripts ADD COLUMN language TEXT"))
+    conn.execute(
+        text("ALTER TABLE users ADD COLUMN active_transcript_id INTEGER")
+    )
+    conn.execute(text("DROP INDEX IF EXISTS ix_transcripts_number_id"))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_transcripts_history ON transcripts "
+        "(number, created_at, id, duration_ms, language, transcription_size)"
+    ))
+
+
+def _transcript_embeddings(conn: Connection) -> None:
+    """
+    Индексы фрагментов транскрипций для ответов на вопросы.
+
+    :param conn: Соединение.
+    """
+    metadata = MetaData()
+    Table(
+        'transcript_embeddings',
+        metadata,
+        Column('transcript_id', Integer, primary_key=True, autoincrement=False),
+        Column('model', Text, nullable=False),
+        Column('count', Integer, nullable=False),
+        Column('dimensions', Integer, nullable=False),
+        Column('vectors', LargeBinary, nullable=False),
+        Column('offsets', LargeBinary, nullable=False)
+    )
+    metadata.create_all(conn, checkfirst=True)
+
+
+def _job_leases(conn: Connection) -> None:
+    """
+    Аренда выполняемых задач: узел-владелец и срок аренды, по истечении
+    которого задача возвращается в очередь.
+
+    :param conn: Соединение.
+    """
+    conn.execute(text("ALTER TABLE jobs ADD COLUMN claimed_by TEXT"))
+    conn.execute(text("ALTER TABLE jobs ADD COLUMN lease_until TIMESTAMP"))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_jobs_status_lease_until ON jobs "
+        "(status, lease_until)"
+    ))
+
+
+# (версия, название, функция миграции)
+MIGRATIONS: List[Tuple[int, str, Callable[[Connection], None]]] = [
+    (1, 'initial', _initial),
+    (2, 'active_jobs', _active_jobs),
+    (3, 'content_store', _content_store),
+    (4, 'transcript_history', _transcript_history),
+    (5, 'transcript_embeddings', _transcript_embeddings),
+    (6, 'job_leases', _job_leases),
+]
+
+
+async def run_migrations(engine: AsyncEngine) -> List[int]:
+    """
+    Применяет недостающие миграции в одной транзакции.
+
+    :param engine: Движок базы данных.
+    :return: Версии примененных миграций.
+    """
+    applied_now: List[int] = []
+    async with engine.begin() as conn:
+        if conn.dialect.name == 'postgresql':
+            await conn.execute(
+                text("SELECT pg_advisory_xact_lock(:key)"),
+                {'key': MIGRATION_LOCK_KEY}
+            )
+        await conn.run_sync(_migrations.create, checkfirst=True)
+        applied = set(await conn.scalars(select(_migrations.c.version)))
+
+        for version, name, migrate in MIGRATIONS:
+            if version in applied:
+                continue
+            logger.info("Применение миграции %d (%s).", version, name)
+            await conn.run_sync(migrate)
+            await conn.execute(
+                insert(_migrations).values(
+                    version=version, name=name, applied_at=utcnow()
+                )
+            )
+            applied_now.append(version)
+    return applied_now
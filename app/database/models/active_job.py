@@ -0,0 +1,18 @@
+"""Модель аренды активной задачи пользователя."""
+from sqlalchemy import (
+    Column,
+    BigInteger,
+    DateTime,
+    Text
+)
+from ..engine import Base
+
+
+class ActiveJob(Base):
+    """Модель аренды активной задачи пользователя."""
+
+    __tablename__ = 'active_jobs'
+
+    number = Column(BigInteger, primary_key=True, autoincrement=False)
+    token = Column(Text, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
@@ -0,0 +1,29 @@
+"""Модель фоновой задачи базы данных."""
+from sqlalchemy import (
+    Column,
+    DateTime,
+    func,
+    Integer,
+    Text
+)
+from ..engine import Base
+from ..state.job import JobStatus
+
+
+class Job(Base):
+    """Модель фоновой задачи."""
+
+    __tablename__ = 'jobs'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    kind = Column(Text, nullable=False)
+    payload = Column(Text, nullable=False)
+    status = Column(Text, default=JobStatus.PENDING, nullable=False)
+    attempts = Column(Integer, default=0)
+    max_attempts = Column(Integer, default=3)
+    last_error = Column(Text, default=None)
+    claimed_by = Column(Text, default=None)
+    lease_until = Column(DateTime, default=None)
+    run_at = Column(DateTime, default=func.now())
+    created_at = Column(DateTime, default=func.now())
+    updated_at = Column(DateTime, default=func.now())
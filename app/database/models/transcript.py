@@ -0,0 +1,43 @@
+"""Модель сохраненной транскрипции базы данных."""
+from sqlalchemy import (
+    Column,
+    BigInteger,
+    DateTime,
+    func,
+    Index,
+    Integer,
+    LargeBinary,
+    Text
+)
+from sqlalchemy.orm import deferred
+from ..engine import Base
+
+
+class Transcript(Base):
+    """
+    Модель транскрипции и суммаризации пользователя. Тексты хранятся
+    сжатыми и загружаются только по запросу. transcription_size —
+    размер текста транскрипции в байтах UTF-8.
+    """
+
+    __tablename__ = 'transcripts'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    number = Column(BigInteger, nullable=False)
+    codec = Column(Text, nullable=False)
+    transcription = deferred(Column(LargeBinary, nullable=False))
+    summary = deferred(Column(LargeBinary))
+    transcription_size = Column(Integer, default=0)
+    duration_ms = Column(Integer, default=None)
+    language = Column(Text, default=None)
+    created_at = Column(DateTime, default=func.now())
+
+    __table_args__ = (
+        # Покрывающий индекс истории: список записей пользователя
+        # читается из индекса без обращения к строкам с текстами
+        Index(
+            'ix_transcripts_history',
+            'number', 'created_at', 'id',
+            'duration_ms', 'language', 'transcription_size'
+        ),
+    )
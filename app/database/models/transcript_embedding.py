@@ -0,0 +1,25 @@
+"""Модель индекса фрагментов транскрипции базы данных."""
+from sqlalchemy import (
+    Column,
+    Integer,
+    LargeBinary,
+    Text
+)
+from sqlalchemy.orm import deferred
+from ..engine import Base
+
+
+class TranscriptEmbedding(Base):
+    """
+    Модель индекса фрагментов транскрипции: матрица эмбеддингов float32
+    (count x dimensions) и границы фрагментов int32 (count x 2).
+    """
+
+    __tablename__ = 'transcript_embeddings'
+
+    transcript_id = Column(Integer, primary_key=True, autoincrement=False)
+    model = Column(Text, nullable=False)
+    count = Column(Integer, nullable=False)
+    dimensions = Column(Integer, nullable=False)
+    vectors = deferred(Column(LargeBinary, nullable=False))
+    offsets = deferred(Column(LargeBinary, nullable=False))
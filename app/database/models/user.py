@@ -20,9 +20,8 @@ class User(Base):
     name = Column(Text, default=None)
     uploaded_audios = Column(Integer, default=0)
     gpt_requests = Column(Integer, default=0)
-    last_summary_text = Column(Text, default=None)
-    last_transcription_text = Column(Text, default=None)
     state = Column(Text, default=None)
+    active_transcript_id = Column(Integer, default=None)
     is_admin = Column(Boolean, default=False)
     subscription_status = Column(Text, default="free")
     created_at = Column(DateTime, default=func.now())
@@ -0,0 +1,8 @@
+"""Модуль для работы с состояниями фоновых задач."""
+
+
+class JobStatus:
+    """Состояния фоновой задачи."""
+    PENDING = 'pending'
+    RUNNING = 'running'
+    FAILED = 'failed'
@@ -0,0 +1,180 @@
+"""Отложенная пакетная запись активности пользователей."""
+import asyncio
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+from sqlalchemy import bindparam, func, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import sessionmaker
+from app.utils.clock import utcnow
+from app.utils.logger import setup_logger
+from .engine import async_session_factory
+from .models.user import User
+
+logger = setup_logger(__name__)
+
+# Счетчики пользователя, изменяемые через буфер
+COUNTER_FIELDS = ('uploaded_audios', 'gpt_requests')
+
+_users = User.__table__
+
+_flush_statement = (
+    update(_users)
+    .where(_users.c.number == bindparam('b_number'))
+    .values(
+        uploaded_audios=(
+            _users.c.uploaded_audios + bindparam('b_uploaded_audios')
+        ),
+        gpt_requests=_users.c.gpt_requests + bindparam('b_gpt_requests'),
+        name=func.coalesce(bindparam('b_name'), _users.c.name),
+        updated_at=func.coalesce(
+            bindparam('b_updated_at'), _users.c.updated_at
+        )
+    )
+)
+
+
+class UserActivityBuffer:
+    """
+    Буфер отложенной записи счетчиков и отметок активности пользователей.
+
+    Инкременты и отметки активности накапливаются в памяти по
+    пользователям и записываются одной транзакцией раз в flush_interval
+    секунд или при накоплении max_rows пользователей. Счетчики
+    увеличиваются атомарно в SQL (uploaded_audios = uploaded_audios + n).
+    """
+
+    def __init__(
+        self,
+        flush_interval: float = 0.5,
+        max_rows: int = 500,
+        session_factory: sessionmaker = async_session_factory
+    ) -> None:
+        """
+        Инициализация буфера.
+
+        :param flush_interval: Интервал записи (секунды).
+        :param max_rows: Количество пользователей, при котором запись
+        выполняется досрочно.
+        :param session_factory: Фабрика сессий для использования.
+        """
+        self.flush_interval = flush_interval
+        self.max_rows = max_rows
+        self.session_factory = session_factory
+        self._counters: Dict[int, Counter] = {}
+        self._touches: Dict[int, Tuple[Optional[str], datetime]] = {}
+        self._flush_requested = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def increment(self, number: int, field: str, amount: int = 1) -> None:
+        """
+        Увеличить счетчик пользователя.
+
+        :param number: Номер пользователя.
+        :param field: Поле счетчика (см. COUNTER_FIELDS).
+        :param amount: Величина увеличения.
+        """
+        if field not in COUNTER_FIELDS:
+            raise ValueError(f"Неизвестный счетчик пользователя: {field}")
+        self._counters.setdefault(int(number), Counter())[field] += amount
+        self._check_size()
+
+    def touch(self, number: int, name: Optional[str] = None) -> None:
+        """
+        Отметить активность пользователя (updated_at и имя).
+
+        :param number: Номер пользователя.
+        :param name: Текущее имя пользователя.
+        """
+        self._touches[int(number)] = (name, utcnow())
+        self._check_size()
+
+    def _check_size(self) -> None:
+        """Запросить досрочную запись при переполнении буфера."""
+        if len(self._counters.keys() | self._touches.keys()) >= self.max_rows:
+            self._flush_requested.set()
+
+    async def flush(self) -> int:
+        """
+        Записать накопленные изменения одной транзакцией.
+
+        :return: Количество обновленных пользователей.
+        """
+        async with self._flush_lock:
+            counters, self._counters = self._counters, {}
+            touches, self._touches = self._touches, {}
+            numbers = counters.keys() | touches.keys()
+            if not numbers:
+                return 0
+
+            params = []
+            for number in numbers:
+                counter = counters.get(number, Counter())
+                name, updated_at = touches.get(number, (None, None))
+                params.append({
+                    'b_number': number,
+                    'b_uploaded_audios': counter['uploaded_audios'],
+                    'b_gpt_requests': counter['gpt_requests'],
+                    'b_name': name,
+                    'b_updated_at': updated_at
+                })
+
+            try:
+                async with self.session_factory() as session:
+                    await session.execute(_flush_statement, params)
+                    await session.commit()
+            except SQLAlchemyError as e:
+                logger.error(
+                    "Ошибка записи активности пользователей: %s", e,
+                    exc_info=True
+                )
+                self._restore(counters, touches)
+                raise
+
+            logger.debug("Записана активность пользователей: %d", len(params))
+            return len(params)
+
+    def _restore(
+        self,
+        counters: Dict[int, Counter],
+        touches: Dict[int, Tuple[Optional[str], datetime]]
+    ) -> None:
+        """
+        Вернуть в буфер изменения, которые не удалось записать.
+
+        :param counters: Счетчики.
+        :param touches: Отметки активности.
+        """
+        for number, counter in counters.items():
+            self._counters.setdefault(number, Counter()).update(counter)
+        for number, touch in touches.items():
+            self._touches.setdefault(number, touch)
+
+    async def start(self) -> None:
+        """Запустить периодическую запись."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Остановить периодическую запись и записать остаток."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+
+    async def _run(self) -> None:
+        """Цикл периодической записи."""
+        while True:
+            try:
+                await asyncio.wait_for(
+                    self._flush_requested.wait(), self.flush_interval
+                )
+            except asyncio.TimeoutError:
+                pass
+            self._flush_requested.clear()
+            try:
+                await self.flush()
+            except SQLAlchemyError:
+                pass
@@ -1,4 +1,14 @@
 """Фильтры для handlers."""
-from .process import InProcessList
+from .process import create_registry
+from config import config
 
-in_process_filter = InProcessList()
+_registry_options = {
+    'redis': {'url': config.redis_url},
+}
+
+active_jobs = create_registry(
+    config.active_jobs_backend,
+    lease_ttl=config.active_jobs_lease_ttl,
+    heartbeat_interval=config.active_jobs_heartbeat_interval,
+    **_registry_options.get(config.active_jobs_backend, {})
+)
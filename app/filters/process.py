@@ -1,36 +1,377 @@
 """
-Модуль для управления пользователями, которые находятся в процессе обработки
+Модуль реестра активных задач: пользователи, медиа которых находится в
+процессе обработки.
+
+Реестр выдает пользователю аренду (lease) с ограниченным сроком жизни.
+Захват аренды атомарен, поэтому два одновременных медиа сообщения не
+запускают две обработки. Аренды, которыми владеет узел, продлеваются
+фоновым heartbeat, а аренды упавшего узла истекают сами.
 """
+import time
+import uuid
+import asyncio
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+from sqlalchemy import delete, insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import sessionmaker
+from app.database.engine import async_session_factory
+from app.database.models.active_job import ActiveJob
+from app.utils.clock import utcnow
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class ActiveJobRegistry(ABC):
+    """
+    Реестр активных задач пользователей.
+
+    Наследники реализуют атомарные операции хранилища: захват, продление
+    и освобождение аренды по токену владельца.
+    """
+
+    def __init__(
+        self,
+        lease_ttl: float = 120,
+        heartbeat_interval: float = 30
+    ) -> None:
+        """
+        Инициализация реестра.
 
+        :param lease_ttl: Срок жизни аренды без продления (секунды).
+        :param heartbeat_interval: Интервал продления аренд (секунды).
+        """
+        self.lease_ttl = lease_ttl
+        self.heartbeat_interval = heartbeat_interval
+        self._held: Dict[int, str] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    async def acquire(self, number: int) -> Optional[str]:
+        """
+        Атомарно захватить аренду пользователя.
 
-class InProcessList:
-    """Класс для управления номерами пользователей, которые находятся в 
-    процессе обработки."""
+        :param number: Номер пользователя.
+        :return: Токен аренды или None, если пользователь уже в обработке.
+        """
+        token = uuid.uuid4().hex
+        if not await self._claim(number, token):
+            return None
+        self._held[number] = token
+        return token
 
-    def __init__(self) -> None:
-        self.user_numbers = set()
+    async def adopt(self, number: int, token: Optional[str] = None) -> bool:
+        """
+        Принять аренду задачи, поставленной другим узлом или до
+        перезапуска, и продлевать ее с этого узла.
+
+        :param number: Номер пользователя.
+        :param token: Токен аренды из задачи (None — новая аренда).
+        :return: True, если аренда принадлежит этому токену.
+        """
+        token = token or uuid.uuid4().hex
+        if not await self._claim(number, token):
+            logger.warning(
+                "Аренда пользователя %s занята другой задачей", number
+            )
+            return False
+        self._held[number] = token
+        return True
 
-    def add_user(self, number: str) -> None:
+    async def release(self, number: int, token: Optional[str] = None) -> None:
         """
-        Добавить номер пользователя в таблицу.
+        Освободить аренду пользователя.
 
-        :param number: Номер пользователя
+        :param number: Номер пользователя.
+        :param token: Токен аренды (None — освободить любую аренду).
         """
-        self.user_numbers.add(number)
+        if token is None or self._held.get(number) == token:
+            self._held.pop(number, None)
+        await self._release(number, token)
 
-    def remove_user(self, number: str) -> None:
+    async def is_active(self, number: int) -> bool:
         """
-        Удалить номер пользователя из таблицы.
+        Проверить, находится ли пользователь в обработке.
 
-        :param number: Номер пользователя
+        :param number: Номер пользователя.
         """
-        if number in self.user_numbers:
-            self.user_numbers.discard(number)
+        return await self._is_active(number)
 
-    def user_exists(self, number: str) -> bool:
+    async def heartbeat(self) -> None:
+        """Продлить все аренды, которыми владеет этот узел."""
+        for number, token in list(self._held.items()):
+            try:
+                renewed = await self._renew(number, token)
+            except Exception as e:
+                logger.error(
+                    "Ошибка продления аренды пользователя %s: %s",
+                    number, e, exc_info=True
+                )
+                continue
+            if not renewed and self._held.get(number) == token:
+                # Аренду освободил или перехватил другой узел
+                del self._held[number]
+
+    async def start(self) -> None:
+        """Запустить фоновое продление аренд."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
         """
-        Проверить, находится ли номер пользователя в таблице.
+        Остановить продление аренд. Аренды не освобождаются: задачи
+        остаются в очереди, а аренды истекут или будут приняты заново.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        """Цикл продления аренд."""
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            await self.heartbeat()
 
-        :param number: Номер пользователя
+    @abstractmethod
+    async def _claim(self, number: int, token: str) -> bool:
         """
-        return number in self.user_numbers
+        Захватить аренду, если она свободна, истекла или уже принадлежит
+        токену.
+        """
+
+    @abstractmethod
+    async def _renew(self, number: int, token: str) -> bool:
+        """Продлить аренду, если она принадлежит токену."""
+
+    @abstractmethod
+    async def _release(self, number: int, token: Optional[str]) -> None:
+        """Удалить аренду, если она принадлежит токену (или любую)."""
+
+    @abstractmethod
+    async def _is_active(self, number: int) -> bool:
+        """Проверить наличие действующей аренды."""
+
+
+class MemoryJobRegistry(ActiveJobRegistry):
+    """Реестр в памяти процесса: для одного воркера без реплик."""
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        # номер -> (токен, время истечения по time.monotonic)
+        self._leases: Dict[int, Tuple[str, float]] = {}
+
+    def _current(self, number: int) -> Optional[str]:
+        lease = self._leases.get(number)
+        if lease is None or lease[1] <= time.monotonic():
+            return None
+        return lease[0]
+
+    async def _claim(self, number: int, token: str) -> bool:
+        current = self._current(number)
+        if current is not None and current != token:
+            return False
+        self._leases[number] = (token, time.monotonic() + self.lease_ttl)
+        return True
+
+    async def _renew(self, number: int, token: str) -> bool:
+        if self._current(number) != token:
+            return False
+        self._leases[number] = (token, time.monotonic() + self.lease_ttl)
+        return True
+
+    async def _release(self, number: int, token: Optional[str]) -> None:
+        lease = self._leases.get(number)
+        if lease is not None and (token is None or lease[0] == token):
+            del self._leases[number]
+
+    async def _is_active(self, number: int) -> bool:
+        return self._current(number) is not None
+
+
+class DatabaseJobRegistry(ActiveJobRegistry):
+    """
+    Реестр в таблице active_jobs (SQLite или PostgreSQL).
+
+    Захват — условный UPDATE строки (истекшей или своей), а при ее
+    отсутствии INSERT, который проигрывает конкурирующей вставке по
+    первичному ключу. Сроки аренд хранятся в UTC.
+    """
+
+    def __init__(
+        self,
+        *args,
+        session_factory: sessionmaker = async_session_factory,
+        **kwargs
+    ) -> None:
+        super().__init__(*args, **kwargs)
+        self.session_factory = session_factory
+
+    def _expires_at(self) -> datetime:
+        return utcnow() + timedelta(seconds=self.lease_ttl)
+
+    async def _claim(self, number: int, token: str) -> bool:
+        now = utcnow()
+        async with self.session_factory() as session:
+            result = await session.execute(
+                update(ActiveJob)
+                .where(
+                    ActiveJob.number == number,
+                    or_(ActiveJob.expires_at <= now, ActiveJob.token == token)
+                )
+                .values(token=token, expires_at=self._expires_at())
+            )
+            if result.rowcount:
+                await session.commit()
+                return True
+            try:
+                await session.execute(
+                    insert(ActiveJob).values(
+                        number=number,
+                        token=token,
+                        expires_at=self._expires_at()
+                    )
+                )
+                await session.commit()
+            except IntegrityError:
+                await session.rollback()
+                return False
+            return True
+
+    async def _renew(self, number: int, token: str) -> bool:
+        async with self.session_factory() as session:
+            result = await session.execute(
+                update(ActiveJob)
+                .where(ActiveJob.number == number, ActiveJob.token == token)
+                .values(expires_at=self._expires_at())
+            )
+            await session.commit()
+            return bool(result.rowcount)
+
+    async def _release(self, number: int, token: Optional[str]) -> None:
+        statement = delete(ActiveJob).where(ActiveJob.number == number)
+        if token is not None:
+            statement = statement.where(ActiveJob.token == token)
+        async with self.session_factory() as session:
+            await session.execute(statement)
+            await session.commit()
+
+    async def _is_active(self, number: int) -> bool:
+        async with self.session_factory() as session:
+            found = await session.scalar(
+                select(ActiveJob.number).where(
+                    ActiveJob.number == number,
+                    ActiveJob.expires_at > utcnow()
+                )
+            )
+            return found is not None
+
+
+class RedisJobRegistry(ActiveJobRegistry):
+    """
+    Реестр в Redis (или совместимом хранилище): аренда — ключ с PX,
+    сравнение токена и запись выполняются атомарно скриптами Lua.
+    """
+
+    CLAIM_SCRIPT = """
+    local current = redis.call('GET', KEYS[1])
+    if (not current) or current == ARGV[1] then
+        redis.call('SET', KEYS[1], ARGV[1], 'PX', ARGV[2])
+        return 1
+    end
+    return 0
+    """
+    RENEW_SCRIPT = """
+    if redis.call('GET', KEYS[1]) == ARGV[1] then
+        return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+    end
+    return 0
+    """
+    RELEASE_SCRIPT = """
+    if redis.call('GET', KEYS[1]) == ARGV[1] then
+        return redis.call('DEL', KEYS[1])
+    end
+    return 0
+    """
+
+    def __init__(
+        self,
+        *args,
+        url: str = 'redis://localhost:6379/0',
+        prefix: str = 'active_job:',
+        client=None,
+        **kwargs
+    ) -> None:
+        super().__init__(*args, **kwargs)
+        if client is None:
+            try:
+                from redis.asyncio import Redis
+            except ImportError as e:
+                raise RuntimeError(
+                    "Для ACTIVE_JOBS_BACKEND=redis установите пакет redis"
+                ) from e
+            client = Redis.from_url(url, decode_responses=True)
+        self.client = client
+        self.prefix = prefix
+        self._claim_script = client.register_script(self.CLAIM_SCRIPT)
+        self._renew_script = client.register_script(self.RENEW_SCRIPT)
+        self._release_script = client.register_script(self.RELEASE_SCRIPT)
+
+    def _key(self, number: int) -> str:
+        return f"{self.prefix}{number}"
+
+    def _ttl_ms(self) -> int:
+        return int(self.lease_ttl * 1000)
+
+    async def _claim(self, number: int, token: str) -> bool:
+        return bool(await self._claim_script(
+            keys=[self._key(number)], args=[token, self._ttl_ms()]
+        ))
+
+    async def _renew(self, number: int, token: str) -> bool:
+        return bool(await self._renew_script(
+            keys=[self._key(number)], args=[token, self._ttl_ms()]
+        ))
+
+    async def _release(self, number: int, token: Optional[str]) -> None:
+        if token is None:
+            await self.client.delete(self._key(number))
+        else:
+            await self._release_script(
+                keys=[self._key(number)], args=[token]
+            )
+
+    async def _is_active(self, number: int) -> bool:
+        return bool(await self.client.exists(self._key(number)))
+
+    async def stop(self) -> None:
+        await super().stop()
+        await self.client.aclose()
+
+
+REGISTRY_BACKENDS = {
+    'memory': MemoryJobRegistry,
+    'database': DatabaseJobRegistry,
+    'redis': RedisJobRegistry,
+}
+
+
+def create_registry(backend: str, **kwargs) -> ActiveJobRegistry:
+    """
+    Создает реестр активных задач выбранного типа.
+
+    :param backend: memory, database или redis.
+    :param kwargs: Параметры реестра.
+    :return: Реестр активных задач.
+    """
+    try:
+        registry_class = REGISTRY_BACKENDS[backend]
+    except KeyError:
+        raise ValueError(
+            f"Неизвестный тип реестра активных задач: {backend}"
+        ) from None
+    return registry_class(**kwargs)
@@ -3,7 +3,15 @@ from typing import Union
 from app.database.models.user import User
 from app.whapi.message import Message, MediaMessage, ReplyMessage
 from . import (
-    start, support, cancel, new_audio, stats, admin, process, question
+    start,
+    support,
+    cancel,
+    new_audio,
+    stats,
+    admin,
+    history,
+    process,
+    question
 )
 
 
@@ -19,6 +27,7 @@ async def handler_routing(
         new_audio.route,
         stats.route,
         admin.route,
+        history.route,
         process.route,
         question.route
     ]
@@ -1,5 +1,5 @@
 """Обработчик событий установки и удаления администратора."""
-from app.database.crud import CRUD
+from app.database import user_cache
 from app.database.models.user import User
 from app.whapi import whapi_client
 from app.whapi.message import Message, MessageType
@@ -35,15 +35,14 @@ async def set_or_unset_admin(user: User, message: Message) -> None:
         )
         return
 
-    crud = CRUD(User)
-    target_user = await crud.get(number=number)
+    target_user = await user_cache.get(number)
     if target_user:
         if target_user.number == config.admin_number:
             await whapi_client.send_message(
                 user.number, NOT_CHANGE_ADMIN_MESSAGE.format(number=number)
             )
             return
-        await crud.update(target_user, is_admin=(action == 'set'))
+        await user_cache.update(target_user, is_admin=(action == 'set'))
         msg = (
             SET_ADMIN_MESSAGE if action == 'set'
             else UNSET_ADMIN_MESSAGE
@@ -3,7 +3,7 @@ from typing import Union
 from app.whapi.message import ReplyMessage
 from app.whapi import whapi_client
 from app.database.models.user import User
-from app.database.crud import CRUD
+from app.database import user_cache
 from app.utils.logger import setup_logger
 from messages import CANCEL_MESSAGE
 from keyboards import CANCEL_ID, new_audio_keyboard
@@ -17,8 +17,7 @@ async def cancel_handler(user: User) -> None:
 
     :param user: Пользователь
     """
-    crud = CRUD(User)
-    await crud.update(user, state=None)
+    await user_cache.update(user, state=None)
     await whapi_client.send_message(
         user.number, CANCEL_MESSAGE, markup=new_audio_keyboard
     )
@@ -0,0 +1,141 @@
+"""Обработчик событий истории транскрипций."""
+import math
+from typing import Optional
+from app.database import user_cache, content_store
+from app.database.content import TranscriptInfo
+from app.database.models.user import User
+from app.whapi import whapi_client
+from app.whapi.message import Message, MessageType
+from app.utils.logger import setup_logger
+from config import config
+from commands import HISTORY_COMMAND, SELECT_COMMAND
+from keyboards import new_audio_keyboard
+from messages import (
+    HISTORY_MESSAGE,
+    HISTORY_ITEM_MESSAGE,
+    HISTORY_EMPTY_MESSAGE,
+    TRANSCRIPT_SELECTED_MESSAGE,
+    TRANSCRIPT_NOT_FOUND_MESSAGE
+)
+
+logger = setup_logger(__name__)
+
+
+def _format_duration(duration_ms: Optional[int]) -> str:
+    """
+    Форматирует длительность записи.
+
+    :param duration_ms: Длительность в миллисекундах.
+    :return: Длительность в виде ч:мм:сс или мм:сс.
+    """
+    if duration_ms is None:
+        return '—'
+    minutes, seconds = divmod(duration_ms // 1000, 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{seconds:02d}"
+    return f"{minutes}:{seconds:02d}"
+
+
+def _format_item(item: TranscriptInfo, active_id: Optional[int]) -> str:
+    """
+    Форматирует строку истории транскрипций.
+
+    :param item: Описание транскрипции.
+    :param active_id: ID выбранной транскрипции.
+    :return: Строка истории.
+    """
+    return HISTORY_ITEM_MESSAGE.format(
+        marker='▶️' if item.id == active_id else '▫️',
+        id=item.id,
+        created_at=item.created_at.strftime('%Y-%m-%d %H:%M'),
+        duration=_format_duration(item.duration_ms),
+        language=item.language or '—',
+        size=math.ceil((item.transcription_size or 0) / 1024)
+    )
+
+
+async def send_history(user: User, page: int) -> None:
+    """
+    Отправляет страницу истории транскрипций пользователя.
+
+    :param user: Пользователь
+    :param page: Номер страницы
+    """
+    page_size = config.history_page_size
+    items, total = await content_store.history(user.number, page, page_size)
+    if not total:
+        await whapi_client.send_message(
+            user.number, HISTORY_EMPTY_MESSAGE, markup=new_audio_keyboard
+        )
+        return
+
+    pages = math.ceil(total / page_size)
+    if not items:
+        page = pages
+        items, total = await content_store.history(
+            user.number, page, page_size
+        )
+
+    # Без явного выбора вопросы задаются по последней записи
+    active_id = user.active_transcript_id
+    if active_id is None and page == 1:
+        active_id = items[0].id
+    await whapi_client.send_message(
+        user.number,
+        HISTORY_MESSAGE.format(
+            page=page,
+            pages=pages,
+            items='\n'.join(_format_item(item, active_id) for item in items)
+        )
+    )
+
+
+async def select_transcript(user: User, transcript_id: int) -> None:
+    """
+    Выбирает транскрипцию для вопросов.
+
+    :param user: Пользователь
+    :param transcript_id: ID транскрипции
+    """
+    if await content_store.find(user.number, transcript_id) is None:
+        await whapi_client.send_message(
+            user.number, TRANSCRIPT_NOT_FOUND_MESSAGE.format(id=transcript_id)
+        )
+        return
+
+    await user_cache.update(user, active_transcript_id=transcript_id)
+    await whapi_client.send_message(
+        user.number, TRANSCRIPT_SELECTED_MESSAGE.format(id=transcript_id)
+    )
+    logger.info(
+        "Пользователь %s выбрал транскрипцию %s", user.number, transcript_id
+    )
+
+
+async def route(user: User, message: Message) -> bool:
+    """
+    Обработчик команд истории и выбора транскрипции
+
+    :param user: Пользователь
+    :param message: Сообщение
+    """
+    if not isinstance(message, Message) or message.type != MessageType.TEXT:
+        return False
+
+    parts = (message.text or '').strip().lower().split()
+    if len(parts) > 2 or not parts:
+        return False
+    command, argument = parts[0], parts[1] if len(parts) == 2 else None
+    if argument is not None:
+        if not argument.lstrip('#').isdigit():
+            return False
+        argument = int(argument.lstrip('#'))
+
+    if command == HISTORY_COMMAND:
+        await send_history(user, max(argument or 1, 1))
+        return True
+    if command == SELECT_COMMAND and argument is not None:
+        await select_transcript(user, argument)
+        return True
+    return False
@@ -4,7 +4,7 @@ from app.whapi.message import Message, ReplyMessage, MessageType
 from app.whapi import whapi_client
 from app.database.models.user import User
 from app.database.state.user import UserState
-from app.database.crud import CRUD
+from app.database import user_cache
 from app.utils.logger import setup_logger
 from messages import NEW_AUDIO_MESSAGE
 from commands import NEW_AUDIO_COMMAND
@@ -19,8 +19,7 @@ async def send_new_audio_message(user: User) -> None:
 
     :param user: Пользователь
     """
-    crud = CRUD(User)
-    await crud.update(user, state=UserState.NEW_AUDIO)
+    await user_cache.update(user, state=UserState.NEW_AUDIO)
     await whapi_client.send_message(
         user.number, NEW_AUDIO_MESSAGE, markup=cancel_keyboard
     )
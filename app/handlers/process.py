@@ -1,21 +1,24 @@
 """Обработчик событий процесса."""
-from typing import Tuple
+import uuid
+from dataclasses import asdict
+from typing import Any, Dict, Optional, Tuple
+from app.jobs import job_queue
 from app.whapi.message import MediaMessage
 from app.whapi import whapi_client
 from app.database.models.user import User
 from app.database.state.user import UserState
-from app.database.crud import CRUD
+from app.database import user_cache, activity_buffer, content_store
 from app.filters.mime_type import MIME_TYPE_FILTER
-from app.filters import in_process_filter
+from app.filters import active_jobs
 from app.utils.logger import setup_logger
-from app.services.transcribe import transcribe_audio
-from app.services.summarize import summarize_text
+from app.services import transcript_index
+from app.services.transcribe import Transcription, transcribe_audio
+from app.services.summarize import StreamingSummarizer
 from app.utils.cancel import is_user_canceled
-from app.utils.temp_dir import (
-    download_media,
-    cleanup_files,
-    save_transcription_as_text
-)
+from app.utils import media_cache
+from app.utils.media_cache import CachedResult
+from app.utils.temp_dir import download_media_hashed, cleanup_files
+from config import config
 from keyboards import new_audio_keyboard
 from messages import (
     IN_PROCESS_MESSAGE,
@@ -30,50 +33,173 @@ logger = setup_logger(__name__)
 
 TRANSCRIPTION_FILENAME = "transcription.txt"
 
+MEDIA_JOB = 'media'
+
 
 async def update_user_data(
     user: User,
-    transcription: str,
+    transcription: Transcription,
     summary: str
-) -> None:
+) -> int:
     """
-    Обновляет данные пользователя в базе данных.
+    Обновляет данные пользователя в базе данных. Новая запись становится
+    выбранной для вопросов.
 
     :param user: Пользователь.
-    :param transcription: Транскрибированный текст.
+    :param transcription: Транскрипция.
     :param summary: Суммаризированный текст.
+    :return: ID сохраненной транскрипции.
     """
-    crud = CRUD(User)
-    await crud.update(
+    transcript_id = await content_store.save(
+        user.number,
+        transcription.text,
+        summary,
+        duration_ms=transcription.duration_ms,
+        language=transcription.language
+    )
+    await user_cache.update(
+        user, state=None, active_transcript_id=transcript_id
+    )
+    activity_buffer.increment(user.number, 'uploaded_audios')
+    return transcript_id
+
+
+async def index_transcription(transcript_id: int, text: str) -> None:
+    """
+    Индексирует транскрипцию для ответов на вопросы. Ошибка индексации
+    не прерывает обработку: индекс будет построен при первом вопросе.
+
+    :param transcript_id: ID транскрипции.
+    :param text: Текст транскрипции.
+    """
+    try:
+        await transcript_index.build(transcript_id, text)
+    except Exception as e:
+        logger.error(
+            "Ошибка индексации транскрипции %s: %s",
+            transcript_id, e, exc_info=True
+        )
+
+
+async def deliver_result(
+    user: User,
+    transcription: Transcription,
+    summary: str,
+    source_transcript_id: Optional[int] = None
+) -> int:
+    """
+    Сохраняет результат обработки, отправляет его пользователю и
+    индексирует транскрипцию для вопросов.
+
+    :param user: Пользователь.
+    :param transcription: Транскрипция.
+    :param summary: Суммаризированный текст.
+    :param source_transcript_id: ID транскрипции того же файла, индекс
+    которой можно скопировать вместо повторной индексации.
+    :return: ID сохраненной транскрипции.
+    """
+    transcript_id = await update_user_data(user, transcription, summary)
+    await handle_transcription_and_summary(user, transcription.text, summary)
+    if source_transcript_id is None or not await content_store.copy_embeddings(
+        source_transcript_id, transcript_id
+    ):
+        await index_transcription(transcript_id, transcription.text)
+    return transcript_id
+
+
+async def deliver_cached(
+    user: User,
+    cached: CachedResult
+) -> Optional[Tuple[str, str]]:
+    """
+    Отправляет пользователю результат из кэша без повторной обработки.
+
+    :param user: Пользователь.
+    :param cached: Результат из кэша.
+    :return: Транскрипция и суммаризация или None, если пользователь
+    отменил обработку.
+    """
+    if await is_user_canceled(user):
+        logger.info("Обработка отменена пользователем %s", user.number)
+        return None
+    await deliver_result(
         user,
-        state=None,
-        last_transcription_text=transcription,
-        last_summary_text=summary,
-        uploaded_audios=user.uploaded_audios + 1,
+        Transcription(
+            cached.transcription, cached.language, cached.duration_ms
+        ),
+        cached.summary,
+        source_transcript_id=cached.transcript_id
     )
+    logger.info("Результат для пользователя %s взят из кэша", user.number)
+    return cached.transcription, cached.summary
 
 
-async def process_media(media_url: str, user: User) -> Tuple[str, str]:
+async def process_media(
+    media_url: str,
+    user: User,
+    file_id: Optional[str] = None
+) -> Optional[Tuple[str, str]]:
     """
-    Обрабатывает медиафайл: конвертирует, транскрибирует и суммирует.
+    Обрабатывает медиафайл потоковым конвейером: загрузка -> сегменты ->
+    транскрипция -> частичные суммаризации -> итоговое объединение.
+    Разбиение начинается после загрузки: длительность и паузы
+    определяются по полному файлу, остальные стадии перекрываются.
+
+    Повторно присланный файл (тот же file_id или то же содержимое)
+    отвечается из кэша результатов без обращений к OpenAI.
 
     :param media_url: URL медиафайла.
     :param user: Пользователь.
+    :param file_id: Идентификатор медиа WHAPI.
     :return: Транскрибированный и суммаризированный текст.
     :raises: Исключение при ошибке обработки медиа.
     """
+    audio_path = None
     try:
         logger.info("Обработка медиа для пользователя %s", user.number)
-        audio_path = await download_media(media_url)
-        transcription = await transcribe_audio(audio_path, user)
-        summary = await summarize_text(transcription, user)
+        if file_id:
+            cached = await media_cache.get(file_id=file_id)
+            if cached:
+                return await deliver_cached(user, cached)
+
+        # Отмененная обработка не скачивает файл
+        if await is_user_canceled(user):
+            logger.info("Обработка отменена пользователем %s", user.number)
+            return None
+
+        audio_path, digest = await download_media_hashed(media_url)
+        cached = await media_cache.get(digest=digest, file_id=file_id)
+        if cached:
+            return await deliver_cached(user, cached)
+
+        # Суммаризация первых сегментов начинается до окончания
+        # транскрипции остальных
+        summarizer = StreamingSummarizer(user)
+        try:
+            transcription = await transcribe_audio(
+                audio_path, user, on_segment=summarizer.feed
+            )
+            summary = (
+                await summarizer.finish()
+                if transcription and transcription.text.strip() else None
+            )
+        finally:
+            await summarizer.cancel()
 
         if transcription and summary and not await is_user_canceled(user):
-            await update_user_data(user, transcription, summary)
-            await handle_transcription_and_summary(
-                user, transcription, summary
+            transcript_id = await deliver_result(user, transcription, summary)
+            await media_cache.put(
+                digest,
+                CachedResult(
+                    transcription=transcription.text,
+                    summary=summary,
+                    language=transcription.language,
+                    duration_ms=transcription.duration_ms,
+                    transcript_id=transcript_id
+                ),
+                file_id=file_id
             )
-            return transcription, summary
+            return transcription.text, summary
         logger.error("Транскрипция или суммаризация отменена")
     except FileNotFoundError as e:
         logger.error("Файл не найден: %s", e, exc_info=True)
@@ -82,7 +208,8 @@ async def process_media(media_url: str, user: User) -> Tuple[str, str]:
         logger.error("Ошибка в процессе обработки медиа: %s", e, exc_info=True)
         raise
     finally:
-        cleanup_files(audio_path)
+        if audio_path:
+            cleanup_files(audio_path)
 
 
 async def handle_transcription_and_summary(
@@ -97,41 +224,116 @@ async def handle_transcription_and_summary(
     :param transcription: Транскрибированный текст.
     :param summary: Суммаризированный текст.
     """
-    transcription_file_path = save_transcription_as_text(transcription)
-    await whapi_client.send_document(
+    await whapi_client.send_document_bytes(
         user.number,
         TRANSCRIPTION_FILENAME,
-        transcription_file_path,
-        caption=TRANSCRIPTION_MESSAGE
+        transcription.encode('utf-8'),
+        caption=TRANSCRIPTION_MESSAGE,
+        content_type='text/plain'
     )
     await whapi_client.send_message(
         user.number,
         SUMMARY_MESSAGE.format(summary=summary),
         markup=new_audio_keyboard
     )
-    cleanup_files(transcription_file_path)
 
 
-async def start_process(user: User, message: MediaMessage) -> None:
+async def start_process(
+    user: User,
+    message: MediaMessage,
+    lease: str
+) -> None:
     """
-    Обработка медиа сообщения
+    Постановка медиа сообщения в очередь обработки
 
     :param user: Пользователь
     :param message: Медиа сообщение
+    :param lease: Токен аренды активной задачи пользователя
     """
     try:
-        in_process_filter.add_user(user.number)
-        await whapi_client.send_message(user.number, IN_PROCESS_MESSAGE)
-        await process_media(message.link, user)
+        await job_queue.enqueue(
+            MEDIA_JOB,
+            {
+                'number': user.number,
+                'message': asdict(message),
+                'lease': lease
+            }
+        )
     except Exception as e:
-        logger.error("Ошибка в процессе обработки медиа: %s", e, exc_info=True)
+        logger.error("Ошибка постановки медиа в очередь: %s", e, exc_info=True)
+        await active_jobs.release(user.number, lease)
         await whapi_client.send_message(
             user.number,
             ERROR_IN_PROCESS_MESSAGE,
             markup=new_audio_keyboard
         )
-    finally:
-        in_process_filter.remove_user(user.number)
+        return
+    await whapi_client.send_message(user.number, IN_PROCESS_MESSAGE)
+
+
+async def run_media_job(payload: Dict[str, Any]) -> None:
+    """
+    Выполнение задачи обработки медиа из очереди. Если аренда
+    пользователя занята другой задачей, задача отбрасывается: у
+    пользователя не может быть двух одновременных обработок.
+
+    :param payload: Номер пользователя, медиа сообщение и токен аренды
+    """
+    # Без токена release освободил бы чужую аренду
+    lease = payload.get('lease') or uuid.uuid4().hex
+    user = await user_cache.get(payload['number'])
+    if not user:
+        await active_jobs.release(payload['number'], lease)
+        return
+    message = MediaMessage(**payload['message'])
+    # Задачу мог поставить другой узел: аренда продлевается отсюда
+    if not await active_jobs.adopt(user.number, lease):
+        logger.warning(
+            "Задача медиа пользователя %s отброшена: идет другая обработка",
+            user.number
+        )
+        await already_in_process(user)
+        return
+    await process_media(message.link, user, file_id=message.file_id)
+    await active_jobs.release(user.number, lease)
+
+
+async def fail_media_job(payload: Dict[str, Any], error: Exception) -> None:
+    """
+    Обработка окончательной ошибки задачи обработки медиа
+
+    :param payload: Номер пользователя, медиа сообщение и токен аренды
+    :param error: Ошибка
+    """
+    await active_jobs.release(payload['number'], payload.get('lease'))
+    await whapi_client.send_message(
+        payload['number'],
+        ERROR_IN_PROCESS_MESSAGE,
+        markup=new_audio_keyboard
+    )
+
+
+async def restore_in_process_users() -> None:
+    """
+    Восстанавливает аренды пользователей в обработке по задачам,
+    оставшимся в очереди после перезапуска.
+    """
+    for payload in await job_queue.pending_jobs(MEDIA_JOB):
+        lease = payload.get('lease')
+        if lease and not await active_jobs.adopt(payload['number'], lease):
+            logger.warning(
+                "Задача медиа пользователя %s будет отброшена при "
+                "выполнении: аренда занята",
+                payload['number']
+            )
+
+
+job_queue.register(
+    MEDIA_JOB,
+    run_media_job,
+    workers=config.queue_media_workers,
+    on_failure=fail_media_job
+)
 
 
 async def already_in_process(user: User) -> None:
@@ -148,7 +350,7 @@ async def route(user: User, message: MediaMessage) -> bool:
     :param user: Пользователь
     :param message: Медиа сообщение
     """
-    if in_process_filter.user_exists(user.number):
+    if await active_jobs.is_active(user.number):
         await already_in_process(user)
         return True
 
@@ -156,8 +358,13 @@ async def route(user: User, message: MediaMessage) -> bool:
         if (
             message.mime_type in MIME_TYPE_FILTER
             and user.state == UserState.NEW_AUDIO
-            and not in_process_filter.user_exists(user.number)
         ):
-            await start_process(user, message)
+            # Захват атомарен: из двух одновременных медиа сообщений
+            # обработку запускает только одно
+            lease = await active_jobs.acquire(user.number)
+            if lease is None:
+                await already_in_process(user)
+                return True
+            await start_process(user, message, lease)
             return True
     return False
@@ -2,7 +2,8 @@
 from app.whapi.message import Message, MessageType
 from app.whapi import whapi_client
 from app.database.models.user import User
-from app.database.crud import CRUD
+from app.database import activity_buffer, content_store
+from app.services import answer_cache, transcript_index
 from app.services.question import get_answer
 from app.utils.logger import setup_logger
 from keyboards import new_audio_keyboard
@@ -22,7 +23,10 @@ async def question_handler(user: User, message: Message) -> None:
     :param user: Пользователь
     :param message: Сообщение
     """
-    if not user.last_transcription_text:
+    transcript = await content_store.find(
+        user.number, user.active_transcript_id
+    )
+    if transcript is None:
         await whapi_client.send_message(
             user.number,
             WITHOUT_TRANSCRIPTION_MESSAGE,
@@ -30,15 +34,26 @@ async def question_handler(user: User, message: Message) -> None:
         )
         return
 
+    answer = answer_cache.get(transcript.id, message.text)
+    if answer is not None:
+        await whapi_client.send_message(
+            user.number, answer, markup=new_audio_keyboard
+        )
+        logger.info("Ответ из кэша отправлен пользователю %s", user.number)
+        return
+
     await whapi_client.send_message(
         user.number,
         RESPONSE_GENERATION_MESSAGE
     )
 
     try:
-        answer = await get_answer(user.last_transcription_text, message.text)
-        crud = CRUD(User)
-        await crud.update(user, gpt_requests=user.gpt_requests + 1)
+        context = await transcript_index.context(
+            user.number, transcript.id, message.text
+        )
+        answer = await get_answer(context, message.text)
+        activity_buffer.increment(user.number, 'gpt_requests')
+        answer_cache.put(transcript.id, message.text, answer)
     except Exception as e:
         logger.error("Произошла ошибка при генерации ответа: %s", e)
         answer = ERROR_RESPONSE_GENERATION_MESSAGE
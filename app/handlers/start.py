@@ -3,7 +3,7 @@ from app.whapi.message import Message, MessageType
 from app.whapi import whapi_client
 from app.database.models.user import User
 from app.database.state.user import UserState
-from app.database.crud import CRUD
+from app.database import user_cache
 from app.utils.logger import setup_logger
 from commands import START_COMMAND
 from keyboards import start_keyboard
@@ -19,8 +19,7 @@ async def send_welcome_message(user: User) -> None:
     :param user: Пользователь
     """
     if user.state == UserState.START:
-        crud = CRUD(User)
-        await crud.update(user, state=None)
+        await user_cache.update(user, state=None)
 
     await whapi_client.send_message(
         user.number, START_MESSAGE, markup=start_keyboard
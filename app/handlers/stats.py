@@ -1,6 +1,7 @@
 """Обработчик событий статистики."""
 from typing import Dict
 from sqlalchemy import select, func
+from app.database import activity_buffer
 from app.database.engine import async_session_factory
 from app.database.models.user import User
 from app.whapi import whapi_client
@@ -18,6 +19,7 @@ async def get_stats() -> Dict[str, int]:
 
     :return: Статистика пользователей
     """
+    await activity_buffer.flush()
     async with async_session_factory() as session:
         registered_users = await session.scalar(
             select(func.count(User.number))
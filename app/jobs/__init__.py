@@ -0,0 +1,11 @@
+"""Инициализация очереди фоновых задач."""
+from .queue import JobQueue
+from config import config
+
+job_queue = JobQueue(
+    max_attempts=config.queue_max_attempts,
+    retry_base_delay=config.queue_retry_base_delay,
+    poll_interval=config.queue_poll_interval,
+    lease_ttl=config.queue_lease_ttl,
+    heartbeat_interval=config.queue_heartbeat_interval
+)
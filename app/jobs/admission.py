@@ -0,0 +1,83 @@
+"""Контроль допуска новых задач в очередь."""
+from dataclasses import dataclass
+from typing import Dict
+from app.utils.logger import setup_logger
+from .queue import JobQueue
+
+logger = setup_logger(__name__)
+
+
+class Admission:
+    """Решения контроля допуска."""
+    ACCEPT = 'accept'
+    DEFER = 'defer'
+    REJECT = 'reject'
+
+
+@dataclass
+class AdmissionDecision:
+    """Решение по входящей задаче."""
+    action: str
+    delay: float = 0
+
+
+class AdmissionController:
+    """
+    Ограничивает количество незавершенных задач в очереди.
+
+    Для каждого класса входящих сообщений задается тип задачи, глубина
+    очереди которого учитывается, и лимит. При заполнении очереди выше
+    порога отложения новые задачи откладываются, при достижении лимита
+    (или общего бюджета) - отклоняются. Глубина очереди общая для всех
+    реплик, поэтому лимиты действуют на весь кластер.
+    """
+
+    def __init__(
+        self,
+        queue: JobQueue,
+        kinds: Dict[str, str],
+        limits: Dict[str, int],
+        max_in_flight: int,
+        defer_threshold: float = 0.8,
+        defer_delay: float = 10
+    ) -> None:
+        """
+        Инициализация контроля допуска.
+
+        :param queue: Очередь задач.
+        :param kinds: Тип задачи для каждого класса сообщений.
+        :param limits: Лимит незавершенных задач для каждого класса.
+        :param max_in_flight: Общий лимит незавершенных задач.
+        :param defer_threshold: Доля лимита, после которой задачи
+        откладываются.
+        :param defer_delay: Задержка отложенной задачи (секунды).
+        """
+        self.queue = queue
+        self.kinds = kinds
+        self.limits = limits
+        self.max_in_flight = max_in_flight
+        self.defer_threshold = defer_threshold
+        self.defer_delay = defer_delay
+
+    def decide(self, message_class: str) -> AdmissionDecision:
+        """
+        Принять решение по входящему сообщению.
+
+        :param message_class: Класс сообщения.
+        :return: Решение.
+        """
+        total = self.queue.depth()
+        depth = self.queue.depth(self.kinds[message_class])
+        limit = self.limits[message_class]
+
+        if total >= self.max_in_flight or depth >= limit:
+            logger.warning(
+                "Очередь переполнена (%s: %d/%d, всего: %d/%d)",
+                message_class, depth, limit, total, self.max_in_flight
+            )
+            return AdmissionDecision(Admission.REJECT)
+
+        load = max(depth / limit, total / self.max_in_flight)
+        if load >= self.defer_threshold:
+            return AdmissionDecision(Admission.DEFER, self.defer_delay * load)
+        return AdmissionDecision(Admission.ACCEPT)
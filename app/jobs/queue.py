@@ -0,0 +1,509 @@
+"""Персистентная очередь фоновых задач."""
+import json
+import uuid
+import asyncio
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+from sqlalchemy import select, update, delete, func, or_
+from sqlalchemy.orm import sessionmaker
+from app.database.engine import async_session_factory
+from app.database.models.job import Job
+from app.database.state.job import JobStatus
+from app.utils.clock import utcnow
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+JobHandler = Callable[[Dict[str, Any]], Awaitable[None]]
+FailureHandler = Callable[[Dict[str, Any], Exception], Awaitable[None]]
+
+
+@dataclass
+class _Registration:
+    """Обработчик задач определенного типа."""
+    handler: JobHandler
+    on_failure: Optional[FailureHandler]
+    workers: int
+
+
+@dataclass
+class ClaimedJob:
+    """Задача, взятая воркером в работу."""
+    id: int
+    kind: str
+    payload: Dict[str, Any]
+    attempts: int
+    max_attempts: int
+
+
+class JobQueue:
+    """
+    Очередь фоновых задач, хранящаяся в базе данных.
+
+    Взятая задача арендуется узлом (claimed_by, lease_until), и аренда
+    продлевается, пока задача выполняется. Задачи с истекшей арендой
+    (узел упал или завис) периодически возвращаются в pending любым
+    узлом, а задачи живых реплик не трогаются. Для каждого типа задач
+    запускается свой пул воркеров. Неудачные задачи повторяются с
+    экспоненциальной задержкой, после исчерпания попыток переходят в
+    состояние failed. Время хранится в UTC, чтобы сроки аренд и
+    повторов совпадали на репликах с разными часовыми поясами. Глубина
+    очереди берется из таблицы задач и обновляется вместе с продлением
+    аренд.
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        retry_base_delay: float = 5,
+        retry_max_delay: float = 300,
+        poll_interval: float = 1,
+        lease_ttl: float = 120,
+        heartbeat_interval: float = 30,
+        session_factory: sessionmaker = async_session_factory
+    ) -> None:
+        """
+        Инициализация очереди.
+
+        :param max_attempts: Максимальное число попыток выполнения задачи.
+        :param retry_base_delay: Базовая задержка повтора (секунды).
+        :param retry_max_delay: Максимальная задержка повтора (секунды).
+        :param poll_interval: Интервал опроса базы данных (секунды).
+        :param lease_ttl: Срок аренды задачи без продления (секунды).
+        :param heartbeat_interval: Интервал продления аренд, возврата
+        задач с истекшей арендой и обновления глубины очереди (секунды).
+        :param session_factory: Фабрика сессий для использования.
+        """
+        self.max_attempts = max_attempts
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self.poll_interval = poll_interval
+        self.lease_ttl = lease_ttl
+        self.heartbeat_interval = heartbeat_interval
+        self.session_factory = session_factory
+        self.node_id = uuid.uuid4().hex
+        self._running: Set[int] = set()
+        self._heartbeat: Optional[asyncio.Task] = None
+        self._registrations: Dict[str, _Registration] = {}
+        self._events: Dict[str, asyncio.Event] = {}
+        self._workers: List[asyncio.Task] = []
+        self._depth: Dict[str, int] = {}
+
+    def register(
+        self,
+        kind: str,
+        handler: JobHandler,
+        workers: int = 1,
+        on_failure: Optional[FailureHandler] = None
+    ) -> None:
+        """
+        Зарегистрировать обработчик задач.
+
+        :param kind: Тип задачи.
+        :param handler: Обработчик, получающий полезную нагрузку задачи.
+        :param workers: Количество воркеров для задач этого типа.
+        :param on_failure: Обработчик окончательной ошибки задачи.
+        """
+        self._registrations[kind] = _Registration(
+            handler=handler, on_failure=on_failure, workers=workers
+        )
+
+    async def enqueue(
+        self,
+        kind: str,
+        payload: Dict[str, Any],
+        delay: float = 0
+    ) -> int:
+        """
+        Добавить задачу в очередь.
+
+        :param kind: Тип задачи.
+        :param payload: Полезная нагрузка (сериализуется в JSON).
+        :param delay: Задержка перед выполнением (секунды).
+        :return: ID задачи.
+        """
+        now = utcnow()
+        async with self.session_factory() as session:
+            job = Job(
+                kind=kind,
+                payload=json.dumps(payload, ensure_ascii=False),
+                status=JobStatus.PENDING,
+                attempts=0,
+                max_attempts=self.max_attempts,
+                run_at=now + timedelta(seconds=delay),
+                created_at=now,
+                updated_at=now
+            )
+            session.add(job)
+            await session.commit()
+            job_id = job.id
+
+        self._depth[kind] = self._depth.get(kind, 0) + 1
+        if kind in self._events and not delay:
+            self._events[kind].set()
+        return job_id
+
+    def depth(self, kind: Optional[str] = None) -> int:
+        """
+        Количество незавершенных задач (ожидающих и выполняемых) всех
+        узлов. Значение подсчитывается по таблице задач раз в
+        heartbeat_interval, между подсчетами учитываются задачи,
+        добавленные и завершенные этим узлом.
+
+        :param kind: Тип задачи. Если не указан - по всем типам.
+        :return: Глубина очереди.
+        """
+        if kind is None:
+            return sum(self._depth.values())
+        return self._depth.get(kind, 0)
+
+    def _decrease_depth(self, kind: str) -> None:
+        """
+        Уменьшить счетчик незавершенных задач.
+
+        :param kind: Тип задачи.
+        """
+        self._depth[kind] = max(self._depth.get(kind, 0) - 1, 0)
+
+    def _lease_until(self) -> datetime:
+        return utcnow() + timedelta(seconds=self.lease_ttl)
+
+    async def start(self) -> None:
+        """Восстановить прерванные задачи и запустить воркеры."""
+        recovered = await self._recover()
+        if recovered:
+            logger.info("Восстановлено прерванных задач: %d", recovered)
+        await self._refresh_depth()
+        self._heartbeat = asyncio.create_task(
+            self._run_heartbeat(), name="job-heartbeat"
+        )
+
+        for kind, registration in self._registrations.items():
+            self._events[kind] = asyncio.Event()
+            for index in range(registration.workers):
+                self._workers.append(asyncio.create_task(
+                    self._worker(kind, registration),
+                    name=f"job-worker-{kind}-{index}"
+                ))
+            logger.info(
+                "Запущено воркеров для задач %s: %d",
+                kind, registration.workers
+            )
+
+    async def stop(self) -> None:
+        """Остановить воркеры. Незавершенные задачи возвращаются в очередь."""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers.clear()
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+            await asyncio.gather(self._heartbeat, return_exceptions=True)
+            self._heartbeat = None
+        logger.info("Воркеры очереди задач остановлены.")
+
+    async def pending_jobs(self, kind: str) -> List[Dict[str, Any]]:
+        """
+        Получить полезную нагрузку ожидающих задач.
+
+        :param kind: Тип задачи.
+        :return: Список полезных нагрузок.
+        """
+        async with self.session_factory() as session:
+            payloads = await session.scalars(
+                select(Job.payload).where(
+                    Job.kind == kind,
+                    Job.status.in_([JobStatus.PENDING, JobStatus.RUNNING])
+                )
+            )
+            return [json.loads(payload) for payload in payloads]
+
+    async def _count_active(self) -> Dict[str, int]:
+        """
+        Подсчитать незавершенные задачи по типам.
+
+        :return: Количество задач по типам.
+        """
+        async with self.session_factory() as session:
+            rows = await session.execute(
+                select(Job.kind, func.count(Job.id))
+                .where(Job.status.in_([JobStatus.PENDING, JobStatus.RUNNING]))
+                .group_by(Job.kind)
+            )
+            return {kind: count for kind, count in rows}
+
+    async def _refresh_depth(self) -> None:
+        """Обновить глубину очереди по таблице задач."""
+        self._depth = await self._count_active()
+
+    async def _recover(self) -> int:
+        """
+        Вернуть в очередь задачи, аренда которых истекла: узел-владелец
+        упал или не продлевает аренду. Задачи без аренды взяты узлами
+        до появления аренд.
+
+        :return: Количество восстановленных задач.
+        """
+        now = utcnow()
+        async with self.session_factory() as session:
+            result = await session.execute(
+                update(Job)
+                .where(
+                    Job.status == JobStatus.RUNNING,
+                    or_(Job.lease_until.is_(None), Job.lease_until < now)
+                )
+                .values(
+                    status=JobStatus.PENDING,
+                    claimed_by=None,
+                    lease_until=None,
+                    updated_at=now
+                )
+            )
+            await session.commit()
+            return result.rowcount
+
+    async def _renew(self) -> None:
+        """Продлить аренды задач, выполняемых этим узлом."""
+        if not self._running:
+            return
+        async with self.session_factory() as session:
+            await session.execute(
+                update(Job)
+                .where(
+                    Job.id.in_(list(self._running)),
+                    Job.claimed_by == self.node_id,
+                    Job.status == JobStatus.RUNNING
+                )
+                .values(lease_until=self._lease_until())
+            )
+            await session.commit()
+
+    async def _run_heartbeat(self) -> None:
+        """
+        Цикл продления аренд, возврата задач с истекшей арендой и
+        обновления глубины очереди.
+        """
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            try:
+                await self._renew()
+                recovered = await self._recover()
+                await self._refresh_depth()
+            except Exception as e:
+                logger.error(
+                    "Ошибка продления аренд задач: %s", e, exc_info=True
+                )
+                continue
+            if recovered:
+                logger.warning(
+                    "Возвращено задач с истекшей арендой: %d", recovered
+                )
+                for event in self._events.values():
+                    event.set()
+
+    async def _claim(self, kind: str) -> Optional[ClaimedJob]:
+        """
+        Атомарно взять в работу очередную готовую задачу.
+
+        :param kind: Тип задачи.
+        :return: Задача или None, если готовых задач нет.
+        """
+        while True:
+            now = utcnow()
+            async with self.session_factory() as session:
+                job = await session.scalar(
+                    select(Job)
+                    .where(
+                        Job.kind == kind,
+                        Job.status == JobStatus.PENDING,
+                        Job.run_at <= now
+                    )
+                    .order_by(Job.run_at, Job.id)
+                    .limit(1)
+                    # PostgreSQL: реплики не ждут строки, взятые другими
+                    # узлами; SQLite блокирует базу целиком и игнорирует
+                    .with_for_update(skip_locked=True)
+                )
+                if job is None:
+                    return None
+                claimed = ClaimedJob(
+                    id=job.id,
+                    kind=job.kind,
+                    payload=json.loads(job.payload),
+                    attempts=job.attempts + 1,
+                    max_attempts=job.max_attempts
+                )
+
+                result = await session.execute(
+                    update(Job)
+                    .where(Job.id == job.id, Job.status == JobStatus.PENDING)
+                    .values(
+                        status=JobStatus.RUNNING,
+                        attempts=Job.attempts + 1,
+                        claimed_by=self.node_id,
+                        lease_until=self._lease_until(),
+                        updated_at=now
+                    )
+                )
+                await session.commit()
+                if result.rowcount == 1:
+                    return claimed
+            # Задачу забрал другой воркер, пробуем следующую
+
+    async def _complete(self, job: ClaimedJob) -> None:
+        """
+        Удалить успешно выполненную задачу.
+
+        :param job: Задача.
+        """
+        async with self.session_factory() as session:
+            await session.execute(
+                delete(Job).where(
+                    Job.id == job.id, Job.claimed_by == self.node_id
+                )
+            )
+            await session.commit()
+        self._decrease_depth(job.kind)
+
+    async def _release(self, job: ClaimedJob) -> None:
+        """
+        Вернуть прерванную задачу в очередь без учета попытки.
+
+        :param job: Задача.
+        """
+        async with self.session_factory() as session:
+            await session.execute(
+                update(Job)
+                .where(Job.id == job.id, Job.claimed_by == self.node_id)
+                .values(
+                    status=JobStatus.PENDING,
+                    attempts=Job.attempts - 1,
+                    claimed_by=None,
+                    lease_until=None,
+                    updated_at=utcnow()
+                )
+            )
+            await session.commit()
+
+    async def _retry_or_fail(
+        self,
+        job: ClaimedJob,
+        registration: _Registration,
+        error: Exception
+    ) -> None:
+        """
+        Запланировать повтор задачи или пометить ее как неудачную.
+
+        :param job: Задача.
+        :param registration: Обработчик задачи.
+        :param error: Ошибка выполнения.
+        """
+        now = utcnow()
+        values = {
+            'last_error': repr(error)[:1000],
+            'claimed_by': None,
+            'lease_until': None,
+            'updated_at': now
+        }
+        failed = job.attempts >= job.max_attempts
+        if failed:
+            values['status'] = JobStatus.FAILED
+        else:
+            delay = min(
+                self.retry_base_delay * 2 ** (job.attempts - 1),
+                self.retry_max_delay
+            )
+            values['status'] = JobStatus.PENDING
+            values['run_at'] = now + timedelta(seconds=delay)
+
+        async with self.session_factory() as session:
+            await session.execute(
+                update(Job)
+                .where(Job.id == job.id, Job.claimed_by == self.node_id)
+                .values(**values)
+            )
+            await session.commit()
+
+        if not failed:
+            logger.warning(
+                "Задача %s #%d завершилась ошибкой (попытка %d/%d), "
+                "повтор через %.0f с: %s",
+                job.kind, job.id, job.attempts, job.max_attempts,
+                (values['run_at'] - now).total_seconds(), error
+            )
+            return
+
+        self._decrease_depth(job.kind)
+        logger.error(
+            "Задача %s #%d окончательно завершилась ошибкой: %s",
+            job.kind, job.id, error
+        )
+        if registration.on_failure:
+            try:
+                await registration.on_failure(job.payload, error)
+            except Exception as e:
+                logger.error(
+                    "Ошибка в обработчике неудачи задачи %s #%d: %s",
+                    job.kind, job.id, e, exc_info=True
+                )
+
+    async def _wait_for_jobs(self, kind: str) -> None:
+        """
+        Дождаться новой задачи или истечения интервала опроса.
+
+        :param kind: Тип задачи.
+        """
+        event = self._events[kind]
+        try:
+            await asyncio.wait_for(event.wait(), self.poll_interval)
+        except asyncio.TimeoutError:
+            pass
+        event.clear()
+
+    async def _worker(self, kind: str, registration: _Registration) -> None:
+        """
+        Цикл воркера: берет задачи указанного типа и выполняет их.
+
+        :param kind: Тип задачи.
+        :param registration: Обработчик задачи.
+        """
+        while True:
+            try:
+                job = await self._claim(kind)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(
+                    "Ошибка получения задачи %s: %s", kind, e, exc_info=True
+                )
+                job = None
+
+            if job is None:
+                await self._wait_for_jobs(kind)
+                continue
+
+            self._running.add(job.id)
+            try:
+                await registration.handler(job.payload)
+            except asyncio.CancelledError:
+                self._running.discard(job.id)
+                await asyncio.shield(self._release(job))
+                raise
+            except Exception as e:
+                error = e
+            else:
+                error = None
+
+            try:
+                if error is None:
+                    await self._complete(job)
+                else:
+                    await self._retry_or_fail(job, registration, error)
+            except Exception as e:
+                logger.error(
+                    "Ошибка обновления задачи %s #%d: %s",
+                    kind, job.id, e, exc_info=True
+                )
+            finally:
+                self._running.discard(job.id)
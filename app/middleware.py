@@ -1,12 +1,20 @@
 """Модуль middleware для обработки запросов."""
-from typing import Union
-from sqlalchemy import func
+import asyncio
+from typing import Dict, List, Tuple, Union
+from sqlalchemy import select
 from sqlalchemy.exc import SQLAlchemyError
 from app.handlers import handler_routing
+from app.jobs import job_queue
+from app.utils.clock import utcnow
 from app.utils.logger import setup_logger
 from app.whapi.user import User as WAUser
-from app.whapi.message import Message, MediaMessage, ReplyMessage
-from app.database.crud import CRUD
+from app.whapi.message import (
+    Message,
+    MediaMessage,
+    ReplyMessage,
+    MessageType
+)
+from app.database import user_cache, activity_buffer
 from app.database.models.user import User
 from app.database.state.user import UserState
 from config import config
@@ -14,68 +22,211 @@ from config import config
 
 logger = setup_logger(__name__)
 
+IncomingMessage = Union[Message, MediaMessage, ReplyMessage]
+
+# Сообщение вебхука: пользователь, разобранное сообщение и исходный словарь
+WebhookEntry = Tuple[WAUser, IncomingMessage, dict]
+
+WEBHOOK_JOB = 'webhook'
+
+# Номер попытки для сообщений, повторно поставленных в очередь
+ATTEMPT_KEY = '_attempt'
+
 
 async def middleware(body: dict) -> None:
     """
-    Middleware для обработки событий
+    Middleware для обработки событий. Обрабатываются все сообщения
+    вебхука: сообщения разных пользователей - параллельно, сообщения
+    одного пользователя - последовательно, в порядке получения.
+
+    Ошибка одного отправителя не повторяет весь вебхук: его
+    необработанные сообщения ставятся в очередь отдельной задачей, а
+    сообщения остальных отправителей считаются обработанными.
 
     :param body: Вебхук
     """
-    message_dict = body.get('messages', [])[0]
-    if not message_dict:
-        logger.warning("Отсутствует сообщение в вебхуке")
-        return
-    if message_dict.get('from_me'):
+    messages_by_user = _group_messages(body.get('messages', []))
+    if not messages_by_user:
+        logger.warning("Отсутствуют сообщения в вебхуке")
         return
 
     try:
-        wa_user = _get_wa_user(message_dict)
-        message = _get_message(message_dict)
-        if not message:
-            return
-
-        user = await _ensure_user_in_db(wa_user)
-        await handler_routing(user, message)
+        users = await _ensure_users_in_db(
+            [entries[-1][0] for entries in messages_by_user.values()]
+        )
     except SQLAlchemyError as e:
         logger.error("Ошибка при работе с базой данных: %s", e, exc_info=True)
         raise
-    except Exception as e:
-        logger.error("Ошибка в middleware: %s", e, exc_info=True)
-        raise
 
+    results = await asyncio.gather(*(
+        _dispatch_user_messages(users[number], entries)
+        for number, entries in messages_by_user.items()
+    ))
+    failed = [entry for remaining in results for entry in remaining]
+    if failed:
+        await _requeue_failed(body, failed)
 
-async def _ensure_user_in_db(wa_user: WAUser) -> User:
+
+async def _requeue_failed(body: dict, failed: List[dict]) -> None:
     """
-    Гарантирует, что пользователь зарегистрирован в базе данных.
+    Ставит необработанные сообщения в очередь отдельной задачей с
+    экспоненциальной задержкой. После исчерпания попыток сообщения
+    отбрасываются.
 
-    :param wp_user: Пользователь WhatsApp
-    :return: Пользователь
+    :param body: Исходный вебхук
+    :param failed: Необработанные сообщения
     """
-    user_crud = CRUD(User)
-    try:
-        user = await user_crud.get(wa_user.number)
-
-        user_data = {
-            'name': wa_user.from_name,
-            'updated_at': func.now()
-        }
-
-        if not user:
-            user = await user_crud.create(
-                number=wa_user.number,
-                is_admin=wa_user.number == config.admin_number,
-                state=UserState.START,
-                **user_data
+    attempt = body.get(ATTEMPT_KEY, 1)
+    if attempt >= job_queue.max_attempts:
+        logger.error(
+            "Сообщения отброшены после %d попыток: %d",
+            attempt, len(failed)
+        )
+        return
+    delay = min(
+        job_queue.retry_base_delay * 2 ** (attempt - 1),
+        job_queue.retry_max_delay
+    )
+    await job_queue.enqueue(
+        WEBHOOK_JOB,
+        {**body, 'messages': failed, ATTEMPT_KEY: attempt + 1},
+        delay=delay
+    )
+    logger.warning(
+        "Необработанных сообщений: %d, повтор через %.0f с",
+        len(failed), delay
+    )
+
+
+def _group_messages(
+    message_dicts: List[dict]
+) -> Dict[int, List[WebhookEntry]]:
+    """
+    Разбор сообщений вебхука с группировкой по отправителю.
+
+    :param message_dicts: Сообщения вебхука
+    :return: Сообщения по номерам отправителей в порядке получения
+    """
+    messages_by_user: Dict[int, List[WebhookEntry]] = {}
+    for message_dict in message_dicts:
+        if not message_dict or message_dict.get('from_me'):
+            continue
+        try:
+            wa_user = _get_wa_user(message_dict)
+            message = _get_message(message_dict)
+            number = int(wa_user.number)
+        except (TypeError, ValueError, IndexError) as e:
+            logger.warning("Некорректное сообщение в вебхуке: %s", e)
+            continue
+        if not message:
+            continue
+        messages_by_user.setdefault(number, []).append(
+            (wa_user, message, message_dict)
+        )
+    return messages_by_user
+
+
+async def _dispatch_user_messages(
+    user: User,
+    entries: List[WebhookEntry]
+) -> List[dict]:
+    """
+    Последовательная обработка сообщений одного пользователя. После
+    ошибки обработка останавливается, чтобы не нарушить порядок.
+
+    :param user: Пользователь
+    :param entries: Сообщения пользователя в порядке получения
+    :return: Исходные словари необработанных сообщений
+    """
+    for index, (_, message, _) in enumerate(entries):
+        try:
+            if index:
+                # Предыдущее сообщение могло изменить состояние
+                user = await user_cache.get(user.number) or user
+            await handler_routing(user, message)
+        except Exception as e:
+            logger.error(
+                "Ошибка в middleware для %s: %s", user.number, e, exc_info=True
             )
-            logger.info("%s зарегистрирован в базе данных.", wa_user.number)
-        else:
-            user = await user_crud.update(user, **user_data)
-            logger.info("%s обновлен в базе данных.", wa_user.number)
+            return [message_dict for _, _, message_dict in entries[index:]]
+    return []
 
-        return user
-    except SQLAlchemyError as e:
-        logger.error("Ошибка при работе с базой данных: %s", e, exc_info=True)
-        raise
+
+async def _ensure_users_in_db(wa_users: List[WAUser]) -> Dict[int, User]:
+    """
+    Гарантирует, что пользователи зарегистрированы в базе данных.
+    Пользователи берутся из кэша (изменчивые поля перечитываются одним
+    запросом), отсутствующие загружаются одним запросом, новые создаются одной транзакцией. Имя и updated_at
+    записываются отложенно через буфер активности.
+
+    :param wa_users: Пользователи WhatsApp
+    :return: Пользователи по номерам
+    """
+    numbers = [int(wa_user.number) for wa_user in wa_users]
+    users = await user_cache.refresh(user_cache.get_many_cached(numbers))
+    missing = [number for number in numbers if number not in users]
+
+    if missing:
+        users.update(await _load_or_create_users(
+            [
+                (number, wa_user)
+                for number, wa_user in zip(numbers, wa_users)
+                if number in missing
+            ]
+        ))
+
+    for number, wa_user in zip(numbers, wa_users):
+        activity_buffer.touch(number, wa_user.from_name)
+    return users
+
+
+async def _load_or_create_users(
+    wa_users: List[Tuple[int, WAUser]]
+) -> Dict[int, User]:
+    """
+    Загружает пользователей одним запросом и создает отсутствующих.
+
+    :param wa_users: Номера и пользователи WhatsApp
+    :return: Пользователи по номерам
+    """
+    async with user_cache.crud.get_session() as session:
+        try:
+            users = {
+                user.number: user
+                for user in await session.scalars(
+                    select(User).where(
+                        User.number.in_([number for number, _ in wa_users])
+                    )
+                )
+            }
+            now = utcnow()
+            for number, wa_user in wa_users:
+                if number in users:
+                    continue
+                users[number] = User(
+                    number=number,
+                    name=wa_user.from_name,
+                    uploaded_audios=0,
+                    gpt_requests=0,
+                    is_admin=wa_user.number == config.admin_number,
+                    subscription_status="free",
+                    state=UserState.START,
+                    created_at=now,
+                    updated_at=now
+                )
+                session.add(users[number])
+                logger.info("%s зарегистрирован в базе данных.", number)
+            await session.commit()
+        except SQLAlchemyError as e:
+            await session.rollback()
+            logger.error(
+                "Ошибка при работе с базой данных: %s", e, exc_info=True
+            )
+            raise
+
+    for user in users.values():
+        user_cache.put(user)
+    return users
 
 
 def _get_wa_user(message_dict) -> WAUser:
@@ -93,9 +244,7 @@ def _get_wa_user(message_dict) -> WAUser:
     return wa_user
 
 
-def _get_message(
-    message_dict: dict
-) -> Union[Message, MediaMessage, ReplyMessage]:
+def _get_message(message_dict: dict) -> IncomingMessage:
     """Получение сообщения
 
     :param message_dict: Вебхук
@@ -110,7 +259,7 @@ def _get_message(
 
     if message_type == 'text':
         return Message.create(message_dict, timestamp)
-    elif message_type in {'voice', 'audio', 'document', 'video'}:
+    elif message_type in MessageType.MEDIA:
         return MediaMessage.create(message_dict, message_type, timestamp)
     elif message_type == 'reply':
         return ReplyMessage.create(message_dict, timestamp)
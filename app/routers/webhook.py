@@ -1,14 +1,103 @@
 """Вебхук для WHAPI. (прием запросов)"""
 import asyncio
-from typing import Dict
+from typing import Dict, Set
 from fastapi import APIRouter, Request
-from app.middleware import middleware
+from app.handlers.process import MEDIA_JOB
+from app.jobs import job_queue
+from app.jobs.admission import Admission, AdmissionController
+from app.middleware import WEBHOOK_JOB, middleware
 from app.utils.logger import setup_logger
+from app.whapi import whapi_client
+from app.whapi.message import MessageType
+from config import config
+from messages import BUSY_MESSAGE
 
 logger = setup_logger(__name__)
 
 router = APIRouter()
 
+# Классы входящих сообщений для контроля допуска
+MEDIA_CLASS = 'media'
+TEXT_CLASS = 'text'
+
+# Не более стольких одновременных рассылок о перегрузке: при перегрузке
+# остальные отклоненные вебхуки остаются без уведомления
+MAX_BUSY_NOTIFICATIONS = 100
+
+_busy_notifications: Set[asyncio.Task] = set()
+
+job_queue.register(
+    WEBHOOK_JOB, middleware, workers=config.queue_webhook_workers
+)
+
+admission = AdmissionController(
+    job_queue,
+    kinds={MEDIA_CLASS: MEDIA_JOB, TEXT_CLASS: WEBHOOK_JOB},
+    limits={
+        MEDIA_CLASS: config.admission_max_media_jobs,
+        TEXT_CLASS: config.admission_max_text_jobs
+    },
+    max_in_flight=config.admission_max_in_flight,
+    defer_threshold=config.admission_defer_percent / 100,
+    defer_delay=config.admission_defer_delay
+)
+
+
+def _incoming_messages(body: dict) -> list:
+    """
+    Входящие (не отправленные ботом) сообщения вебхука.
+
+    :param body: Вебхук
+    :return: Список сообщений
+    """
+    return [
+        message for message in body.get('messages', [])
+        if not message.get('from_me')
+    ]
+
+
+def _message_class(messages: list) -> str:
+    """
+    Определение класса вебхука для контроля допуска.
+
+    :param messages: Входящие сообщения
+    :return: Класс сообщений
+    """
+    if any(message.get('type') in MessageType.MEDIA for message in messages):
+        return MEDIA_CLASS
+    return TEXT_CLASS
+
+
+async def _notify_busy(messages: list) -> None:
+    """
+    Уведомление отправителей о перегрузке.
+
+    :param messages: Входящие сообщения
+    """
+    for number in {message.get('from') for message in messages}:
+        try:
+            await whapi_client.send_message(number, BUSY_MESSAGE)
+        except Exception as e:
+            logger.error(
+                "Не удалось отправить сообщение о перегрузке %s: %s",
+                number, e
+            )
+
+
+def _reject(messages: list) -> None:
+    """
+    Уведомление отправителей о перегрузке в фоне, чтобы ответ вебхуку
+    не ждал отправки сообщений.
+
+    :param messages: Входящие сообщения
+    """
+    if len(_busy_notifications) >= MAX_BUSY_NOTIFICATIONS:
+        logger.warning("Уведомление о перегрузке пропущено")
+        return
+    task = asyncio.create_task(_notify_busy(messages))
+    _busy_notifications.add(task)
+    task.add_done_callback(_busy_notifications.discard)
+
 
 @router.post("/webhook")
 async def webhook(request: Request) -> Dict[str, str]:
@@ -19,8 +108,16 @@ async def webhook(request: Request) -> Dict[str, str]:
     :return: Ответ
     """
     body = await request.json()
+    messages = _incoming_messages(body)
+    if not messages:
+        return {"message": "ok"}
+
     try:
-        asyncio.create_task(middleware(body))
+        decision = admission.decide(_message_class(messages))
+        if decision.action == Admission.REJECT:
+            _reject(messages)
+            return {"message": "busy"}
+        await job_queue.enqueue(WEBHOOK_JOB, body, delay=decision.delay)
     except Exception as e:
         logger.error("Ошибка обработки веб хука: %s", e, exc_info=True)
         return {"message": f"error: {str(e)}"}
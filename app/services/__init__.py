@@ -0,0 +1,55 @@
+"""Инициализация сервисов."""
+from .retrieval import OpenAIEmbedder, TranscriptIndex
+from .answer_cache import AnswerCache
+from .transcription_backends import create_backend
+from app.database import content_store
+from app.utils import audio_executor, openai_gateway
+from config import config
+
+transcript_index = TranscriptIndex(
+    store=content_store,
+    embedder=OpenAIEmbedder(
+        openai_gateway,
+        model=config.embedding_model,
+        dimensions=config.embedding_dimensions,
+        batch_size=config.embedding_batch_size
+    ),
+    chunk_chars=config.rag_chunk_chars,
+    overlap_chars=config.rag_chunk_overlap_chars,
+    k=config.rag_top_k
+)
+
+answer_cache = AnswerCache(
+    max_size=config.answer_cache_size,
+    ttl=config.answer_cache_ttl,
+    similarity=config.answer_cache_similarity / 100
+)
+
+_backend_options = {
+    'openai': {
+        'gateway': openai_gateway,
+        'executor': audio_executor,
+        # Максимальная длительность сегмента, при которой mp3 с заданным
+        # битрейтом укладывается в целевой размер загрузки Whisper
+        'max_segment_ms': (
+            config.whisper_chunk_target_mb * 1024 * 1024 * 8
+            // config.whisper_bitrate_kbps
+        ),
+        'bitrate': f"{config.whisper_bitrate_kbps}k",
+    },
+    'local': {
+        'model': config.local_whisper_model,
+        'device': config.local_whisper_device,
+        'compute_type': config.local_whisper_compute_type,
+        'workers': config.local_whisper_workers,
+        'cpu_threads': config.local_whisper_cpu_threads,
+        'beam_size': config.local_whisper_beam_size,
+        'batch_size': config.local_whisper_batch_size,
+        'max_segment_ms': config.local_whisper_segment_s * 1000,
+    },
+}
+
+transcription_backend = create_backend(
+    config.transcribe_backend,
+    **_backend_options.get(config.transcribe_backend, {})
+)
@@ -0,0 +1,198 @@
+"""Кэш ответов на вопросы по транскрипциям."""
+import re
+import time
+from collections import OrderedDict
+from typing import Dict, FrozenSet, Optional, Tuple
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Все, кроме букв, цифр и пробелов, не влияет на смысл вопроса
+_PUNCTUATION = re.compile(r'[^\w\s]+')
+_SPACES = re.compile(r'\s+')
+
+# Служебные слова: различие в них не меняет предмет вопроса
+STOPWORDS = frozenset("""
+a an the is are was were be been do does did of in on at to for from by
+with about and or but not it its this that these those what which who
+whom whose when where why how i you he she we they me my your our their
+can could would should will shall may might please tell say
+а в во на о об от до по за из к ко с со у и или но не ни ли же бы
+это этот эта эти то тот та те что кто как где когда почему зачем какой
+какая какие каком чем кем мне меня ты вы он она они мы его ее их ли
+был была были быть есть про пожалуйста скажи расскажи
+""".split())
+
+CacheKey = Tuple[int, str]
+# Все слова вопроса и слова без служебных
+QuestionWords = Tuple[FrozenSet[str], FrozenSet[str]]
+
+
+def normalize_question(question: str) -> str:
+    """
+    Нормализует вопрос для сравнения: регистр, ё, пунктуация и лишние
+    пробелы не учитываются.
+
+    :param question: Вопрос.
+    :return: Нормализованный вопрос.
+    """
+    text = question.lower().replace('ё', 'е')
+    text = _PUNCTUATION.sub(' ', text)
+    return _SPACES.sub(' ', text).strip()
+
+
+def _question_words(question: str) -> QuestionWords:
+    """
+    Слова нормализованного вопроса.
+
+    :param question: Нормализованный вопрос.
+    :return: Все слова и значимые (без служебных) слова.
+    """
+    words = frozenset(question.split())
+    return words, words - STOPWORDS
+
+
+def _similarity(left: FrozenSet[str], right: FrozenSet[str]) -> float:
+    """
+    Мера Жаккара для множеств слов.
+
+    :param left: Слова первого вопроса.
+    :param right: Слова второго вопроса.
+    :return: Близость от 0 до 1.
+    """
+    if not left or not right:
+        return 0.0
+    return len(left & right) / len(left | right)
+
+
+class AnswerCache:
+    """
+    Кэш ответов в памяти процесса с вытеснением по TTL и LRU.
+
+    Ключ — ID транскрипции и нормализованный вопрос. Текст транскрипции
+    после сохранения не меняется, поэтому новая запись или выбор другой
+    транскрипции дают новый ключ, и старые ответы просто не находятся.
+    При similarity < 1 подходит и ответ на почти такой же вопрос к той же
+    транскрипции: значимые слова обоих вопросов должны совпадать, а по
+    мере Жаккара для всех слов они могут отличаться только служебными.
+    Мера Жаккара не различает предмет вопроса ("кто такой Иван" и "кто
+    такой Петр"), поэтому безопасны только пороги, близкие к 1.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 1000,
+        ttl: float = 3600,
+        similarity: float = 1.0
+    ) -> None:
+        """
+        Инициализация кэша.
+
+        :param max_size: Максимальное число ответов в кэше (0 — кэш
+        отключен).
+        :param ttl: Время жизни ответа (секунды).
+        :param similarity: Минимальная близость вопросов для попадания
+        (1 — только совпадение нормализованного текста, по умолчанию).
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.similarity = similarity
+        self._entries: OrderedDict[CacheKey, Tuple[str, float]] = OrderedDict()
+        # ID транскрипции -> нормализованный вопрос -> слова вопроса
+        self._questions: Dict[int, Dict[str, QuestionWords]] = {}
+
+    @property
+    def enabled(self) -> bool:
+        """Включен ли кэш."""
+        return self.max_size > 0
+
+    def _remove(self, key: CacheKey) -> None:
+        """
+        Удалить ответ из кэша.
+
+        :param key: Ключ ответа.
+        """
+        self._entries.pop(key, None)
+        transcript_id, question = key
+        questions = self._questions.get(transcript_id)
+        if questions is not None:
+            questions.pop(question, None)
+            if not questions:
+                del self._questions[transcript_id]
+
+    def _lookup(self, key: CacheKey) -> Optional[str]:
+        """
+        Найти действующий ответ по точному ключу.
+
+        :param key: Ключ ответа.
+        :return: Ответ или None.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        answer, expires_at = entry
+        if expires_at < time.monotonic():
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return answer
+
+    def _nearest(self, transcript_id: int, question: str) -> Optional[str]:
+        """
+        Найти самый близкий ранее заданный вопрос к той же транскрипции.
+
+        :param transcript_id: ID транскрипции.
+        :param question: Нормализованный вопрос.
+        :return: Нормализованный близкий вопрос или None.
+        """
+        words, content = _question_words(question)
+        if not content:
+            return None
+        best, best_score = None, self.similarity
+        for candidate, (candidate_words, candidate_content) in (
+            self._questions.get(transcript_id, {}).items()
+        ):
+            if candidate_content != content:
+                continue
+            score = _similarity(words, candidate_words)
+            if score >= best_score:
+                best, best_score = candidate, score
+        return best
+
+    def get(self, transcript_id: int, question: str) -> Optional[str]:
+        """
+        Получить ответ на вопрос к транскрипции.
+
+        :param transcript_id: ID транскрипции.
+        :param question: Вопрос.
+        :return: Ответ или None.
+        """
+        if not self.enabled:
+            return None
+        question = normalize_question(question)
+        answer = self._lookup((transcript_id, question))
+        if answer is None and self.similarity < 1:
+            nearest = self._nearest(transcript_id, question)
+            if nearest is not None:
+                answer = self._lookup((transcript_id, nearest))
+        return answer
+
+    def put(self, transcript_id: int, question: str, answer: str) -> None:
+        """
+        Сохранить ответ на вопрос к транскрипции.
+
+        :param transcript_id: ID транскрипции.
+        :param question: Вопрос.
+        :param answer: Ответ.
+        """
+        if not self.enabled:
+            return
+        question = normalize_question(question)
+        key = (transcript_id, question)
+        self._entries[key] = (answer, time.monotonic() + self.ttl)
+        self._entries.move_to_end(key)
+        self._questions.setdefault(transcript_id, {})[question] = (
+            _question_words(question)
+        )
+        while len(self._entries) > self.max_size:
+            self._remove(next(iter(self._entries)))
@@ -0,0 +1,294 @@
+"""
+Блокирующие операции с аудио. Функции выполняются в пуле процессов
+(см. app.utils.executor.AudioExecutor).
+
+Аудио не декодируется в память процесса: ffmpeg читает исходный файл
+потоково и сразу пишет сжатые фрагменты на диск, поэтому потребление
+памяти не зависит от длительности записи.
+"""
+import os
+import re
+import subprocess
+from typing import List, Tuple
+import numpy as np
+
+SAMPLE_RATE = 16000
+BITRATE = "128k"
+
+# Параметры анализа громкости для поиска пауз
+ANALYSIS_SAMPLE_RATE = 8000
+FRAME_MS = 50
+SMOOTHING_MS = 400
+_READ_FRAMES = 4096
+
+FFMPEG = "ffmpeg"
+FFPROBE = "ffprobe"
+
+_TIME_PATTERN = re.compile(r"time=(\d+):(\d+):(\d+(?:\.\d+)?)")
+
+
+class AudioProcessingError(RuntimeError):
+    """Ошибка обработки аудио через ffmpeg."""
+
+
+def _run(command: List[str]) -> subprocess.CompletedProcess:
+    """
+    Запускает ffmpeg/ffprobe и проверяет код возврата.
+
+    :param command: Команда с аргументами.
+    :return: Результат выполнения.
+    :raises AudioProcessingError: Если команда завершилась с ошибкой.
+    """
+    result = subprocess.run(
+        command,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        check=False
+    )
+    if result.returncode != 0:
+        raise AudioProcessingError(
+            f"{command[0]} завершился с кодом {result.returncode}: "
+            f"{result.stderr.strip()[-500:]}"
+        )
+    return result
+
+
+def _check_source(file_path: str) -> None:
+    """
+    Проверяет наличие исходного файла.
+
+    :param file_path: Путь к файлу.
+    :raises FileNotFoundError: Если файл не найден.
+    """
+    if not os.path.isfile(file_path):
+        raise FileNotFoundError(file_path)
+
+
+def get_duration_ms(file_path: str) -> int:
+    """
+    Определяет длительность аудиофайла по метаданным контейнера.
+    Если длительность в метаданных отсутствует, файл потоково
+    декодируется ffmpeg без сохранения результата.
+
+    :param file_path: Путь к аудиофайлу.
+    :return: Длительность в миллисекундах.
+    """
+    _check_source(file_path)
+    result = _run([
+        FFPROBE, "-v", "error",
+        "-show_entries", "format=duration",
+        "-of", "default=noprint_wrappers=1:nokey=1",
+        file_path
+    ])
+    try:
+        return int(float(result.stdout.strip()) * 1000)
+    except ValueError:
+        return _decode_duration_ms(file_path)
+
+
+def _decode_duration_ms(file_path: str) -> int:
+    """
+    Определяет длительность, декодируя файл в null-муксер.
+
+    :param file_path: Путь к аудиофайлу.
+    :return: Длительность в миллисекундах.
+    """
+    result = _run([
+        FFMPEG, "-nostdin", "-hide_banner",
+        "-i", file_path, "-vn", "-f", "null", "-"
+    ])
+    matches = _TIME_PATTERN.findall(result.stderr)
+    if not matches:
+        raise AudioProcessingError(
+            f"Не удалось определить длительность {file_path}"
+        )
+    hours, minutes, seconds = matches[-1]
+    return int((int(hours) * 3600 + int(minutes) * 60 + float(seconds)) * 1000)
+
+
+def export_segment(
+    file_path: str,
+    start_ms: int,
+    duration_ms: int,
+    output_path: str,
+    bitrate: str = BITRATE
+) -> str:
+    """
+    Вырезает фрагмент аудиофайла, приводит его к моно 16 кГц
+    и сохраняет в mp3. Используется поиск по входному файлу (-ss перед
+    -i), поэтому ffmpeg декодирует только нужный фрагмент.
+
+    :param file_path: Путь к исходному аудиофайлу.
+    :param start_ms: Начало фрагмента в миллисекундах.
+    :param duration_ms: Длительность фрагмента в миллисекундах.
+    :param output_path: Путь для сохранения фрагмента.
+    :param bitrate: Битрейт mp3.
+    :return: Путь к сохраненному фрагменту.
+    """
+    _check_source(file_path)
+    _run([
+        FFMPEG, "-nostdin", "-hide_banner", "-v", "error", "-y",
+        "-ss", f"{start_ms / 1000:.3f}",
+        "-t", f"{duration_ms / 1000:.3f}",
+        "-i", file_path,
+        "-vn", "-ac", "1", "-ar", str(SAMPLE_RATE),
+        "-c:a", "libmp3lame", "-b:a", bitrate,
+        "-f", "mp3", output_path
+    ])
+    return output_path
+
+
+def decode_segment(
+    file_path: str,
+    start_ms: int,
+    duration_ms: int
+) -> np.ndarray:
+    """
+    Декодирует фрагмент аудиофайла в моно PCM 16 кГц для локального
+    распознавания, без промежуточного файла.
+
+    :param file_path: Путь к исходному аудиофайлу.
+    :param start_ms: Начало фрагмента в миллисекундах.
+    :param duration_ms: Длительность фрагмента в миллисекундах.
+    :return: Отсчеты float32 в диапазоне [-1, 1].
+    """
+    _check_source(file_path)
+    result = subprocess.run(
+        [
+            FFMPEG, "-nostdin", "-hide_banner", "-v", "error",
+            "-ss", f"{start_ms / 1000:.3f}",
+            "-t", f"{duration_ms / 1000:.3f}",
+            "-i", file_path,
+            "-vn", "-ac", "1", "-ar", str(SAMPLE_RATE),
+            "-f", "s16le", "-"
+        ],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        check=False
+    )
+    if result.returncode != 0:
+        raise AudioProcessingError(
+            f"{FFMPEG} завершился с кодом {result.returncode}: "
+            f"{result.stderr.decode(errors='replace').strip()[-500:]}"
+        )
+    samples = np.frombuffer(result.stdout, dtype="<i2")
+    return samples.astype(np.float32) / 32768
+
+
+def compute_frame_energy(file_path: str, frame_ms: int = FRAME_MS) -> np.ndarray:
+    """
+    Вычисляет громкость (RMS, дБ) по кадрам. ffmpeg потоково декодирует
+    файл в моно PCM пониженной частоты, кадры обрабатываются блоками,
+    поэтому в памяти находится только небольшой буфер.
+
+    :param file_path: Путь к аудиофайлу.
+    :param frame_ms: Длительность кадра в миллисекундах.
+    :return: Массив громкости по кадрам.
+    """
+    _check_source(file_path)
+    frame_bytes = ANALYSIS_SAMPLE_RATE * frame_ms // 1000 * 2
+    process = subprocess.Popen(
+        [
+            FFMPEG, "-nostdin", "-hide_banner", "-v", "error",
+            "-i", file_path,
+            "-vn", "-ac", "1", "-ar", str(ANALYSIS_SAMPLE_RATE),
+            "-f", "s16le", "-"
+        ],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL
+    )
+    energies: List[np.ndarray] = []
+    remainder = b""
+    try:
+        while True:
+            chunk = process.stdout.read(frame_bytes * _READ_FRAMES)
+            if not chunk:
+                break
+            data = remainder + chunk
+            usable = len(data) - len(data) % frame_bytes
+            remainder = data[usable:]
+            if not usable:
+                continue
+            samples = np.frombuffer(data[:usable], dtype="<i2")
+            frames = samples.astype(np.float32).reshape(-1, frame_bytes // 2)
+            energies.append(np.sqrt(np.mean(frames ** 2, axis=1)))
+    finally:
+        process.stdout.close()
+        returncode = process.wait()
+    if returncode != 0:
+        raise AudioProcessingError(
+            f"{FFMPEG} завершился с кодом {returncode} при анализе {file_path}"
+        )
+    if not energies:
+        return np.zeros(0, dtype=np.float32)
+    return 20 * np.log10(np.concatenate(energies) + 1.0)
+
+
+def plan_chunks(
+    energy: np.ndarray,
+    duration_ms: int,
+    max_chunk_ms: int,
+    search_window_ms: int,
+    frame_ms: int = FRAME_MS
+) -> List[Tuple[int, int]]:
+    """
+    Выбирает границы фрагментов: каждый фрагмент не длиннее max_chunk_ms,
+    а разрез делается в самом тихом месте последних search_window_ms
+    фрагмента.
+
+    :param energy: Громкость по кадрам (см. compute_frame_energy).
+    :param duration_ms: Длительность аудио в миллисекундах.
+    :param max_chunk_ms: Максимальная длительность фрагмента.
+    :param search_window_ms: Окно поиска паузы перед границей.
+    :param frame_ms: Длительность кадра в миллисекундах.
+    :return: Список (начало, длительность) в миллисекундах.
+    """
+    window = max(1, SMOOTHING_MS // frame_ms)
+    smoothed = (
+        np.convolve(energy, np.ones(window) / window, mode="same")
+        if energy.size else energy
+    )
+
+    chunks: List[Tuple[int, int]] = []
+    start_ms = 0
+    while duration_ms - start_ms > max_chunk_ms:
+        end_ms = start_ms + max_chunk_ms
+        low = max(start_ms + 1, end_ms - search_window_ms) // frame_ms
+        high = min(end_ms // frame_ms, smoothed.size)
+        if high > low:
+            # Среди одинаково тихих кадров берется самый поздний,
+            # чтобы фрагмент был как можно длиннее
+            quietest = high - 1 - int(np.argmin(smoothed[low:high][::-1]))
+            cut_ms = quietest * frame_ms + frame_ms // 2
+            cut_ms = min(max(cut_ms, start_ms + 1), end_ms)
+        else:
+            cut_ms = end_ms
+        chunks.append((start_ms, cut_ms - start_ms))
+        start_ms = cut_ms
+    chunks.append((start_ms, duration_ms - start_ms))
+    return chunks
+
+
+def plan_segments(
+    file_path: str,
+    duration_ms: int,
+    max_chunk_ms: int,
+    search_window_ms: int
+) -> List[Tuple[int, int]]:
+    """
+    Разбивает аудиофайл на фрагменты с границами в паузах.
+
+    :param file_path: Путь к аудиофайлу.
+    :param duration_ms: Длительность аудио в миллисекундах.
+    :param max_chunk_ms: Максимальная длительность фрагмента.
+    :param search_window_ms: Окно поиска паузы перед границей.
+    :return: Список (начало, длительность) в миллисекундах.
+    """
+    if duration_ms <= max_chunk_ms:
+        return [(0, duration_ms)]
+    energy = compute_frame_energy(file_path)
+    return plan_chunks(energy, duration_ms, max_chunk_ms, search_window_ms)
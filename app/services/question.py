@@ -1,5 +1,6 @@
 """Утилиты для ответа на вопросы."""
-from app.utils import openai_client
+from app.utils import openai_gateway
+from app.utils.openai_gateway import Priority
 from prompts import QUESTION_PROMPT
 from app.utils.logger import setup_logger
 
@@ -16,9 +17,10 @@ async def get_answer(context: str, question: str) -> str:
     """
     try:
         prompt = QUESTION_PROMPT.format(context=context, question=question)
-        response = await openai_client.chat.completions.create(
+        response = await openai_gateway.chat(
+            [{"role": "user", "content": prompt}],
             model="gpt-4o",
-            messages=[{"role": "user", "content": prompt}]
+            priority=Priority.INTERACTIVE
         )
         answer = response.choices[0].message.content.strip()
         return answer
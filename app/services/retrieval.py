@@ -0,0 +1,263 @@
+"""Поиск фрагментов транскрипции, относящихся к вопросу."""
+import re
+from abc import ABC, abstractmethod
+from typing import List, Optional, Sequence, Tuple
+import numpy as np
+from app.database.content import ContentStore
+from app.utils.openai_gateway import OpenAIGateway, Priority
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Конец предложения, по которому предпочтительно резать фрагменты
+_SENTENCE_END = re.compile(r'[.!?…]\s+')
+
+# Разделитель фрагментов в контексте вопроса
+CHUNK_SEPARATOR = "\n…\n"
+
+
+class Embedder(ABC):
+    """
+    Клиент эмбеддингов. Для офлайн проверок достаточно подставить в
+    TranscriptIndex любую реализацию embed.
+    """
+
+    model: str = ''
+
+    @abstractmethod
+    async def embed(
+        self,
+        texts: Sequence[str],
+        priority: Priority = Priority.BULK
+    ) -> np.ndarray:
+        """
+        Вычисляет эмбеддинги текстов.
+
+        :param texts: Тексты.
+        :param priority: Приоритет запроса (вопрос пользователя или
+        индексация).
+        :return: Матрица float32 размером (len(texts), размерность).
+        """
+
+
+class OpenAIEmbedder(Embedder):
+    """Эмбеддинги OpenAI, запрашиваемые пачками."""
+
+    def __init__(
+        self,
+        gateway: OpenAIGateway,
+        model: str = 'text-embedding-3-small',
+        dimensions: int = 0,
+        batch_size: int = 64
+    ) -> None:
+        """
+        Инициализация клиента эмбеддингов.
+
+        :param gateway: Шлюз запросов к OpenAI.
+        :param model: Модель эмбеддингов.
+        :param dimensions: Размерность (0 — размерность модели).
+        :param batch_size: Число текстов в одном запросе.
+        """
+        self.gateway = gateway
+        self.model = model
+        self.dimensions = dimensions
+        self.batch_size = batch_size
+
+    async def embed(
+        self,
+        texts: Sequence[str],
+        priority: Priority = Priority.BULK
+    ) -> np.ndarray:
+        options = {'dimensions': self.dimensions} if self.dimensions else {}
+        vectors: List[List[float]] = []
+        for start in range(0, len(texts), self.batch_size):
+            response = await self.gateway.embed(
+                texts[start:start + self.batch_size],
+                model=self.model,
+                priority=priority,
+                **options
+            )
+            vectors.extend(
+                item.embedding
+                for item in sorted(response.data, key=lambda d: d.index)
+            )
+        return np.asarray(vectors, dtype=np.float32)
+
+
+def chunk_text(
+    text: str,
+    chunk_chars: int = 1500,
+    overlap_chars: int = 200
+) -> List[Tuple[int, int]]:
+    """
+    Разбивает текст на перекрывающиеся фрагменты, по возможности
+    заканчивая их на границе предложения.
+
+    :param text: Текст.
+    :param chunk_chars: Целевой размер фрагмента в символах.
+    :param overlap_chars: Перекрытие соседних фрагментов в символах.
+    :return: Границы фрагментов (начало, конец) в символах.
+    """
+    chunks: List[Tuple[int, int]] = []
+    length = len(text)
+    start = 0
+    while start < length:
+        end = min(start + chunk_chars, length)
+        if end < length:
+            # Последняя граница предложения во второй половине окна,
+            # иначе последний пробел
+            window_start = start + chunk_chars // 2
+            boundary = None
+            for match in _SENTENCE_END.finditer(text, window_start, end):
+                boundary = match.end()
+            if boundary is None:
+                space = text.rfind(' ', window_start, end)
+                boundary = space + 1 if space > 0 else None
+            end = boundary or end
+        chunks.append((start, end))
+        if end >= length:
+            break
+        next_start = max(end - overlap_chars, start + 1)
+        space = text.find(' ', next_start, end)
+        start = space + 1 if space != -1 else next_start
+    return chunks
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    """
+    Нормирует строки матрицы, чтобы косинусная близость сводилась к
+    скалярному произведению.
+
+    :param vectors: Матрица эмбеддингов.
+    :return: Нормированная матрица float32.
+    """
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return (vectors / norms).astype(np.float32)
+
+
+def top_k(vectors: np.ndarray, query: np.ndarray, k: int) -> np.ndarray:
+    """
+    Индексы k самых близких к запросу фрагментов в порядке следования в
+    тексте.
+
+    :param vectors: Нормированная матрица эмбеддингов фрагментов.
+    :param query: Нормированный эмбеддинг запроса.
+    :param k: Число фрагментов.
+    :return: Индексы фрагментов.
+    """
+    scores = vectors @ query
+    k = min(k, len(scores))
+    best = np.argpartition(-scores, k - 1)[:k]
+    return np.sort(best)
+
+
+class TranscriptIndex:
+    """
+    Индекс фрагментов транскрипций для ответов на вопросы.
+
+    Транскрипция разбивается на фрагменты и индексируется один раз;
+    эмбеддинги хранятся нормированными матрицами float32, границы
+    фрагментов — массивом int32. На вопрос отправляются только k
+    ближайших фрагментов, поэтому стоимость вопроса не растет с длиной
+    записи. Короткие транскрипции отправляются целиком без индекса.
+    """
+
+    def __init__(
+        self,
+        store: ContentStore,
+        embedder: Embedder,
+        chunk_chars: int = 1500,
+        overlap_chars: int = 200,
+        k: int = 6
+    ) -> None:
+        """
+        Инициализация индекса.
+
+        :param store: Хранилище транскрипций.
+        :param embedder: Клиент эмбеддингов.
+        :param chunk_chars: Размер фрагмента в символах.
+        :param overlap_chars: Перекрытие фрагментов в символах.
+        :param k: Число фрагментов в контексте вопроса.
+        """
+        self.store = store
+        self.embedder = embedder
+        self.chunk_chars = chunk_chars
+        self.overlap_chars = overlap_chars
+        self.k = k
+
+    @property
+    def full_text_limit(self) -> int:
+        """Длина текста, до которой транскрипция отправляется целиком."""
+        return self.chunk_chars * self.k
+
+    async def build(
+        self,
+        transcript_id: int,
+        text: str,
+        priority: Priority = Priority.BULK
+    ) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Индексирует транскрипцию, если она длиннее full_text_limit.
+
+        :param transcript_id: ID транскрипции.
+        :param text: Текст транскрипции.
+        :param priority: Приоритет запросов эмбеддингов.
+        :return: Эмбеддинги и границы фрагментов или None.
+        """
+        if len(text) <= self.full_text_limit:
+            return None
+        offsets = np.asarray(
+            chunk_text(text, self.chunk_chars, self.overlap_chars),
+            dtype=np.int32
+        )
+        vectors = _normalize(await self.embedder.embed(
+            [text[start:end] for start, end in offsets], priority=priority
+        ))
+        await self.store.save_embeddings(
+            transcript_id, self.embedder.model, vectors, offsets
+        )
+        logger.info(
+            "Транскрипция %s проиндексирована: %d фрагментов",
+            transcript_id, len(offsets)
+        )
+        return vectors, offsets
+
+    async def context(
+        self,
+        number: int,
+        transcript_id: int,
+        question: str
+    ) -> Optional[str]:
+        """
+        Контекст для ответа на вопрос: транскрипция целиком или ее
+        фрагменты, ближайшие к вопросу.
+
+        :param number: Номер пользователя.
+        :param transcript_id: ID транскрипции.
+        :param question: Вопрос.
+        :return: Контекст или None, если транскрипции нет.
+        """
+        text = await self.store.get_transcription(number, transcript_id)
+        if not text or len(text) <= self.full_text_limit:
+            return text
+
+        query = _normalize(await self.embedder.embed(
+            [question], priority=Priority.INTERACTIVE
+        ))[0]
+        index = await self.store.get_embeddings(
+            transcript_id, self.embedder.model
+        )
+        if index is None or index[0].shape[1] != query.shape[0]:
+            # Транскрипции, сохраненные до индексации, или индекс
+            # с другой размерностью эмбеддингов. Пользователь ждет
+            # ответа, поэтому индексация не уступает фоновым запросам
+            index = await self.build(
+                transcript_id, text, priority=Priority.INTERACTIVE
+            )
+        vectors, offsets = index
+
+        return CHUNK_SEPARATOR.join(
+            text[start:end].strip()
+            for start, end in offsets[top_k(vectors, query, self.k)]
+        )
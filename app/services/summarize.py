@@ -1,38 +1,161 @@
 """Утилиты для суммаризации текста."""
-from typing import Optional
-from app.utils import openai_client
+import asyncio
+from typing import List, Optional
+from app.utils import openai_gateway
 from app.utils.logger import setup_logger
+from app.utils.openai_gateway import Priority
 from app.database.models.user import User
 from app.utils.cancel import is_user_canceled
-from prompts import SUMMARY_PROMPT
+from app.services.retrieval import chunk_text
+from config import config
+from prompts import SUMMARY_PROMPT, SUMMARY_CHUNK_PROMPT, SUMMARY_REDUCE_PROMPT
 
 logger = setup_logger(__name__)
 
+# Оценка числа символов на токен: токенизатор не подключается, бюджет
+# считается приблизительно с запасом
+CHARS_PER_TOKEN = 4
 
-async def summarize_text(text: str, user: User) -> Optional[str]:
+# Бюджет входного текста одного запроса суммаризации в символах
+CHUNK_CHARS = config.summary_chunk_tokens * CHARS_PER_TOKEN
+
+
+async def _complete(prompt: str, text: str) -> str:
+    """
+    Запрос суммаризации к GPT-4o через общий шлюз: вопросы пользователей
+    обслуживаются раньше.
+
+    :param prompt: Системный промпт.
+    :param text: Текст.
+    :return: Ответ модели.
+    """
+    completion = await openai_gateway.chat(
+        [
+            {"role": "system", "content": prompt},
+            {"role": "user", "content": text}
+        ],
+        model="gpt-4o",
+        priority=Priority.NORMAL
+    )
+    return completion.choices[0].message.content
+
+
+async def _reduce(
+    summaries: List[str],
+    semaphore: asyncio.Semaphore
+) -> str:
+    """
+    Объединяет частичные суммаризации. Если они не помещаются в один
+    запрос, объединяются группами, пока не останется одна.
+
+    :param summaries: Частичные суммаризации в порядке текста.
+    :param semaphore: Ограничение одновременных запросов задачи (общее
+    с суммаризацией фрагментов).
+    :return: Итоговая суммаризация.
+    """
+    async def complete(text: str) -> str:
+        async with semaphore:
+            return await _complete(SUMMARY_REDUCE_PROMPT, text)
+
+    while True:
+        joined = "\n\n".join(summaries)
+        if len(joined) <= CHUNK_CHARS:
+            return await complete(joined)
+        groups: List[List[str]] = [[]]
+        size = 0
+        for summary in summaries:
+            if groups[-1] and size + len(summary) > CHUNK_CHARS:
+                groups.append([])
+                size = 0
+            groups[-1].append(summary)
+            size += len(summary)
+        if len(groups) == 1:
+            # Одна часть длиннее бюджета: дальше не уменьшится
+            return await complete(joined)
+        summaries = list(await asyncio.gather(*(
+            complete("\n\n".join(group)) for group in groups
+        )))
+
+
+class StreamingSummarizer:
     """
-    Суммирует текст с использованием GPT-4o.
+    Map-reduce суммаризация текста, поступающего частями.
 
-    :param text: Исходный текст для суммаризации.
-    :param user: Пользователь.
-    :return: Суммаризированный текст.
-    :raises: Исключение при ошибке суммаризации текста.
+    Текст накапливается, и как только набирается бюджет фрагмента, его
+    суммаризация запускается в фоне — еще до окончания транскрипции.
+    После finish частичные суммаризации объединяются. Текст, который
+    помещается в один запрос, суммаризируется одним запросом.
     """
-    try:
-        if await is_user_canceled(user):
-            return None
-
-        completion = await openai_client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": SUMMARY_PROMPT},
-                {"role": "user", "content": text}
-            ]
-        )
-        summary = completion.choices[0].message.content
-        logger.info("Суммаризация текста выполнена успешно.")
-        return summary
-
-    except Exception as e:
-        logger.error("Ошибка при суммаризации текста: %s", e, exc_info=True)
-        raise
+
+    def __init__(self, user: User, chunk_chars: int = CHUNK_CHARS) -> None:
+        """
+        Инициализация суммаризатора.
+
+        :param user: Пользователь.
+        :param chunk_chars: Бюджет фрагмента в символах.
+        """
+        self.user = user
+        self.chunk_chars = chunk_chars
+        self._buffer = ""
+        self._tasks: List[asyncio.Task] = []
+        self._semaphore = asyncio.Semaphore(config.summary_job_concurrency)
+
+    def feed(self, text: str) -> None:
+        """
+        Добавить очередную часть текста.
+
+        :param text: Часть текста.
+        """
+        self._buffer = f"{self._buffer} {text}" if self._buffer else text
+        # Последний фрагмент остается в буфере: к нему может добавиться
+        # продолжение, и граница будет выбрана по предложению
+        while len(self._buffer) > 2 * self.chunk_chars:
+            end = chunk_text(self._buffer, self.chunk_chars, 0)[0][1]
+            self._map(self._buffer[:end])
+            self._buffer = self._buffer[end:].lstrip()
+
+    def _map(self, chunk: str) -> None:
+        """
+        Запустить суммаризацию фрагмента.
+
+        :param chunk: Фрагмент текста.
+        """
+        async def summarize_chunk() -> str:
+            async with self._semaphore:
+                return await _complete(SUMMARY_CHUNK_PROMPT, chunk)
+
+        self._tasks.append(asyncio.create_task(summarize_chunk()))
+
+    async def finish(self) -> Optional[str]:
+        """
+        Дождаться частичных суммаризаций и объединить их.
+
+        :return: Итоговая суммаризация или None при отмене.
+        """
+        try:
+            if await is_user_canceled(self.user):
+                return None
+            if not self._tasks and len(self._buffer) <= self.chunk_chars:
+                return await _complete(SUMMARY_PROMPT, self._buffer)
+
+            for start, end in chunk_text(self._buffer, self.chunk_chars, 0):
+                self._map(self._buffer[start:end])
+            self._buffer = ""
+            summaries = await asyncio.gather(*self._tasks)
+            if await is_user_canceled(self.user):
+                return None
+            logger.info(
+                "Суммаризация по %d фрагментам, объединение", len(summaries)
+            )
+            return await _reduce(list(summaries), self._semaphore)
+        finally:
+            await self.cancel()
+
+    async def cancel(self) -> None:
+        """Отменить незавершенные суммаризации фрагментов."""
+        for task in self._tasks:
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
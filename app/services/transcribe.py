@@ -1,102 +1,234 @@
 """Утилиты для транскрибирования аудио."""
 
-import tempfile
-from typing import List, Optional
+import asyncio
+from collections import Counter
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
 from pathlib import Path
-from pydub import AudioSegment
 from app.utils.logger import setup_logger
-from app.utils import openai_client
-from app.utils.temp_dir import cleanup_files
+from app.utils import audio_executor
 from app.utils.cancel import is_user_canceled
 from app.database.models.user import User
+from app.services import transcription_backend
+from app.services.audio import get_duration_ms, plan_segments
+from app.services.transcription_backends import SegmentTranscription
+from config import config
 
 logger = setup_logger(__name__)
 
+SILENCE_SEARCH_WINDOW_MS = config.silence_search_window_s * 1000
 
-async def whisper_inference(file_path: str | Path) -> str:
+# Интервал проверки отмены во время параллельной транскрипции (секунды)
+CANCEL_CHECK_INTERVAL = 2
+
+# Получатель текста сегментов по мере готовности, в порядке записи
+SegmentCallback = Callable[[str], None]
+
+
+@dataclass
+class Transcription:
+    """Транскрипция аудиофайла."""
+    text: str
+    language: Optional[str]
+    duration_ms: int
+
+
+async def _export_stage(
+    file_path: str | Path,
+    chunks: List[Tuple[int, int]],
+    segments: asyncio.Queue,
+    consumers: int
+) -> None:
     """
-    Транскрибирует аудиофайл с использованием API OpenAI Whisper.
+    Стадия подготовки: готовит сегменты движка распознавания по порядку,
+    опережая транскрипцию не больше чем на размер очереди.
 
-    :param file_path: Путь к аудиофайлу.
-    :return: Текст транскрипции.
-    :raises: Исключение при ошибке транскрибирования.
+    :param file_path: Путь к исходному аудиофайлу.
+    :param chunks: Сегменты (начало, длительность) в миллисекундах.
+    :param segments: Очередь готовых сегментов (индекс, сегмент).
+    :param consumers: Число воркеров транскрипции.
     """
-    try:
-        with open(file_path, "rb") as audio_file:
-            transcription = await openai_client.audio.transcriptions.create(
-                model="whisper-1",
-                file=audio_file
+    pending = iter(enumerate(chunks))
+
+    async def exporter() -> None:
+        for index, (start_ms, duration_ms) in pending:
+            segment = await transcription_backend.prepare(
+                file_path, start_ms, duration_ms
             )
-        logger.info("Транскрипция файла %s выполнена успешно.", file_path)
-        return transcription.text
-    except Exception as e:
-        logger.error("Ошибка при транскрипции аудио: %s", e, exc_info=True)
-        raise
+            try:
+                await segments.put((index, segment))
+            except BaseException:
+                transcription_backend.discard(segment)
+                raise
+
+    await asyncio.gather(*(
+        exporter() for _ in range(config.pipeline_export_workers)
+    ))
+    for _ in range(consumers):
+        await segments.put(None)
+
+
+async def _transcribe_stage(
+    segments: asyncio.Queue,
+    results: asyncio.Queue
+) -> None:
+    """
+    Стадия транскрипции: распознает готовые сегменты выбранным движком.
+
+    :param segments: Очередь готовых сегментов (индекс, сегмент).
+    :param results: Очередь транскрипций (индекс, транскрипция).
+    """
+    while True:
+        item = await segments.get()
+        if item is None:
+            return
+        index, segment = item
+        try:
+            result = await transcription_backend.transcribe(segment)
+        finally:
+            transcription_backend.discard(segment)
+        logger.debug("Сегмент %d успешно транскрибирован", index)
+        await results.put((index, result))
 
 
-async def process_audio_segment(
-    segment: AudioSegment,
-    segment_index: int = 0
-) -> str:
+async def _collect_stage(
+    results: asyncio.Queue,
+    count: int,
+    user: User,
+    on_segment: Optional[SegmentCallback]
+) -> Optional[List[SegmentTranscription]]:
     """
-    Обрабатывает отдельный сегмент аудио.
+    Стадия сборки: восстанавливает порядок сегментов, передает текст
+    дальше по мере готовности префикса и периодически проверяет отмену.
 
-    :param segment: Сегмент аудио для обработки.
-    :param segment_index: Индекс сегмента для логирования.
-    :return: Транскрипция сегмента.
+    :param results: Очередь транскрипций (индекс, транскрипция).
+    :param count: Число сегментов.
+    :param user: Пользователь.
+    :param on_segment: Получатель текста сегментов.
+    :return: Транскрипции в исходном порядке или None при отмене.
     """
-    with tempfile.NamedTemporaryFile(
-        delete=False, suffix=".mp3"
-    ) as temp_file:
+    ready: Dict[int, SegmentTranscription] = {}
+    emitted = 0
+    while emitted < count:
         try:
-            segment.export(
-                temp_file.name,
-                format="mp3",
-                bitrate="128k"
-            )
-            transcription = await whisper_inference(temp_file.name)
-            logger.debug(
-                "Сегмент %d успешно транскрибирован", segment_index
+            index, result = await asyncio.wait_for(
+                results.get(), CANCEL_CHECK_INTERVAL
             )
-            return transcription
-        finally:
-            cleanup_files(temp_file.name)
+        except asyncio.TimeoutError:
+            if await is_user_canceled(user):
+                return None
+            continue
+        ready[index] = result
+        while emitted in ready:
+            if on_segment:
+                on_segment(ready[emitted].text)
+            emitted += 1
+    return [ready[index] for index in range(count)]
+
+
+def _discard_segments(segments: asyncio.Queue) -> None:
+    """
+    Освобождает сегменты, оставшиеся в очереди.
+
+    :param segments: Очередь готовых сегментов (индекс, сегмент).
+    """
+    while not segments.empty():
+        item = segments.get_nowait()
+        if item is not None:
+            transcription_backend.discard(item[1])
 
 
-async def transcribe_audio(file_path: str | Path, user: User) -> Optional[str]:
+def _merge_segments(
+    segments: List[SegmentTranscription],
+    duration_ms: int
+) -> Transcription:
     """
-    Транскрибирует аудиофайл, разбив его на меньшие сегменты
-    и объединив транскрипции.
+    Объединяет транскрипции сегментов. Языком записи считается язык
+    большинства сегментов.
+
+    :param segments: Транскрипции сегментов в исходном порядке.
+    :param duration_ms: Длительность аудио в миллисекундах.
+    :return: Транскрипция аудиофайла.
+    """
+    languages = Counter(s.language for s in segments if s.language)
+    return Transcription(
+        text=" ".join(s.text for s in segments),
+        language=languages.most_common(1)[0][0] if languages else None,
+        duration_ms=duration_ms
+    )
+
+
+async def transcribe_audio(
+    file_path: str | Path,
+    user: User,
+    on_segment: Optional[SegmentCallback] = None
+) -> Optional[Transcription]:
+    """
+    Транскрибирует аудиофайл потоковым конвейером: подготовка
+    сегментов -> транскрипция -> сборка по порядку. Стадии связаны
+    ограниченными очередями и работают одновременно. Границы сегментов
+    выбираются в паузах.
 
     :param file_path: Путь к аудиофайлу.
     :param user: Пользователь.
-    :return: Полный текст транскрипции.
+    :param on_segment: Получатель текста сегментов по мере готовности.
+    :return: Полная транскрипция с языком и длительностью.
     :raises: FileNotFoundError, Exception
     """
+    segments: asyncio.Queue = asyncio.Queue(config.pipeline_queue_size)
+    results: asyncio.Queue = asyncio.Queue()
+    stages: List[asyncio.Task] = []
     try:
         if await is_user_canceled(user):
             return None
 
-        audio = AudioSegment.from_file(file_path)
-        audio = audio.set_frame_rate(16000)
-        segment_length_ms = 25 * 60 * 1000
-
-        if len(audio) <= segment_length_ms:
-            return await process_audio_segment(audio)
+        duration_ms = await audio_executor.run(
+            get_duration_ms, str(file_path)
+        )
+        if duration_ms <= transcription_backend.max_segment_ms:
+            chunks = [(0, duration_ms)]
+        else:
+            chunks = await audio_executor.run(
+                plan_segments,
+                str(file_path),
+                duration_ms,
+                transcription_backend.max_segment_ms,
+                SILENCE_SEARCH_WINDOW_MS
+            )
+            logger.info(
+                "Аудио %s разбито на %d фрагментов", file_path, len(chunks)
+            )
 
-        transcriptions: List[str] = []
-        for i, start_ms in enumerate(
-            range(0, len(audio), segment_length_ms)
-        ):
-            if await is_user_canceled(user):
-                return None
+        workers = min(config.transcribe_job_concurrency, len(chunks))
+        stages = [
+            asyncio.create_task(
+                _export_stage(file_path, chunks, segments, workers)
+            ),
+            *(
+                asyncio.create_task(_transcribe_stage(segments, results))
+                for _ in range(workers)
+            )
+        ]
+        collector = asyncio.create_task(
+            _collect_stage(results, len(chunks), user, on_segment)
+        )
+        stages.append(collector)
 
-            segment = audio[start_ms:start_ms + segment_length_ms]
+        # Ошибка любой стадии останавливает конвейер
+        pending = set(stages)
+        while not collector.done():
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_EXCEPTION
+            )
+            for stage in done:
+                stage.result()
 
-            transcription = await process_audio_segment(segment, i)
-            transcriptions.append(transcription)
+        transcriptions = collector.result()
+        if transcriptions is None:
+            logger.info("Транскрипция отменена пользователем %s", user.number)
+            return None
 
-        full_transcription = " ".join(transcriptions)
+        full_transcription = _merge_segments(transcriptions, duration_ms)
         logger.info("Полная транскрипция выполнена успешно.")
         return full_transcription if not await is_user_canceled(user) else None
 
@@ -105,6 +237,12 @@ async def transcribe_audio(file_path: str | Path, user: User) -> Optional[str]:
         raise
     except Exception as e:
         logger.error(
-            "Ошибка при транскрипции большого аудиофайла: %s", e, exc_info=True
+            "Ошибка при транскрипции аудиофайла: %s", e, exc_info=True
         )
         raise
+    finally:
+        for stage in stages:
+            stage.cancel()
+        if stages:
+            await asyncio.gather(*stages, return_exceptions=True)
+        _discard_segments(segments)
@@ -0,0 +1,300 @@
+"""
+Движки распознавания речи для конвейера транскрипции.
+
+Конвейер (app.services.transcribe) готовит сегменты через prepare,
+распознает их через transcribe и освобождает через discard. Облачный
+движок отправляет сжатые сегменты в Whisper API, локальный распознает
+их на своих ядрах в пуле процессов, не кодируя и не загружая файлы.
+"""
+import os
+import tempfile
+import importlib.util
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, NamedTuple, Optional, Tuple
+from app.services.audio import decode_segment, export_segment
+from app.utils.executor import AudioExecutor
+from app.utils.logger import setup_logger
+from app.utils.openai_gateway import OpenAIGateway
+from app.utils.temp_dir import cleanup_files
+
+logger = setup_logger(__name__)
+
+
+class SegmentTranscription(NamedTuple):
+    """Транскрипция одного сегмента."""
+    text: str
+    language: Optional[str]
+
+
+class SegmentSource(NamedTuple):
+    """Сегмент исходного файла."""
+    file_path: str
+    start_ms: int
+    duration_ms: int
+
+
+class TranscriptionBackend(ABC):
+    """Движок распознавания речи."""
+
+    def __init__(self, max_segment_ms: int) -> None:
+        """
+        Инициализация движка.
+
+        :param max_segment_ms: Максимальная длительность сегмента.
+        """
+        self.max_segment_ms = max_segment_ms
+
+    async def prepare(
+        self,
+        file_path: str | Path,
+        start_ms: int,
+        duration_ms: int
+    ) -> Any:
+        """
+        Готовит сегмент к распознаванию.
+
+        :param file_path: Путь к исходному аудиофайлу.
+        :param start_ms: Начало сегмента в миллисекундах.
+        :param duration_ms: Длительность сегмента в миллисекундах.
+        :return: Подготовленный сегмент.
+        """
+        return SegmentSource(str(file_path), start_ms, duration_ms)
+
+    @abstractmethod
+    async def transcribe(self, segment: Any) -> SegmentTranscription:
+        """
+        Распознает подготовленный сегмент.
+
+        :param segment: Результат prepare.
+        :return: Текст и язык сегмента.
+        """
+
+    def discard(self, segment: Any) -> None:
+        """
+        Освобождает ресурсы подготовленного сегмента.
+
+        :param segment: Результат prepare.
+        """
+
+    def shutdown(self) -> None:
+        """Останавливает движок."""
+
+
+class OpenAIWhisperBackend(TranscriptionBackend):
+    """
+    Whisper API: сегменты кодируются в mp3 во временные файлы, размер
+    которых укладывается в лимит загрузки.
+    """
+
+    def __init__(
+        self,
+        gateway: OpenAIGateway,
+        executor: AudioExecutor,
+        max_segment_ms: int,
+        bitrate: str = '64k',
+        model: str = 'whisper-1'
+    ) -> None:
+        """
+        Инициализация движка.
+
+        :param gateway: Шлюз запросов к OpenAI.
+        :param executor: Пул процессов для кодирования сегментов.
+        :param max_segment_ms: Максимальная длительность сегмента.
+        :param bitrate: Битрейт mp3.
+        :param model: Модель распознавания.
+        """
+        super().__init__(max_segment_ms)
+        self.gateway = gateway
+        self.executor = executor
+        self.bitrate = bitrate
+        self.model = model
+
+    async def prepare(
+        self,
+        file_path: str | Path,
+        start_ms: int,
+        duration_ms: int
+    ) -> str:
+        fd, path = tempfile.mkstemp(suffix=".mp3")
+        os.close(fd)
+        try:
+            await self.executor.run(
+                export_segment,
+                str(file_path),
+                start_ms,
+                duration_ms,
+                path,
+                self.bitrate
+            )
+        except BaseException:
+            cleanup_files(path)
+            raise
+        return path
+
+    async def transcribe(self, segment: str) -> SegmentTranscription:
+        # Ответ verbose_json дополнительно содержит определенный язык
+        try:
+            transcription = await self.gateway.transcribe(
+                segment,
+                model=self.model,
+                response_format="verbose_json"
+            )
+            logger.info("Транскрипция файла %s выполнена успешно.", segment)
+            return SegmentTranscription(
+                transcription.text, getattr(transcription, 'language', None)
+            )
+        except Exception as e:
+            logger.error("Ошибка при транскрипции аудио: %s", e, exc_info=True)
+            raise
+
+    def discard(self, segment: str) -> None:
+        cleanup_files(segment)
+
+
+# Модель локального движка в процессе пула: (модель, размер пакета)
+_local_model: Optional[Tuple[Any, int]] = None
+
+
+def _load_local_model(
+    model: str,
+    device: str,
+    compute_type: str,
+    cpu_threads: int,
+    batch_size: int
+) -> None:
+    """
+    Загружает модель faster-whisper в процессе пула один раз.
+
+    :param model: Размер модели или путь к модели CTranslate2.
+    :param device: cpu или cuda.
+    :param compute_type: Тип вычислений (int8, int8_float16, float16...).
+    :param cpu_threads: Число потоков процесса.
+    :param batch_size: Размер пакета окон (0 — без пакетной обработки).
+    """
+    global _local_model
+    from faster_whisper import WhisperModel
+    whisper = WhisperModel(
+        model,
+        device=device,
+        compute_type=compute_type,
+        cpu_threads=cpu_threads
+    )
+    if batch_size:
+        from faster_whisper import BatchedInferencePipeline
+        whisper = BatchedInferencePipeline(model=whisper)
+    _local_model = (whisper, batch_size)
+
+
+def _local_transcribe(
+    file_path: str,
+    start_ms: int,
+    duration_ms: int,
+    beam_size: int
+) -> Tuple[str, Optional[str]]:
+    """
+    Распознает сегмент моделью процесса пула.
+
+    :param file_path: Путь к исходному аудиофайлу.
+    :param start_ms: Начало сегмента в миллисекундах.
+    :param duration_ms: Длительность сегмента в миллисекундах.
+    :param beam_size: Ширина лучевого поиска.
+    :return: Текст и код языка.
+    """
+    model, batch_size = _local_model
+    options = {'batch_size': batch_size} if batch_size else {}
+    segments, info = model.transcribe(
+        decode_segment(file_path, start_ms, duration_ms),
+        beam_size=beam_size,
+        **options
+    )
+    text = " ".join(segment.text.strip() for segment in segments)
+    return text, info.language
+
+
+class LocalWhisperBackend(TranscriptionBackend):
+    """
+    Локальный Whisper (faster-whisper, CTranslate2). Каждый процесс пула
+    держит свою копию модели, сегменты декодируются прямо из исходного
+    файла. С batch_size окна одного сегмента распознаются пакетами.
+    """
+
+    def __init__(
+        self,
+        model: str = 'small',
+        device: str = 'cpu',
+        compute_type: str = 'int8',
+        workers: int = 1,
+        cpu_threads: int = 0,
+        beam_size: int = 5,
+        batch_size: int = 0,
+        max_segment_ms: int = 600000
+    ) -> None:
+        """
+        Инициализация движка. Модель загружается при первом сегменте.
+
+        :param model: Размер модели или путь к модели CTranslate2.
+        :param device: cpu или cuda.
+        :param compute_type: Тип вычислений.
+        :param workers: Число процессов с моделью.
+        :param cpu_threads: Потоков на процесс (0 — ядра поровну).
+        :param beam_size: Ширина лучевого поиска.
+        :param batch_size: Размер пакета окон (0 — без пакетной обработки).
+        :param max_segment_ms: Максимальная длительность сегмента.
+        """
+        if importlib.util.find_spec('faster_whisper') is None:
+            raise RuntimeError(
+                "Для TRANSCRIBE_BACKEND=local установите пакет faster-whisper"
+            )
+        super().__init__(max_segment_ms)
+        self.beam_size = beam_size
+        cpu_threads = cpu_threads or max((os.cpu_count() or 1) // workers, 1)
+        self.executor = AudioExecutor(
+            workers,
+            initializer=_load_local_model,
+            initargs=(model, device, compute_type, cpu_threads, batch_size)
+        )
+        logger.info(
+            "Локальный Whisper: модель %s (%s, %s), процессов %d",
+            model, device, compute_type, workers
+        )
+
+    async def transcribe(self, segment: SegmentSource) -> SegmentTranscription:
+        text, language = await self.executor.run(
+            _local_transcribe,
+            segment.file_path,
+            segment.start_ms,
+            segment.duration_ms,
+            self.beam_size
+        )
+        logger.info(
+            "Сегмент %s с %d мс распознан локально",
+            segment.file_path, segment.start_ms
+        )
+        return SegmentTranscription(text, language)
+
+    def shutdown(self) -> None:
+        self.executor.shutdown()
+
+
+TRANSCRIPTION_BACKENDS = {
+    'openai': OpenAIWhisperBackend,
+    'local': LocalWhisperBackend,
+}
+
+
+def create_backend(backend: str, **kwargs) -> TranscriptionBackend:
+    """
+    Создает движок распознавания выбранного типа.
+
+    :param backend: openai или local.
+    :param kwargs: Параметры движка.
+    :return: Движок распознавания.
+    """
+    try:
+        backend_class = TRANSCRIPTION_BACKENDS[backend]
+    except KeyError:
+        raise ValueError(
+            f"Неизвестный движок распознавания: {backend}"
+        ) from None
+    return backend_class(**kwargs)
@@ -1,9 +1,73 @@
 """Инициализация модулей utils."""
+import httpx
 from config import config
 from .openai_creator import OpenAICreator
+from .openai_gateway import ModelLimits, OpenAIGateway
+from .executor import AudioExecutor
+from .media_cache import MediaResultCache
 
 
+# Соединений хватает на все одновременные запросы, которые пропускает
+# шлюз, чтобы запросы не ждали свободного соединения в пуле
+_openai_connections = config.openai_max_connections or (
+    config.openai_chat_concurrency
+    + config.openai_whisper_concurrency
+    + config.openai_embedding_concurrency
+) or None
+
 openai_client = OpenAICreator.create_openai_client(
     config.openai_api_key,
-    config.proxy
+    config.proxy,
+    config.openai_base_url,
+    limits=httpx.Limits(
+        max_connections=_openai_connections,
+        max_keepalive_connections=(
+            config.openai_max_keepalive_connections or _openai_connections
+        ),
+        keepalive_expiry=config.openai_keepalive_expiry
+    ),
+    timeout=httpx.Timeout(
+        connect=config.openai_connect_timeout,
+        read=config.openai_chat_read_timeout,
+        write=config.openai_chat_write_timeout,
+        pool=config.openai_pool_timeout
+    ),
+    http2=config.openai_http2
+)
+
+openai_gateway = OpenAIGateway(
+    openai_client,
+    limits={
+        'gpt-4o': ModelLimits(
+            concurrency=config.openai_chat_concurrency,
+            rpm=config.openai_chat_rpm,
+            tpm=config.openai_chat_tpm
+        ),
+        'whisper-1': ModelLimits(
+            concurrency=config.openai_whisper_concurrency,
+            rpm=config.openai_whisper_rpm
+        ),
+        config.embedding_model: ModelLimits(
+            concurrency=config.openai_embedding_concurrency,
+            rpm=config.openai_embedding_rpm,
+            tpm=config.openai_embedding_tpm
+        ),
+    },
+    max_retries=config.openai_max_retries,
+    # Загрузка аудио и ответ Whisper дольше, чем у chat и embeddings
+    timeouts={
+        'transcribe': httpx.Timeout(
+            connect=config.openai_connect_timeout,
+            read=config.openai_whisper_read_timeout,
+            write=config.openai_whisper_write_timeout,
+            pool=config.openai_pool_timeout
+        )
+    }
+)
+
+audio_executor = AudioExecutor(config.audio_workers or None)
+
+media_cache = MediaResultCache(
+    config.media_cache_dir,
+    config.media_cache_max_mb * 1024 * 1024
 )
@@ -1,13 +1,16 @@
 """Модуль для работы с отменами пользователя."""
 from typing import Optional
 from app.database.models.user import User
-from app.database.crud import CRUD
+from app.database import user_cache
 
 
 async def is_user_canceled(user: User) -> bool:
     """
     Проверяет, отменил ли пользователь текущую операцию.
 
+    Кэш пользователей перечитывает состояние из базы данных, поэтому
+    отмена, принятая другим узлом, видна сразу.
+
     :param user: Объект пользователя.
     :return: True, если пользователь отменил текущую операцию, False в 
     противном случае.
@@ -20,9 +23,8 @@ async def is_user_canceled(user: User) -> bool:
             "Переданный объект пользователя не содержит атрибута 'number'"
         )
 
-    crud = CRUD(User)
     try:
-        user_data: Optional[User] = await crud.get(user.number)
+        user_data: Optional[User] = await user_cache.get(user.number)
         if not user_data:
             return False
         return user_data.state is None
@@ -0,0 +1,11 @@
+"""Утилиты для работы со временем."""
+from datetime import datetime, timezone
+
+
+def utcnow() -> datetime:
+    """
+    Текущее время UTC без часового пояса (как CURRENT_TIMESTAMP в SQLite).
+
+    :return: Текущее время.
+    """
+    return datetime.now(timezone.utc).replace(tzinfo=None)
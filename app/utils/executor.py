@@ -0,0 +1,73 @@
+"""Пул процессов для обработки аудио."""
+import os
+import asyncio
+import functools
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Optional, Tuple
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class AudioExecutor:
+    """
+    Пул процессов для блокирующих операций с аудио (декодирование,
+    ресемплинг, кодирование), чтобы не блокировать цикл событий.
+    """
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        initializer: Optional[Callable[..., None]] = None,
+        initargs: Tuple[Any, ...] = ()
+    ) -> None:
+        """
+        Инициализация пула.
+
+        :param max_workers: Количество процессов. По умолчанию равно
+        количеству ядер.
+        :param initializer: Функция, выполняемая в каждом процессе при
+        запуске (например, загрузка модели).
+        :param initargs: Аргументы initializer.
+        """
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.initializer = initializer
+        self.initargs = initargs
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """
+        Получить пул процессов, создав его при первом обращении.
+
+        :return: Пул процессов.
+        """
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                initializer=self.initializer,
+                initargs=self.initargs
+            )
+            logger.info(
+                "Пул обработки аудио запущен: %d процессов", self.max_workers
+            )
+        return self._executor
+
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        """
+        Выполнить функцию в пуле процессов.
+
+        :param func: Функция уровня модуля (должна сериализоваться pickle).
+        :param args: Аргументы функции.
+        :return: Результат функции.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._get_executor(), functools.partial(func, *args)
+        )
+
+    def shutdown(self) -> None:
+        """Остановить пул процессов."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+            logger.info("Пул обработки аудио остановлен.")
@@ -0,0 +1,223 @@
+"""Дисковый кэш результатов обработки медиа по содержимому файла."""
+import os
+import gzip
+import json
+import asyncio
+import hashlib
+import tempfile
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Dict, Optional, Set
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+@dataclass
+class CachedResult:
+    """Результат обработки медиафайла."""
+    transcription: str
+    summary: str
+    language: Optional[str]
+    duration_ms: int
+    transcript_id: Optional[int] = None
+
+
+class MediaResultCache:
+    """
+    Кэш результатов обработки, адресуемый содержимым: ключ — SHA-256
+    байтов медиафайла, дополнительно file_id WHAPI ссылается на ключ.
+
+    Результаты хранятся сжатыми файлами в directory, общий размер
+    ограничен max_bytes с вытеснением давно не использованных (LRU по
+    времени изменения файла, которое обновляется при попадании).
+    Ссылки file_id учитываются в индексе по записям и удаляются вместе
+    с записью.
+    """
+
+    def __init__(self, directory: str, max_bytes: int) -> None:
+        """
+        Инициализация кэша.
+
+        :param directory: Директория кэша.
+        :param max_bytes: Максимальный размер кэша в байтах (0 — кэш
+        отключен).
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[str, int] = OrderedDict()
+        # Хеш содержимого -> имена файлов ссылок file_id на запись
+        self._aliases: Dict[str, Set[str]] = {}
+        self._loaded = False
+        self._lock = asyncio.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        """Включен ли кэш."""
+        return self.max_bytes > 0
+
+    def _result_path(self, digest: str) -> str:
+        return os.path.join(self.directory, 'results', f"{digest}.json.gz")
+
+    def _alias_name(self, file_id: str) -> str:
+        return hashlib.sha256(file_id.encode('utf-8')).hexdigest()
+
+    def _alias_path(self, name: str) -> str:
+        return os.path.join(self.directory, 'ids', name)
+
+    def _load(self) -> None:
+        """Строит индекс LRU по файлам кэша на диске."""
+        results = os.path.join(self.directory, 'results')
+        os.makedirs(results, exist_ok=True)
+        os.makedirs(os.path.join(self.directory, 'ids'), exist_ok=True)
+        files = []
+        for entry in os.scandir(results):
+            if entry.name.endswith('.json.gz'):
+                stat = entry.stat()
+                files.append((stat.st_mtime, entry.name[:-8], stat.st_size))
+        for _, digest, size in sorted(files):
+            self._entries[digest] = size
+        # Ссылки file_id на вытесненные записи больше не нужны
+        for entry in os.scandir(os.path.join(self.directory, 'ids')):
+            with open(entry.path, encoding='utf-8') as file:
+                digest = file.read().strip()
+            if digest in self._entries:
+                self._aliases.setdefault(digest, set()).add(entry.name)
+            else:
+                os.remove(entry.path)
+        self._loaded = True
+
+    def _read(self, digest: str) -> Optional[CachedResult]:
+        path = self._result_path(digest)
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as file:
+                result = CachedResult(**json.load(file))
+            os.utime(path)
+            return result
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, TypeError) as e:
+            logger.warning("Поврежденная запись кэша %s: %s", digest, e)
+            self._remove(digest)
+            return None
+
+    def _write(self, digest: str, result: CachedResult) -> int:
+        directory = os.path.dirname(self._result_path(digest))
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as raw:
+                with gzip.GzipFile(fileobj=raw, mode='wb') as file:
+                    file.write(json.dumps(
+                        asdict(result), ensure_ascii=False
+                    ).encode('utf-8'))
+            os.replace(temp_path, self._result_path(digest))
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return os.path.getsize(self._result_path(digest))
+
+    def _remove(self, digest: str) -> None:
+        self._entries.pop(digest, None)
+        paths = [
+            self._alias_path(name)
+            for name in self._aliases.pop(digest, ())
+        ]
+        for path in [self._result_path(digest), *paths]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _get(self, digest: str) -> Optional[CachedResult]:
+        if not self._loaded:
+            self._load()
+        if digest not in self._entries:
+            return None
+        result = self._read(digest)
+        if result is None:
+            self._remove(digest)
+            return None
+        self._entries.move_to_end(digest)
+        return result
+
+    def _get_by_file_id(self, file_id: str) -> Optional[CachedResult]:
+        path = self._alias_path(self._alias_name(file_id))
+        try:
+            with open(path, encoding='utf-8') as file:
+                digest = file.read().strip()
+        except FileNotFoundError:
+            return None
+        return self._get(digest)
+
+    def _alias(self, file_id: str, digest: str) -> None:
+        name = self._alias_name(file_id)
+        with open(self._alias_path(name), 'w', encoding='utf-8') as file:
+            file.write(digest)
+        self._aliases.setdefault(digest, set()).add(name)
+
+    def _put(
+        self,
+        digest: str,
+        result: CachedResult,
+        file_id: Optional[str]
+    ) -> None:
+        if not self._loaded:
+            self._load()
+        self._entries[digest] = self._write(digest, result)
+        self._entries.move_to_end(digest)
+        if file_id:
+            self._alias(file_id, digest)
+        total = sum(self._entries.values())
+        while total > self.max_bytes and len(self._entries) > 1:
+            oldest, size = next(iter(self._entries.items()))
+            self._remove(oldest)
+            total -= size
+            logger.info("Запись кэша медиа %s вытеснена", oldest)
+
+    async def get(
+        self,
+        digest: Optional[str] = None,
+        file_id: Optional[str] = None
+    ) -> Optional[CachedResult]:
+        """
+        Найти результат по хешу содержимого или по file_id.
+
+        :param digest: SHA-256 содержимого файла.
+        :param file_id: Идентификатор медиа WHAPI.
+        :return: Результат или None.
+        """
+        if not self.enabled:
+            return None
+        async with self._lock:
+            if digest is not None:
+                result = await asyncio.to_thread(self._get, digest)
+                if result is not None and file_id:
+                    await asyncio.to_thread(self._alias, file_id, digest)
+                return result
+            if file_id:
+                return await asyncio.to_thread(self._get_by_file_id, file_id)
+        return None
+
+    async def put(
+        self,
+        digest: str,
+        result: CachedResult,
+        file_id: Optional[str] = None
+    ) -> None:
+        """
+        Сохранить результат обработки.
+
+        :param digest: SHA-256 содержимого файла.
+        :param result: Результат.
+        :param file_id: Идентификатор медиа WHAPI.
+        """
+        if not self.enabled:
+            return
+        async with self._lock:
+            try:
+                await asyncio.to_thread(self._put, digest, result, file_id)
+            except OSError as e:
+                logger.error(
+                    "Ошибка записи в кэш медиа: %s", e, exc_info=True
+                )
@@ -1,4 +1,5 @@
 """OpenAI конфигуратор."""
+from typing import Optional
 import httpx
 from openai import AsyncOpenAI, OpenAIError
 from app.utils.logger import setup_logger
@@ -10,26 +11,52 @@ class OpenAICreator:
     """Конфигуратор OpenAI."""
 
     @staticmethod
-    def create_openai_client(api_key: str, proxy: str) -> AsyncOpenAI:
+    def create_openai_client(
+        api_key: str,
+        proxy: str,
+        base_url: str = '',
+        limits: Optional[httpx.Limits] = None,
+        timeout: httpx.Timeout | float = 360,
+        http2: bool = False
+    ) -> AsyncOpenAI:
         """
-        Создает клиента OpenAI с настройками прокси и тайм-аута.
+        Создает клиента OpenAI с настройками прокси, пула соединений и
+        тайм-аута. Собственные повторы клиента отключены: их выполняет
+        OpenAIGateway.
 
+        :param api_key: Ключ API.
+        :param proxy: Прокси или localhost.
+        :param base_url: Адрес API (пустая строка — адрес по умолчанию).
+        :param limits: Лимиты пула соединений (None — по умолчанию httpx).
+        :param timeout: Тайм-аут запросов по умолчанию.
+        :param http2: Использовать HTTP/2.
         :return: Настроенный клиент OpenAI.
         :raises: OpenAIError, если не удалось создать клиента.
         """
-        proxies = (
-            None if proxy == 'localhost'
-            else {'https://': proxy, 'http://': proxy}
-        )
+        proxy = None if proxy == 'localhost' else proxy
         logger.info(
             "Прокси не используется (указан localhost)."
-            if proxies is None else f"Используется прокси: {proxy}"
+            if proxy is None else f"Используется прокси: {proxy}"
         )
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError as e:
+                raise RuntimeError(
+                    "Для OPENAI_HTTP2=1 установите пакет httpx[http2]"
+                ) from e
 
         try:
             client = AsyncOpenAI(
                 api_key=api_key,
-                http_client=httpx.AsyncClient(proxies=proxies, timeout=360)
+                base_url=base_url or None,
+                max_retries=0,
+                http_client=httpx.AsyncClient(
+                    proxy=proxy,
+                    limits=limits or httpx.Limits(),
+                    timeout=timeout,
+                    http2=http2
+                )
             )
             logger.info("Клиент OpenAI успешно инициализирован.")
             return client
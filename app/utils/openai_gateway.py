@@ -0,0 +1,477 @@
+"""
+Шлюз запросов к OpenAI с учетом лимитов.
+
+Для каждой модели действуют свой лимит одновременных запросов и
+корзины токенов запросов (RPM) и токенов (TPM) в минуту. Очередь к модели
+упорядочена по приоритету, поэтому короткие вопросы пользователей не
+ждут за суммаризацией длинных записей. Заголовки x-ratelimit-* ответов
+уточняют корзины, а ответ 429 приостанавливает все запросы к модели на
+время, указанное сервером.
+"""
+import re
+import heapq
+import time
+import random
+import asyncio
+import itertools
+from dataclasses import dataclass
+from enum import IntEnum
+from pathlib import Path
+from typing import (
+    Any, Awaitable, Callable, Dict, List, Mapping, Optional, Sequence, Tuple
+)
+import httpx
+from openai import (
+    APIConnectionError,
+    APIStatusError,
+    AsyncOpenAI,
+    InternalServerError,
+    RateLimitError
+)
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Оценка числа символов на токен для корзины TPM
+CHARS_PER_TOKEN = 4
+
+# Оценка ответа модели, если max_tokens не указан
+DEFAULT_COMPLETION_TOKENS = 1000
+
+# Максимальная пауза между повторами (секунды)
+MAX_BACKOFF = 60
+
+# Длительность в формате заголовков OpenAI: 1s, 6m0s, 20ms, 1h2m3.5s
+_DURATION_PART = re.compile(r'(\d+(?:\.\d+)?)(ms|h|m|s)')
+_DURATION_UNITS = {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600}
+
+
+class Priority(IntEnum):
+    """Приоритет запроса: меньшее значение обслуживается раньше."""
+    INTERACTIVE = 0
+    NORMAL = 1
+    BULK = 2
+
+
+@dataclass
+class ModelLimits:
+    """Лимиты модели (0 — без ограничения)."""
+    concurrency: int = 0
+    rpm: int = 0
+    tpm: int = 0
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """
+    Разбирает длительность из заголовка ответа OpenAI.
+
+    :param value: Значение заголовка (например, 6m0s или 1.5).
+    :return: Длительность в секундах или None.
+    """
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(number) * _DURATION_UNITS[unit] for number, unit in parts)
+
+
+def _header_int(headers: Mapping[str, str], name: str) -> Optional[int]:
+    """
+    Целое значение заголовка.
+
+    :param headers: Заголовки ответа.
+    :param name: Название заголовка.
+    :return: Значение или None.
+    """
+    try:
+        return int(headers[name])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def retry_delay(headers: Mapping[str, str]) -> Optional[float]:
+    """
+    Пауза до повтора, указанная сервером.
+
+    :param headers: Заголовки ответа.
+    :return: Пауза в секундах или None.
+    """
+    retry_after_ms = _header_int(headers, 'retry-after-ms')
+    if retry_after_ms is not None:
+        return retry_after_ms / 1000
+    retry_after = parse_duration(headers.get('retry-after'))
+    if retry_after is not None:
+        return retry_after
+    resets = [
+        parse_duration(headers.get(f'x-ratelimit-reset-{kind}'))
+        for kind in ('requests', 'tokens')
+        if _header_int(headers, f'x-ratelimit-remaining-{kind}') == 0
+    ]
+    resets = [reset for reset in resets if reset is not None]
+    return max(resets) if resets else None
+
+
+class TokenBucket:
+    """Корзина токенов, пополняемая равномерно за минуту."""
+
+    def __init__(self, per_minute: int = 0) -> None:
+        """
+        Инициализация корзины.
+
+        :param per_minute: Емкость и скорость пополнения в минуту
+        (0 — без ограничения).
+        """
+        self.capacity = float(per_minute)
+        self.level = float(per_minute)
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.level = min(
+            self.capacity,
+            self.level + (now - self._updated) * self.capacity / 60
+        )
+        self._updated = now
+
+    def delay(self, amount: float) -> float:
+        """
+        Время ожидания, через которое в корзине наберется amount.
+
+        :param amount: Требуемое число токенов.
+        :return: Ожидание в секундах.
+        """
+        if not self.capacity:
+            return 0
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0
+        return (amount - self.level) * 60 / self.capacity
+
+    def consume(self, amount: float) -> None:
+        """
+        Списать токены.
+
+        :param amount: Число токенов.
+        """
+        if self.capacity:
+            self._refill()
+            self.level -= min(amount, self.capacity)
+
+    def update(self, limit: Optional[int], remaining: Optional[int]) -> None:
+        """
+        Уточнить корзину по заголовкам ответа: лимит ключа мог оказаться
+        ниже настроенного, а остаток расходуют и другие клиенты.
+
+        :param limit: Лимит в минуту по данным сервера.
+        :param remaining: Остаток по данным сервера.
+        """
+        if limit and (not self.capacity or limit < self.capacity):
+            self._refill()
+            self.capacity = float(limit)
+            self.level = min(self.level, self.capacity)
+        if remaining is not None and self.capacity:
+            self._refill()
+            self.level = min(self.level, float(remaining))
+
+
+class ModelLimiter:
+    """Очередь с приоритетами и лимитами запросов к одной модели."""
+
+    def __init__(self, limits: ModelLimits) -> None:
+        """
+        Инициализация ограничителя.
+
+        :param limits: Лимиты модели.
+        """
+        self.concurrency = limits.concurrency
+        self.requests = TokenBucket(limits.rpm)
+        self.tokens = TokenBucket(limits.tpm)
+        self.paused_until = 0.0
+        self._active = 0
+        self._queue: List[Tuple[int, int]] = []
+        self._sequence = itertools.count()
+        self._condition = asyncio.Condition()
+
+    def _delay(self, tokens: int) -> float:
+        return max(
+            self.paused_until - time.monotonic(),
+            self.requests.delay(1),
+            self.tokens.delay(tokens)
+        )
+
+    async def acquire(self, priority: Priority, tokens: int) -> None:
+        """
+        Дождаться очереди и лимитов и занять слот модели.
+
+        :param priority: Приоритет запроса.
+        :param tokens: Оценка токенов запроса.
+        """
+        entry = (int(priority), next(self._sequence))
+        async with self._condition:
+            heapq.heappush(self._queue, entry)
+            try:
+                while True:
+                    delay = None
+                    if self._queue[0] == entry and (
+                        not self.concurrency or self._active < self.concurrency
+                    ):
+                        delay = self._delay(tokens)
+                        if delay <= 0:
+                            break
+                    try:
+                        await asyncio.wait_for(self._condition.wait(), delay)
+                    except asyncio.TimeoutError:
+                        pass
+            except BaseException:
+                self._queue.remove(entry)
+                heapq.heapify(self._queue)
+                self._condition.notify_all()
+                raise
+            heapq.heappop(self._queue)
+            self._active += 1
+            self.requests.consume(1)
+            self.tokens.consume(tokens)
+            self._condition.notify_all()
+
+    async def release(self) -> None:
+        """Освободить слот модели."""
+        async with self._condition:
+            self._active -= 1
+            self._condition.notify_all()
+
+    def observe(self, headers: Mapping[str, str]) -> None:
+        """
+        Уточнить лимиты по заголовкам ответа.
+
+        :param headers: Заголовки ответа.
+        """
+        for kind, bucket in (
+            ('requests', self.requests), ('tokens', self.tokens)
+        ):
+            remaining = _header_int(headers, f'x-ratelimit-remaining-{kind}')
+            bucket.update(
+                _header_int(headers, f'x-ratelimit-limit-{kind}'), remaining
+            )
+            if remaining == 0:
+                reset = parse_duration(
+                    headers.get(f'x-ratelimit-reset-{kind}')
+                )
+                if reset:
+                    self.pause(reset)
+
+    def pause(self, seconds: float) -> None:
+        """
+        Приостановить запросы к модели.
+
+        :param seconds: Длительность паузы.
+        """
+        self.paused_until = max(
+            self.paused_until, time.monotonic() + min(seconds, MAX_BACKOFF)
+        )
+
+
+class OpenAIGateway:
+    """
+    Общий шлюз запросов к OpenAI.
+
+    Клиент OpenAI должен быть создан без собственных повторов: повторы
+    выполняет шлюз, соблюдая паузы, указанные сервером.
+    """
+
+    def __init__(
+        self,
+        client: AsyncOpenAI,
+        limits: Optional[Dict[str, ModelLimits]] = None,
+        max_retries: int = 5,
+        backoff_base: float = 1.0,
+        timeouts: Optional[Dict[str, httpx.Timeout]] = None
+    ) -> None:
+        """
+        Инициализация шлюза.
+
+        :param client: Клиент OpenAI.
+        :param limits: Лимиты по моделям (остальные модели без лимитов).
+        :param max_retries: Число повторов при 429, 5xx и ошибках
+        соединения.
+        :param backoff_base: Начальная пауза экспоненциального повтора,
+        если сервер не указал свою (секунды).
+        :param timeouts: Тайм-ауты по видам запросов (chat, transcribe,
+        embed), остальные запросы — с тайм-аутом клиента.
+        """
+        self.client = client
+        self.limits = limits or {}
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.timeouts = timeouts or {}
+        self._limiters: Dict[str, ModelLimiter] = {}
+
+    def limiter(self, model: str) -> ModelLimiter:
+        """
+        Ограничитель запросов модели.
+
+        :param model: Модель.
+        :return: Ограничитель.
+        """
+        limiter = self._limiters.get(model)
+        if limiter is None:
+            limiter = ModelLimiter(self.limits.get(model, ModelLimits()))
+            self._limiters[model] = limiter
+        return limiter
+
+    def _options(self, kind: str, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Параметры запроса с тайм-аутом для его вида.
+
+        :param kind: Вид запроса.
+        :param kwargs: Параметры запроса.
+        :return: Параметры запроса.
+        """
+        if kind in self.timeouts:
+            kwargs.setdefault('timeout', self.timeouts[kind])
+        return kwargs
+
+    def _backoff(self, attempt: int) -> float:
+        delay = self.backoff_base * 2 ** attempt
+        return min(delay + random.uniform(0, delay / 2), MAX_BACKOFF)
+
+    async def _call(
+        self,
+        model: str,
+        request: Callable[[], Awaitable[Any]],
+        priority: Priority,
+        tokens: int
+    ) -> Any:
+        """
+        Выполняет запрос с учетом лимитов модели и повторами.
+
+        :param model: Модель.
+        :param request: Функция запроса, возвращающая сырой ответ.
+        :param priority: Приоритет запроса.
+        :param tokens: Оценка токенов запроса.
+        :return: Разобранный ответ.
+        """
+        limiter = self.limiter(model)
+        attempt = 0
+        while True:
+            await limiter.acquire(priority, tokens)
+            try:
+                response = await request()
+                limiter.observe(response.headers)
+                return response.parse()
+            except (RateLimitError, InternalServerError,
+                    APIConnectionError) as e:
+                if attempt >= self.max_retries:
+                    raise
+                headers = (
+                    e.response.headers if isinstance(e, APIStatusError)
+                    else {}
+                )
+                delay = retry_delay(headers) or self._backoff(attempt)
+                rate_limited = isinstance(e, RateLimitError)
+                if rate_limited:
+                    # Лимит общий для модели: паузу соблюдают все запросы
+                    limiter.observe(headers)
+                    limiter.pause(delay)
+                logger.warning(
+                    "Запрос к %s не выполнен (%s), повтор через %.1f с",
+                    model, type(e).__name__, delay
+                )
+                attempt += 1
+            finally:
+                await limiter.release()
+            if not rate_limited:
+                await asyncio.sleep(delay)
+
+    async def chat(
+        self,
+        messages: List[Dict[str, str]],
+        model: str = 'gpt-4o',
+        priority: Priority = Priority.NORMAL,
+        **kwargs
+    ) -> Any:
+        """
+        Запрос chat.completions.
+
+        :param messages: Сообщения.
+        :param model: Модель.
+        :param priority: Приоритет запроса.
+        :param kwargs: Остальные параметры запроса.
+        :return: Ответ chat.completions.
+        """
+        tokens = sum(
+            len(str(message.get('content', ''))) for message in messages
+        ) // CHARS_PER_TOKEN + (
+            kwargs.get('max_tokens') or DEFAULT_COMPLETION_TOKENS
+        )
+        return await self._call(
+            model,
+            lambda: self.client.chat.completions.with_raw_response.create(
+                model=model,
+                messages=messages,
+                **self._options('chat', kwargs)
+            ),
+            priority,
+            tokens
+        )
+
+    async def transcribe(
+        self,
+        file_path: str | Path,
+        model: str = 'whisper-1',
+        priority: Priority = Priority.BULK,
+        **kwargs
+    ) -> Any:
+        """
+        Запрос audio.transcriptions. Файл открывается заново при каждом
+        повторе.
+
+        :param file_path: Путь к аудиофайлу.
+        :param model: Модель.
+        :param priority: Приоритет запроса.
+        :param kwargs: Остальные параметры запроса.
+        :return: Ответ audio.transcriptions.
+        """
+        async def request() -> Any:
+            with open(file_path, 'rb') as audio_file:
+                return await self.client.audio.transcriptions \
+                    .with_raw_response.create(
+                        model=model,
+                        file=audio_file,
+                        **self._options('transcribe', kwargs)
+                    )
+
+        return await self._call(model, request, priority, 0)
+
+    async def embed(
+        self,
+        texts: Sequence[str],
+        model: str,
+        priority: Priority = Priority.BULK,
+        **kwargs
+    ) -> Any:
+        """
+        Запрос embeddings.
+
+        :param texts: Тексты.
+        :param model: Модель.
+        :param priority: Приоритет запроса.
+        :param kwargs: Остальные параметры запроса.
+        :return: Ответ embeddings.
+        """
+        tokens = sum(len(text) for text in texts) // CHARS_PER_TOKEN
+        return await self._call(
+            model,
+            lambda: self.client.embeddings.with_raw_response.create(
+                model=model,
+                input=list(texts),
+                **self._options('embed', kwargs)
+            ),
+            priority,
+            tokens
+        )
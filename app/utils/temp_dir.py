@@ -1,33 +1,63 @@
 """Утилиты для работы с временными файлами."""
 import os
+import hashlib
 import tempfile
+from typing import Callable, Optional, Tuple
 from app.utils.logger import setup_logger
 from app.whapi import whapi_client
+from config import config
 
 logger = setup_logger(__name__)
 
 
-async def download_media(media_url: str) -> str:
+async def download_media(
+    media_url: str,
+    progress_callback: Optional[Callable[[int, Optional[int]], None]] = None,
+    chunk_callback: Optional[Callable[[bytes], None]] = None
+) -> str:
     """
-    Скачивает медиафайл и сохраняет его во временную директорию.
+    Потоково скачивает медиафайл во временную директорию.
 
     :param media_url: URL медиафайла.
+    :param progress_callback: Функция (скачано байт, всего байт или None).
+    :param chunk_callback: Функция, получающая каждую часть данных.
     :return: Путь к скачанному временному файлу.
     :raises: Исключение при ошибке скачивания.
     """
-
-    response = await whapi_client.get_file(media_url)
-
     with tempfile.NamedTemporaryFile(delete=False) as temp_file:
-        temp_file.write(response)
         temp_file_path = temp_file.name
-        logger.info(
-            "Медиафайл %s скачан во временный файл %s",
-            media_url, temp_file_path
+
+    try:
+        size = await whapi_client.download_file(
+            media_url,
+            temp_file_path,
+            max_size=config.max_media_size_mb * 1024 * 1024,
+            progress_callback=progress_callback,
+            chunk_callback=chunk_callback
         )
+    except Exception:
+        cleanup_files(temp_file_path)
+        raise
+
+    logger.info(
+        "Медиафайл %s скачан во временный файл %s (%d байт)",
+        media_url, temp_file_path, size
+    )
     return temp_file_path
 
 
+async def download_media_hashed(media_url: str) -> Tuple[str, str]:
+    """
+    Скачивает медиафайл, вычисляя SHA-256 содержимого по мере загрузки.
+
+    :param media_url: URL медиафайла.
+    :return: Путь к скачанному временному файлу и хеш содержимого.
+    """
+    hasher = hashlib.sha256()
+    path = await download_media(media_url, chunk_callback=hasher.update)
+    return path, hasher.hexdigest()
+
+
 def cleanup_files(*file_paths: str) -> None:
     """
     Удаляет временные файлы.
@@ -43,25 +73,3 @@ def cleanup_files(*file_paths: str) -> None:
                 "Ошибка при удалении файла %s: %s", file_path, e, exc_info=True
             )
 
-
-def save_transcription_as_text(transcription: str) -> str:
-    """
-    Сохраняет транскрипцию в текстовый файл.
-
-    :param transcription: текст транскрипции
-    :return: полный путь к файлу
-    """
-    try:
-        with tempfile.NamedTemporaryFile(
-            delete=False, suffix=".txt", mode='w', encoding='utf-8'
-        ) as text_file:
-            text_file.write(transcription)
-            filename = text_file.name
-
-        logger.info("Текстовый файл сохранен как %s", filename)
-        return filename
-    except Exception as e:
-        logger.error(
-            "Ошибка сохранения текстового файла: %s", e, exc_info=True
-        )
-        raise
@@ -2,4 +2,11 @@
 from .api import WHAPI
 from config import config
 
-whapi_client = WHAPI(config.whapi_token)
+whapi_client = WHAPI(
+    config.whapi_token,
+    pool_limit=config.whapi_pool_limit,
+    pool_limit_per_host=config.whapi_pool_limit_per_host,
+    keepalive_timeout=config.whapi_keepalive_timeout,
+    dns_cache_ttl=config.whapi_dns_cache_ttl,
+    download_read_timeout=config.whapi_download_read_timeout
+)
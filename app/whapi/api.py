@@ -1,10 +1,10 @@
 """WHAPI API модуль."""
 import random
 import string
-import base64
-from typing import Dict, Any
+from typing import IO, Dict, Any, Callable, Optional, Union
 
 import aiohttp
+import aiofiles
 
 from app.utils.logger import setup_logger
 from .buttons import Markup
@@ -12,23 +12,88 @@ from .buttons import Markup
 
 logger = setup_logger(__name__)
 
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+
+class FileTooLargeError(ValueError):
+    """Размер скачиваемого файла превышает допустимый."""
+
 
 class WHAPI:
     """Класс для работы с WHAPI."""
 
-    def __init__(self, api_key: str) -> None:
+    def __init__(
+        self,
+        api_key: str,
+        pool_limit: int = 100,
+        pool_limit_per_host: int = 0,
+        keepalive_timeout: int = 30,
+        dns_cache_ttl: int = 300,
+        download_read_timeout: int = 60
+    ) -> None:
         """
         Инициализация WHAPI.
 
         :param api_key: WHAPI API ключ.
+        :param pool_limit: Максимальное число соединений в пуле.
+        :param pool_limit_per_host: Максимальное число соединений к одному
+        хосту (0 - без ограничения).
+        :param keepalive_timeout: Время жизни неиспользуемого соединения
+        (секунды).
+        :param dns_cache_ttl: Время кэширования DNS (секунды).
+        :param download_read_timeout: Максимальная пауза между частями
+        скачиваемого файла (секунды). Общее время скачивания не
+        ограничено.
         """
         self.api_key = api_key
         self._headers = {
             'Content-Type': 'application/json',
             'Authorization': f'Bearer {api_key}'
         }
+        self._upload_headers = {'Authorization': f'Bearer {api_key}'}
         self._base_url = 'https://gate.whapi.cloud'
         self.authorization_token = self._generate_authorization_token()
+        self._pool_limit = pool_limit
+        self._pool_limit_per_host = pool_limit_per_host
+        self._keepalive_timeout = keepalive_timeout
+        self._dns_cache_ttl = dns_cache_ttl
+        self._download_timeout = aiohttp.ClientTimeout(
+            total=None, sock_read=download_read_timeout
+        )
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def start(self) -> None:
+        """Открыть общую HTTP сессию с пулом соединений."""
+        if self._session is not None and not self._session.closed:
+            return
+        connector = aiohttp.TCPConnector(
+            limit=self._pool_limit,
+            limit_per_host=self._pool_limit_per_host,
+            keepalive_timeout=self._keepalive_timeout,
+            ttl_dns_cache=self._dns_cache_ttl
+        )
+        self._session = aiohttp.ClientSession(connector=connector)
+        logger.info(
+            "HTTP сессия WHAPI открыта (лимит соединений: %d)",
+            self._pool_limit
+        )
+
+    async def close(self) -> None:
+        """Закрыть общую HTTP сессию."""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+            logger.info("HTTP сессия WHAPI закрыта.")
+        self._session = None
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """
+        Получить общую HTTP сессию, открыв ее при необходимости.
+
+        :return: HTTP сессия.
+        """
+        if self._session is None or self._session.closed:
+            await self.start()
+        return self._session
 
     async def _request(
         self,
@@ -46,12 +111,12 @@ class WHAPI:
         """
         url = f"{self._base_url}{endpoint}"
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.request(
-                    method, url, headers=self._headers, json=json
-                ) as response:
-                    response.raise_for_status()
-                    return await response.json()
+            session = await self._get_session()
+            async with session.request(
+                method, url, headers=self._headers, json=json
+            ) as response:
+                response.raise_for_status()
+                return await response.json()
         except aiohttp.ClientError as e:
             logger.error("Ошибка HTTP запроса: %s", e)
             raise
@@ -132,34 +197,107 @@ class WHAPI:
         )
         return response
 
-    async def send_document(
+    async def upload_media(
+        self,
+        data: Union[IO[bytes], bytes],
+        filename: str,
+        content_type: str = 'application/octet-stream'
+    ) -> str:
+        """
+        Загрузка медиафайла в хранилище WHAPI (multipart/form-data).
+        Файловый объект передается потоково, без чтения в память.
+
+        :param data: Открытый на чтение файл или байты.
+        :param filename: Имя файла.
+        :param content_type: MIME тип файла.
+        :return: ID загруженного медиафайла.
+        """
+        form = aiohttp.FormData()
+        form.add_field(
+            'file', data, filename=filename, content_type=content_type
+        )
+        url = f"{self._base_url}/media"
+        try:
+            session = await self._get_session()
+            async with session.post(
+                url, headers=self._upload_headers, data=form
+            ) as response:
+                response.raise_for_status()
+                result = await response.json()
+        except aiohttp.ClientError as e:
+            logger.error("Ошибка загрузки медиафайла: %s", e)
+            raise
+        return result['media'][0]['id']
+
+    async def _send_uploaded_document(
         self,
         to: str,
         filename: str,
-        file_path: str,
-        caption: str,
+        media_id: str,
+        caption: str
     ) -> dict:
         """
-        Отправка документа через WHAPI.
+        Отправка ранее загруженного документа.
 
         :param to: Номер телефона в формате.
         :param filename: Имя файла.
-        :param file_path: Путь к файлу.
+        :param media_id: ID медиафайла в WHAPI.
         :param caption: Подпись.
         :return: JSON ответ.
         """
-        base64_file = base64.b64encode(open(file_path, 'rb').read()).decode()
         body = {
             "to": str(to),
-            "media": (
-                "data:application/octet-stream;"
-                f"name={filename};"
-                f"base64,{base64_file}"
-            ),
+            "media": media_id,
+            "filename": filename,
             "caption": caption
         }
         return await self._request('POST', '/messages/document', body)
 
+    async def send_document(
+        self,
+        to: str,
+        filename: str,
+        file_path: str,
+        caption: str,
+    ) -> dict:
+        """
+        Отправка документа через WHAPI. Файл загружается потоково.
+
+        :param to: Номер телефона в формате.
+        :param filename: Имя файла.
+        :param file_path: Путь к файлу.
+        :param caption: Подпись.
+        :return: JSON ответ.
+        """
+        with open(file_path, 'rb') as file:
+            media_id = await self.upload_media(file, filename)
+        return await self._send_uploaded_document(
+            to, filename, media_id, caption
+        )
+
+    async def send_document_bytes(
+        self,
+        to: str,
+        filename: str,
+        data: bytes,
+        caption: str,
+        content_type: str = 'application/octet-stream'
+    ) -> dict:
+        """
+        Отправка документа из памяти, без временного файла.
+
+        :param to: Номер телефона в формате.
+        :param filename: Имя файла.
+        :param data: Содержимое файла.
+        :param caption: Подпись.
+        :param content_type: MIME тип файла.
+        :return: JSON ответ.
+        """
+        media_id = await self.upload_media(data, filename, content_type)
+        return await self._send_uploaded_document(
+            to, filename, media_id, caption
+        )
+
     async def delete_message(self, message_id: str) -> dict:
         """
         Удаление сообщения.
@@ -169,18 +307,71 @@ class WHAPI:
         """
         return await self._request('DELETE', f'/messages/{message_id}', None)
 
-    async def get_file(self, link: str) -> bytes:
+    async def download_file(
+        self,
+        link: str,
+        file_path: str,
+        max_size: Optional[int] = None,
+        progress_callback: Optional[
+            Callable[[int, Optional[int]], None]
+        ] = None,
+        chunk_callback: Optional[Callable[[bytes], None]] = None
+    ) -> int:
         """
-        Получение файла.
+        Потоковое скачивание файла на диск по частям.
 
-        :param file_id: ID файла.
-        :return: Содержимое файла.
+        :param link: Ссылка на файл.
+        :param file_path: Путь для сохранения файла.
+        :param max_size: Максимальный размер файла в байтах.
+        :param progress_callback: Функция (скачано байт, всего байт или
+        None), вызываемая после каждой части.
+        :param chunk_callback: Функция, получающая каждую часть данных
+        (например, для потокового хеширования).
+        :return: Количество скачанных байт.
+        :raises FileTooLargeError: Если файл превышает max_size.
+        :raises aiohttp.ClientPayloadError: Если размер не совпал с
+        Content-Length.
         """
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(link) as response:
-                    response.raise_for_status()
-                    return await response.read()
+            session = await self._get_session()
+            async with session.get(
+                link, timeout=self._download_timeout
+            ) as response:
+                response.raise_for_status()
+                total = response.content_length
+                if max_size and total and total > max_size:
+                    raise FileTooLargeError(
+                        f"Размер файла {total} превышает {max_size} байт"
+                    )
+
+                downloaded = 0
+                async with aiofiles.open(file_path, mode='wb') as file:
+                    async for chunk in response.content.iter_chunked(
+                        DOWNLOAD_CHUNK_SIZE
+                    ):
+                        downloaded += len(chunk)
+                        if max_size and downloaded > max_size:
+                            raise FileTooLargeError(
+                                f"Размер файла превышает {max_size} байт"
+                            )
+                        await file.write(chunk)
+                        if chunk_callback:
+                            chunk_callback(chunk)
+                        if progress_callback:
+                            progress_callback(downloaded, total)
+
+                # При Content-Encoding заголовок содержит размер сжатых
+                # данных, а в файл записываются распакованные
+                encoded = 'Content-Encoding' in response.headers
+                if (
+                    total is not None
+                    and not encoded
+                    and downloaded != total
+                ):
+                    raise aiohttp.ClientPayloadError(
+                        f"Получено {downloaded} байт из {total}"
+                    )
+                return downloaded
         except aiohttp.ClientError as e:
             logger.error("Ошибка HTTP запроса: %s", e)
             raise
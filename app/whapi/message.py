@@ -7,6 +7,7 @@ class MessageType:
     """Типы сообщений."""
     TEXT = 'text'
     REPLY = 'reply'
+    MEDIA = frozenset({'voice', 'audio', 'document', 'video'})
 
 
 @dataclass
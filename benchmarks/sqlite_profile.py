@@ -0,0 +1,87 @@
+"""
+Бенчмарк профиля SQLite: количество коммитов в секунду с настройками
+по умолчанию (NullPool, журнал отката) и с профилем из
+app.database.engine (пул соединений, SQLITE_PRAGMAS).
+
+Запуск: python -m benchmarks.sqlite_profile [--commits N] [--concurrency N]
+"""
+import os
+import time
+import asyncio
+import argparse
+import tempfile
+from typing import Dict, Optional
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool
+from app.database.engine import SQLITE_PRAGMAS, configure_sqlite
+
+
+async def run_profile(
+    pragmas: Optional[Dict[str, str]],
+    commits: int,
+    concurrency: int
+) -> float:
+    """
+    Выполняет небольшие коммиты в таблицу users в несколько потоков.
+
+    :param pragmas: PRAGMA профиля или None для настроек по умолчанию.
+    :param commits: Общее количество коммитов.
+    :param concurrency: Количество параллельных задач.
+    :return: Коммитов в секунду.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_async_engine(
+            f"sqlite+aiosqlite:///{os.path.join(directory, 'bench.sqlite')}",
+            poolclass=AsyncAdaptedQueuePool if pragmas else NullPool
+        )
+        if pragmas:
+            configure_sqlite(engine, pragmas)
+
+        async with engine.begin() as conn:
+            await conn.execute(text(
+                "CREATE TABLE users (number INTEGER PRIMARY KEY, "
+                "gpt_requests INTEGER DEFAULT 0, updated_at TIMESTAMP)"
+            ))
+            await conn.execute(
+                text("INSERT INTO users (number) VALUES (:number)"),
+                [{"number": number} for number in range(concurrency)]
+            )
+
+        async def worker(number: int, count: int) -> None:
+            for _ in range(count):
+                async with engine.begin() as conn:
+                    await conn.execute(
+                        text(
+                            "UPDATE users SET gpt_requests = gpt_requests + 1,"
+                            " updated_at = CURRENT_TIMESTAMP"
+                            " WHERE number = :number"
+                        ),
+                        {"number": number}
+                    )
+
+        per_worker = commits // concurrency
+        started = time.perf_counter()
+        await asyncio.gather(
+            *(worker(number, per_worker) for number in range(concurrency))
+        )
+        elapsed = time.perf_counter() - started
+        await engine.dispose()
+        return per_worker * concurrency / elapsed
+
+
+async def main() -> None:
+    """Запуск бенчмарка."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--commits", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    default = await run_profile(None, args.commits, args.concurrency)
+    tuned = await run_profile(SQLITE_PRAGMAS, args.commits, args.concurrency)
+    print(f"default: {default:10.1f} commits/s")
+    print(f"tuned:   {tuned:10.1f} commits/s ({tuned / default:.1f}x)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
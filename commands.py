@@ -14,3 +14,9 @@ ADMIN_COMMAND = 'admin'
 
 # Команда для нового аудио
 NEW_AUDIO_COMMAND = 'new_audio'
+
+# Команда для истории транскрипций
+HISTORY_COMMAND = 'history'
+
+# Команда для выбора транскрипции для вопросов
+SELECT_COMMAND = 'select'
@@ -21,17 +21,287 @@ class Config:
         self._load_environment_variables(env_file)
         self.whapi_token = self._get_env_variable("WHAPI_TOKEN")
         self.webhook_host = self._get_env_variable("WEBHOOK_HOST", 'localhost')
+        self.whapi_pool_limit = self._get_int_env_variable(
+            "WHAPI_POOL_LIMIT", 100
+        )
+        self.whapi_pool_limit_per_host = self._get_int_env_variable(
+            "WHAPI_POOL_LIMIT_PER_HOST", 0
+        )
+        self.whapi_keepalive_timeout = self._get_int_env_variable(
+            "WHAPI_KEEPALIVE_TIMEOUT", 30
+        )
+        self.whapi_dns_cache_ttl = self._get_int_env_variable(
+            "WHAPI_DNS_CACHE_TTL", 300
+        )
+        # Скачивание медиа ограничено только паузой между частями данных
+        self.whapi_download_read_timeout = self._get_int_env_variable(
+            "WHAPI_DOWNLOAD_READ_TIMEOUT", 60
+        )
         self.admin_number = self._get_env_variable("ADMIN_NUMBER")
         self.timezone = self._get_env_variable("TIMEZONE", "UTC")
         self.openai_api_key = self._get_env_variable("OPENAI_API_KEY")
         self.proxy = self._get_env_variable("PROXY", 'localhost')
+        # Другой адрес API, например локальный тестовый сервер
+        self.openai_base_url = self._get_env_variable("OPENAI_BASE_URL", '')
+        self.openai_max_retries = self._get_int_env_variable(
+            "OPENAI_MAX_RETRIES", 5
+        )
+        # Лимиты запросов к моделям (0 - без ограничения)
+        self.openai_chat_concurrency = self._get_int_env_variable(
+            "OPENAI_CHAT_CONCURRENCY", 8
+        )
+        self.openai_chat_rpm = self._get_int_env_variable(
+            "OPENAI_CHAT_RPM", 500
+        )
+        self.openai_chat_tpm = self._get_int_env_variable(
+            "OPENAI_CHAT_TPM", 30000
+        )
+        self.openai_whisper_concurrency = self._get_int_env_variable(
+            "OPENAI_WHISPER_CONCURRENCY", 8
+        )
+        self.openai_whisper_rpm = self._get_int_env_variable(
+            "OPENAI_WHISPER_RPM", 50
+        )
+        self.openai_embedding_concurrency = self._get_int_env_variable(
+            "OPENAI_EMBEDDING_CONCURRENCY", 4
+        )
+        self.openai_embedding_rpm = self._get_int_env_variable(
+            "OPENAI_EMBEDDING_RPM", 3000
+        )
+        self.openai_embedding_tpm = self._get_int_env_variable(
+            "OPENAI_EMBEDDING_TPM", 1000000
+        )
+        # Пул соединений HTTP (0 - по сумме лимитов одновременных
+        # запросов к моделям)
+        self.openai_max_connections = self._get_int_env_variable(
+            "OPENAI_MAX_CONNECTIONS", 0
+        )
+        self.openai_max_keepalive_connections = self._get_int_env_variable(
+            "OPENAI_MAX_KEEPALIVE_CONNECTIONS", 0
+        )
+        self.openai_keepalive_expiry = self._get_int_env_variable(
+            "OPENAI_KEEPALIVE_EXPIRY", 30
+        )
+        # HTTP/2 требует пакета h2 (httpx[http2])
+        self.openai_http2 = bool(self._get_int_env_variable("OPENAI_HTTP2", 0))
+        # Тайм-ауты по фазам запроса (секунды)
+        self.openai_connect_timeout = self._get_int_env_variable(
+            "OPENAI_CONNECT_TIMEOUT", 10
+        )
+        self.openai_pool_timeout = self._get_int_env_variable(
+            "OPENAI_POOL_TIMEOUT", 60
+        )
+        self.openai_chat_read_timeout = self._get_int_env_variable(
+            "OPENAI_CHAT_READ_TIMEOUT", 180
+        )
+        self.openai_chat_write_timeout = self._get_int_env_variable(
+            "OPENAI_CHAT_WRITE_TIMEOUT", 30
+        )
+        self.openai_whisper_read_timeout = self._get_int_env_variable(
+            "OPENAI_WHISPER_READ_TIMEOUT", 360
+        )
+        self.openai_whisper_write_timeout = self._get_int_env_variable(
+            "OPENAI_WHISPER_WRITE_TIMEOUT", 120
+        )
         os.environ['TZ'] = self.timezone
         time.tzset()
-        self.database_url = (
+        # DATABASE_URL (например, postgresql+asyncpg://...) имеет
+        # приоритет над локальной базой SQLite DATABASE_NAME
+        self.database_url = self._get_env_variable("DATABASE_URL", '') or (
             "sqlite+aiosqlite:///"
             + os.path.join(os.path.dirname(__file__), 'database')
             + f'/{self._get_env_variable("DATABASE_NAME")}'
         )
+        self.database_pool_size = self._get_int_env_variable(
+            "DATABASE_POOL_SIZE", 5
+        )
+        self.database_max_overflow = self._get_int_env_variable(
+            "DATABASE_MAX_OVERFLOW", 10
+        )
+        self.database_pool_recycle = self._get_int_env_variable(
+            "DATABASE_POOL_RECYCLE", 1800
+        )
+        self.sqlite_journal_mode = self._get_env_variable(
+            "SQLITE_JOURNAL_MODE", "WAL"
+        )
+        self.sqlite_synchronous = self._get_env_variable(
+            "SQLITE_SYNCHRONOUS", "NORMAL"
+        )
+        self.sqlite_busy_timeout_ms = self._get_int_env_variable(
+            "SQLITE_BUSY_TIMEOUT_MS", 5000
+        )
+        self.sqlite_cache_size_kb = self._get_int_env_variable(
+            "SQLITE_CACHE_SIZE_KB", 65536
+        )
+        self.sqlite_mmap_size_mb = self._get_int_env_variable(
+            "SQLITE_MMAP_SIZE_MB", 256
+        )
+        self.sqlite_temp_store = self._get_env_variable(
+            "SQLITE_TEMP_STORE", "MEMORY"
+        )
+        self.user_cache_size = self._get_int_env_variable(
+            "USER_CACHE_SIZE", 10000
+        )
+        self.user_cache_ttl = self._get_int_env_variable("USER_CACHE_TTL", 300)
+        self.content_compression = self._get_env_variable(
+            "CONTENT_COMPRESSION", "zlib"
+        )
+        self.content_compression_level = self._get_int_env_variable(
+            "CONTENT_COMPRESSION_LEVEL", 6
+        )
+        self.history_page_size = self._get_int_env_variable(
+            "HISTORY_PAGE_SIZE", 10
+        )
+        self.activity_flush_interval_ms = self._get_int_env_variable(
+            "ACTIVITY_FLUSH_INTERVAL_MS", 500
+        )
+        self.activity_flush_max_rows = self._get_int_env_variable(
+            "ACTIVITY_FLUSH_MAX_ROWS", 500
+        )
+        self.active_jobs_backend = self._get_env_variable(
+            "ACTIVE_JOBS_BACKEND", "database"
+        )
+        self.active_jobs_lease_ttl = self._get_int_env_variable(
+            "ACTIVE_JOBS_LEASE_TTL", 120
+        )
+        self.active_jobs_heartbeat_interval = self._get_int_env_variable(
+            "ACTIVE_JOBS_HEARTBEAT_INTERVAL", 30
+        )
+        self.redis_url = self._get_env_variable(
+            "REDIS_URL", "redis://localhost:6379/0"
+        )
+        self.embedding_model = self._get_env_variable(
+            "EMBEDDING_MODEL", "text-embedding-3-small"
+        )
+        self.embedding_dimensions = self._get_int_env_variable(
+            "EMBEDDING_DIMENSIONS", 512
+        )
+        self.embedding_batch_size = self._get_int_env_variable(
+            "EMBEDDING_BATCH_SIZE", 64
+        )
+        self.rag_chunk_chars = self._get_int_env_variable(
+            "RAG_CHUNK_CHARS", 1500
+        )
+        self.rag_chunk_overlap_chars = self._get_int_env_variable(
+            "RAG_CHUNK_OVERLAP_CHARS", 200
+        )
+        self.rag_top_k = self._get_int_env_variable("RAG_TOP_K", 6)
+        self.answer_cache_size = self._get_int_env_variable(
+            "ANSWER_CACHE_SIZE", 1000
+        )
+        self.answer_cache_ttl = self._get_int_env_variable(
+            "ANSWER_CACHE_TTL", 3600
+        )
+        # Минимальная близость вопросов в процентах (100 — только
+        # совпадение после нормализации; ниже 90 не рекомендуется)
+        self.answer_cache_similarity = self._get_int_env_variable(
+            "ANSWER_CACHE_SIMILARITY", 100
+        )
+        self.queue_webhook_workers = self._get_int_env_variable(
+            "QUEUE_WEBHOOK_WORKERS", 8
+        )
+        self.queue_media_workers = self._get_int_env_variable(
+            "QUEUE_MEDIA_WORKERS", 4
+        )
+        self.queue_max_attempts = self._get_int_env_variable(
+            "QUEUE_MAX_ATTEMPTS", 3
+        )
+        self.queue_retry_base_delay = self._get_int_env_variable(
+            "QUEUE_RETRY_BASE_DELAY", 5
+        )
+        self.queue_poll_interval = self._get_int_env_variable(
+            "QUEUE_POLL_INTERVAL", 1
+        )
+        self.queue_lease_ttl = self._get_int_env_variable(
+            "QUEUE_LEASE_TTL", 120
+        )
+        self.queue_heartbeat_interval = self._get_int_env_variable(
+            "QUEUE_HEARTBEAT_INTERVAL", 30
+        )
+        self.admission_max_in_flight = self._get_int_env_variable(
+            "ADMISSION_MAX_IN_FLIGHT", 500
+        )
+        self.admission_max_media_jobs = self._get_int_env_variable(
+            "ADMISSION_MAX_MEDIA_JOBS", 50
+        )
+        self.admission_max_text_jobs = self._get_int_env_variable(
+            "ADMISSION_MAX_TEXT_JOBS", 300
+        )
+        # Процент лимита, после которого задачи откладываются
+        self.admission_defer_percent = self._get_int_env_variable(
+            "ADMISSION_DEFER_PERCENT", 80
+        )
+        self.admission_defer_delay = self._get_int_env_variable(
+            "ADMISSION_DEFER_DELAY", 10
+        )
+        # 0 - без ограничения
+        self.max_media_size_mb = self._get_int_env_variable(
+            "MAX_MEDIA_SIZE_MB", 2048
+        )
+        self.transcribe_job_concurrency = self._get_int_env_variable(
+            "TRANSCRIBE_JOB_CONCURRENCY", 3
+        )
+        self.summary_chunk_tokens = self._get_int_env_variable(
+            "SUMMARY_CHUNK_TOKENS", 6000
+        )
+        self.summary_job_concurrency = self._get_int_env_variable(
+            "SUMMARY_JOB_CONCURRENCY", 3
+        )
+        # Целевой размер фрагмента для Whisper (лимит API - 25 МБ)
+        self.whisper_chunk_target_mb = self._get_int_env_variable(
+            "WHISPER_CHUNK_TARGET_MB", 24
+        )
+        self.whisper_bitrate_kbps = self._get_int_env_variable(
+            "WHISPER_BITRATE_KBPS", 64
+        )
+        self.silence_search_window_s = self._get_int_env_variable(
+            "SILENCE_SEARCH_WINDOW_S", 30
+        )
+        self.pipeline_queue_size = self._get_int_env_variable(
+            "PIPELINE_QUEUE_SIZE", 2
+        )
+        self.pipeline_export_workers = self._get_int_env_variable(
+            "PIPELINE_EXPORT_WORKERS", 2
+        )
+        # 0 - по количеству ядер
+        self.audio_workers = self._get_int_env_variable("AUDIO_WORKERS", 0)
+        # Движок распознавания: openai (Whisper API) или local
+        # (faster-whisper в пуле процессов)
+        self.transcribe_backend = self._get_env_variable(
+            "TRANSCRIBE_BACKEND", "openai"
+        )
+        self.local_whisper_model = self._get_env_variable(
+            "LOCAL_WHISPER_MODEL", "small"
+        )
+        self.local_whisper_device = self._get_env_variable(
+            "LOCAL_WHISPER_DEVICE", "cpu"
+        )
+        self.local_whisper_compute_type = self._get_env_variable(
+            "LOCAL_WHISPER_COMPUTE_TYPE", "int8"
+        )
+        self.local_whisper_workers = self._get_int_env_variable(
+            "LOCAL_WHISPER_WORKERS", 1
+        )
+        # 0 - ядра поровну между процессами
+        self.local_whisper_cpu_threads = self._get_int_env_variable(
+            "LOCAL_WHISPER_CPU_THREADS", 0
+        )
+        self.local_whisper_beam_size = self._get_int_env_variable(
+            "LOCAL_WHISPER_BEAM_SIZE", 5
+        )
+        # 0 - без пакетной обработки
+        self.local_whisper_batch_size = self._get_int_env_variable(
+            "LOCAL_WHISPER_BATCH_SIZE", 0
+        )
+        self.local_whisper_segment_s = self._get_int_env_variable(
+            "LOCAL_WHISPER_SEGMENT_S", 600
+        )
+        self.media_cache_dir = self._get_env_variable(
+            "MEDIA_CACHE_DIR", os.path.join(os.path.dirname(__file__), 'cache')
+        )
+        self.media_cache_max_mb = self._get_int_env_variable(
+            "MEDIA_CACHE_MAX_MB", 512
+        )
 
     def _load_environment_variables(self, env_file: str) -> None:
         """
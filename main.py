@@ -4,7 +4,13 @@ from typing import AsyncGenerator
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.routers import setup_routers
+from app.database import activity_buffer
 from app.database.engine import initialize_database
+from app.filters import active_jobs
+from app.handlers.process import restore_in_process_users
+from app.jobs import job_queue
+from app.services import transcription_backend
+from app.utils import audio_executor, openai_client
 from app.utils.url_manager import URLManager
 from app.whapi import whapi_client
 from config import config
@@ -18,11 +24,23 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
     :param app: FastAPI приложение
     """
     await initialize_database()
+    await activity_buffer.start()
+    await whapi_client.start()
+    await active_jobs.start()
+    await restore_in_process_users()
+    await job_queue.start()
     url_manager = await URLManager.create(config.webhook_host)
     await whapi_client.set_webhook(
         webhook_url=url_manager.get_webhook_url()
     )
     yield
+    await job_queue.stop()
+    await active_jobs.stop()
+    await activity_buffer.stop()
+    await whapi_client.close()
+    await openai_client.close()
+    transcription_backend.shutdown()
+    audio_executor.shutdown()
 
 # Создание FastAPI приложения
 app = FastAPI(
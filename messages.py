@@ -64,6 +64,9 @@ Your file is being processed. Please wait a moment. 🕒"""
 # Текст для сообщения с информацией о том, что пользователь уже обрабатывает аудио
 ALREADY_IN_PROCESS_MESSAGE = """⚠️ You are already processing audio. Please wait until the previous audio is processed."""
 
+# Текст для сообщения с информацией о том, что бот перегружен
+BUSY_MESSAGE = """⏳ The bot is busy right now. Please send your message again in a few minutes."""
+
 # Текст для сообщения с информацией о том, что произошла ошибка при обработке аудио
 ERROR_IN_PROCESS_MESSAGE = """⚠️ An error occurred while processing your audio. Please try again later."""
 
@@ -77,6 +80,26 @@ SUMMARY_MESSAGE = """*Summary:*
 *Now you can ask questions about transcribing.*
 """
 
+# Текст для сообщения с историей транскрипций
+HISTORY_MESSAGE = """📚 *Your recordings* (page {page} of {pages}):
+
+{items}
+
+Send *select <id>* to ask questions about a recording.
+Send *history <page>* to see another page."""
+
+# Текст для строки истории транскрипций
+HISTORY_ITEM_MESSAGE = """{marker} *#{id}* · {created_at} · {duration} · {language} · {size} KB"""
+
+# Текст для сообщения об отсутствии транскрипций
+HISTORY_EMPTY_MESSAGE = """ℹ️ You have no transcribed recordings yet."""
+
+# Текст для сообщения о выборе транскрипции
+TRANSCRIPT_SELECTED_MESSAGE = """✅ Recording #{id} selected. Now you can ask questions about it."""
+
+# Текст для сообщения, если транскрипция не найдена
+TRANSCRIPT_NOT_FOUND_MESSAGE = """⚠️ Recording {id} not found. Send *history* to see your recordings."""
+
 # Текст для сообщения с информацией о том, что вопрос обрабатывается
 RESPONSE_GENERATION_MESSAGE = """*Response generation...*
 
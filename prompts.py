@@ -3,8 +3,21 @@
 # Промпт для суммирования текста
 SUMMARY_PROMPT = "Summarize the following text:"
 
+# Промпт для суммирования фрагмента длинного текста
+SUMMARY_CHUNK_PROMPT = (
+    "The following text is one consecutive part of a longer transcript. "
+    "Summarize this part, keeping the key points, names, numbers and "
+    "decisions:"
+)
+
+# Промпт для объединения суммаризаций фрагментов
+SUMMARY_REDUCE_PROMPT = (
+    "The following are summaries of consecutive parts of one transcript, "
+    "in order. Combine them into a single summary of the whole text:"
+)
+
 # Промпт для ответа на вопрос
-QUESTION_PROMPT = """Context: {context}
+QUESTION_PROMPT = """Context (the transcript or its excerpts most relevant to the question, separated by "…"): {context}
 
 User question: {question}
 